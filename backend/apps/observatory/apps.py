@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ObservatoryConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.observatory"
+
+    def ready(self):
+        from apps.staff.caching import register_reference_models
+        from apps.staff.conditional import register_etag_models
+        from .models import Telescope, Instrument
+        register_reference_models(Telescope, Instrument)
+        register_etag_models(Telescope)
@@ -1,3 +1,54 @@
-from django.test import TestCase
+from django.test import override_settings
+from rest_framework.test import APITestCase
 
-# Create your tests here.
+from .models import Telescope, Instrument
+
+
+@override_settings(REFERENCE_CACHE_TIMEOUT=0)
+class QueryCountTests(APITestCase):
+    """List and retrieve must cost the same number of queries at any size"""
+
+    def add_rows(self, count):
+        existing = Telescope.objects.count()
+        for i in range(existing, existing + count):
+            telescope = Telescope.objects.create(name=f'Telescope {i}', code=f'TEL{i}', aperture=1.5)
+            for j in range(3):
+                Instrument.objects.create(name=f'Camera {j}', code=f'CAM{i}-{j}', telescope=telescope)
+
+    def assertConstantQueries(self, url, expected):
+        self.add_rows(1)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_rows(5)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_telescope_list(self):
+        self.assertConstantQueries('/api/observatory/telescopes/', 2)
+
+    def test_telescope_retrieve(self):
+        self.add_rows(1)
+        url = f'/api/observatory/telescopes/{Telescope.objects.first().pk}/'
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_instrument_list(self):
+        self.assertConstantQueries('/api/observatory/instruments/', 2)
+
+    def test_instrument_retrieve(self):
+        self.add_rows(1)
+        url = f'/api/observatory/instruments/{Instrument.objects.first().pk}/'
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class ReferenceCacheTests(APITestCase):
+
+    def test_instrument_change_invalidates_telescope_detail(self):
+        telescope = Telescope.objects.create(name='SOAR', code='SOAR', aperture=4.1)
+        url = f'/api/observatory/telescopes/{telescope.pk}/'
+        self.assertEqual(self.client.get(url).data['instruments'], [])
+
+        Instrument.objects.create(name='Goodman', code='GHTS', telescope=telescope)
+
+        self.assertEqual([row['code'] for row in self.client.get(url).data['instruments']], ['GHTS'])
@@ -1,11 +1,13 @@
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.staff.caching import CachedReferenceMixin
+from apps.staff.fieldsets import SparseFieldsetMixin
 from .models import Telescope, Instrument
 from .serializers import TelescopeSerializer, InstrumentSerializer, TelescopeListSerializer
 
 
-class TelescopeViewSet(viewsets.ModelViewSet):
+class TelescopeViewSet(SparseFieldsetMixin, CachedReferenceMixin, viewsets.ModelViewSet):
     """
     ViewSet for Telescope CRUD operations
     """
@@ -18,13 +20,19 @@ class TelescopeViewSet(viewsets.ModelViewSet):
     ordering_fields = ['name', 'aperture']
     ordering = ['name']
     
+    def get_queryset(self):
+        # The list serializer does not nest instruments, so skip the prefetch
+        if self.action == 'list':
+            return Telescope.objects.all()
+        return super().get_queryset()
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return TelescopeListSerializer
         return TelescopeSerializer
 
 
-class InstrumentViewSet(viewsets.ModelViewSet):
+class InstrumentViewSet(SparseFieldsetMixin, CachedReferenceMixin, viewsets.ModelViewSet):
     """
     ViewSet for Instrument CRUD operations
     """
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Shift, Schedule
+from .models import Shift, RecurringShift, Schedule, ScheduleSnapshot, WorkloadRollup
 
 
 @admin.register(Shift)
@@ -27,6 +27,15 @@ class ShiftAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(RecurringShift)
+class RecurringShiftAdmin(admin.ModelAdmin):
+    list_display = ['shift_type', 'assigned_staff', 'rrule', 'dtstart', 'last_date', 'start_time', 'end_time']
+    list_filter = ['shift_type', 'telescope']
+    search_fields = ['assigned_staff__user__first_name', 'assigned_staff__user__last_name', 'description']
+    date_hierarchy = 'dtstart'
+    readonly_fields = ['created_at', 'updated_at', 'last_date']
+
+
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
     list_display = ['name', 'start_date', 'end_date', 'status', 'total_shifts']
@@ -51,3 +60,18 @@ class ScheduleAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(WorkloadRollup)
+class WorkloadRollupAdmin(admin.ModelAdmin):
+    list_display = ['staff_member', 'month', 'shifts', 'hours', 'night_shifts', 'weekend_shifts']
+    list_filter = ['month', 'staff_member__team']
+    date_hierarchy = 'month'
+    readonly_fields = ['updated_at']
+
+
+@admin.register(ScheduleSnapshot)
+class ScheduleSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['schedule', 'version', 'built_at']
+    readonly_fields = ['schedule', 'version', 'built_at']
+    exclude = ['payload']
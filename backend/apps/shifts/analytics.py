@@ -0,0 +1,276 @@
+"""
+Fairness and workload analytics.
+
+Per staff member and period (week, month or the whole range) the report
+counts assigned, non-cancelled shifts, their hours, night and weekend shifts
+and shifts placed on days the staff member marked '?'. Everything is
+aggregated in the database with one grouped query, so a year for every team
+costs the same handful of queries as a week for one person.
+
+A shift belongs to the period and day on which it starts. Night shifts use
+the same rule as the auto-scheduler (``is_night_shift``): starting at or
+after NIGHT_START_HOUR or ending on a later date.
+
+When ``WORKLOAD_ROLLUPS`` is enabled, WorkloadRollup rows hold the shift
+totals per staff member per month and are refreshed on every Shift save or
+delete. Monthly reports over whole months then read those rows instead of
+scanning shifts; '?' counts are always computed live because they depend on
+DailyAvailability as well.
+"""
+import calendar
+from datetime import timedelta
+from statistics import mean, pstdev
+
+from django.conf import settings
+from django.db.models import Count, DurationField, Exists, ExpressionWrapper, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+
+from apps.staff.models import StaffMember, DailyAvailability
+from .calendar import day_bounds
+from .models import Shift, WorkloadRollup
+from .scheduler import NIGHT_START_HOUR
+
+
+PERIODS = ['week', 'month', 'total']
+
+METRICS = ['shifts', 'hours', 'night_shifts', 'day_shifts', 'weekend_shifts', 'maybe_day_shifts']
+
+NIGHT = Q(start_time__hour__gte=NIGHT_START_HOUR) | Q(end_time__date__gt=F('start_time__date'))
+
+# ExtractWeekDay numbers Sunday as 1 and Saturday as 7
+WEEKEND = Q(start_time__week_day__in=[1, 7])
+
+
+def shift_aggregates():
+    return {
+        'shifts': Count('id'),
+        'hours': Sum(ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())),
+        'night_shifts': Count('id', filter=NIGHT),
+        'weekend_shifts': Count('id', filter=WEEKEND),
+    }
+
+
+def assigned_shifts(staff_ids, start_date, end_date):
+    range_start, range_end = day_bounds(start_date, end_date)
+    return Shift.objects.filter(
+        assigned_staff_id__in=staff_ids,
+        start_time__gte=range_start,
+        start_time__lt=range_end,
+    ).exclude(status='cancelled')
+
+
+def to_hours(duration):
+    if duration is None:
+        return 0.0
+    if isinstance(duration, timedelta):
+        return duration.total_seconds() / 3600
+    return float(duration)
+
+
+def month_start(moment):
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def empty_metrics():
+    return dict.fromkeys(METRICS, 0)
+
+
+def covers_whole_months(start_date, end_date):
+    return start_date.day == 1 and end_date == month_end(end_date)
+
+
+def workload_report(start_date, end_date, staff_queryset=None, period='month'):
+    """
+    Workload per staff member over the inclusive range [start_date, end_date],
+    broken down by ``period`` ('week', 'month' or 'total'), plus a fairness
+    summary of the spread between staff members.
+    """
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    members = list(
+        staff_queryset.select_related('user', 'team').order_by('team__code', 'user__last_name', 'id')
+    )
+    staff_ids = [member.id for member in members]
+
+    periods = {staff_id: {} for staff_id in staff_ids}
+    if period == 'month' and settings.WORKLOAD_ROLLUPS and covers_whole_months(start_date, end_date):
+        totals = WorkloadRollup.objects.filter(
+            staff_member_id__in=staff_ids, month__gte=start_date, month__lte=end_date, shifts__gt=0
+        ).values('staff_member_id', 'month', 'shifts', 'hours', 'night_shifts', 'weekend_shifts')
+        for row in totals:
+            periods[row['staff_member_id']][row['month']] = metrics_from(row)
+    else:
+        shifts = group_by_period(assigned_shifts(staff_ids, start_date, end_date), period)
+        for row in shifts.annotate(**shift_aggregates()):
+            periods[row['assigned_staff_id']][to_period(row.get('period'), start_date)] = metrics_from(row)
+
+    maybe = assigned_shifts(staff_ids, start_date, end_date).annotate(
+        day=TruncDate('start_time'),
+    ).filter(Exists(DailyAvailability.objects.filter(
+        staff_member_id=OuterRef('assigned_staff_id'),
+        date=OuterRef('day'),
+        availability_code='?',
+    )))
+    for row in group_by_period(maybe, period).annotate(count=Count('id')):
+        key = to_period(row.get('period'), start_date)
+        periods[row['assigned_staff_id']].setdefault(key, empty_metrics())['maybe_day_shifts'] = row['count']
+
+    staff = []
+    for member in members:
+        totals = empty_metrics()
+        for metrics in periods[member.id].values():
+            for name in METRICS:
+                totals[name] += metrics[name]
+        totals['hours'] = round(totals['hours'], 2)
+
+        staff.append({
+            'staff_member': member.id,
+            'name': member.full_name,
+            'team': member.team.code if member.team else None,
+            'totals': totals,
+            'periods': [
+                {'period': key, **metrics} for key, metrics in sorted(periods[member.id].items())
+            ] if period != 'total' else [],
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'period': period,
+        'staff': staff,
+        'fairness': fairness([entry['totals'] for entry in staff]),
+    }
+
+
+def group_by_period(shifts, period):
+    """values() grouping on staff member and, unless period is 'total', the period start"""
+    if period == 'month':
+        return shifts.annotate(period=TruncMonth('start_time')).values('assigned_staff_id', 'period').order_by()
+    if period == 'week':
+        return shifts.annotate(period=TruncWeek('start_time')).values('assigned_staff_id', 'period').order_by()
+    return shifts.values('assigned_staff_id').order_by()
+
+
+def to_period(value, start_date):
+    if value is None:
+        return start_date
+    if hasattr(value, 'date'):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+def metrics_from(row):
+    metrics = empty_metrics()
+    metrics['shifts'] = row['shifts']
+    metrics['hours'] = round(to_hours(row['hours']), 2)
+    metrics['night_shifts'] = row['night_shifts']
+    metrics['day_shifts'] = row['shifts'] - row['night_shifts']
+    metrics['weekend_shifts'] = row['weekend_shifts']
+    return metrics
+
+
+def fairness(totals):
+    """Spread (max - min), mean and standard deviation of each metric across staff"""
+    summary = {}
+    for name in ['hours', 'night_shifts', 'weekend_shifts', 'maybe_day_shifts']:
+        values = [entry[name] for entry in totals]
+        if not values:
+            summary[name] = {'min': 0, 'max': 0, 'mean': 0, 'stdev': 0, 'spread': 0}
+            continue
+        summary[name] = {
+            'min': min(values),
+            'max': max(values),
+            'mean': round(mean(values), 2),
+            'stdev': round(pstdev(values), 2),
+            'spread': round(max(values) - min(values), 2),
+        }
+    return summary
+
+
+def refresh_rollups(keys):
+    """
+    Recompute WorkloadRollup rows for the given (staff_member_id, month) pairs
+    with one aggregate query and one upsert.
+    """
+    keys = {(staff_id, month) for staff_id, month in keys if staff_id is not None}
+    if not keys:
+        return
+    staff_ids = {staff_id for staff_id, _ in keys}
+    first = min(month for _, month in keys)
+    last = month_end(max(month for _, month in keys))
+
+    found = {}
+    rows = assigned_shifts(staff_ids, first, last).annotate(
+        month=TruncMonth('start_time'),
+    ).values('assigned_staff_id', 'month').annotate(**shift_aggregates()).order_by()
+    for row in rows:
+        found[row['assigned_staff_id'], to_period(row['month'], first)] = row
+
+    now = timezone.now()
+    rollups = []
+    for staff_id, month in keys:
+        row = found.get((staff_id, month), {'shifts': 0, 'hours': None, 'night_shifts': 0, 'weekend_shifts': 0})
+        rollups.append(WorkloadRollup(
+            staff_member_id=staff_id,
+            month=month,
+            shifts=row['shifts'],
+            hours=round(to_hours(row['hours']), 4),
+            night_shifts=row['night_shifts'],
+            weekend_shifts=row['weekend_shifts'],
+            updated_at=now,
+        ))
+    WorkloadRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['staff_member', 'month'],
+        update_fields=['shifts', 'hours', 'night_shifts', 'weekend_shifts', 'updated_at'],
+    )
+
+
+def rebuild_rollups(start_date, end_date, staff_queryset=None):
+    """Recompute every rollup month touching [start_date, end_date]; returns the row count"""
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    staff_ids = list(staff_queryset.values_list('id', flat=True))
+    months = []
+    month = start_date.replace(day=1)
+    while month <= end_date:
+        months.append(month)
+        month = month_end(month) + timedelta(days=1)
+    refresh_rollups((staff_id, month) for staff_id in staff_ids for month in months)
+    return len(staff_ids) * len(months)
+
+
+def _remember_previous(sender, instance, **kwargs):
+    instance._rollup_previous = None
+    if settings.WORKLOAD_ROLLUPS and instance.pk:
+        instance._rollup_previous = Shift.objects.filter(pk=instance.pk).values_list(
+            'assigned_staff_id', 'start_time'
+        ).first()
+
+
+def _refresh_after_save(sender, instance, **kwargs):
+    if not settings.WORKLOAD_ROLLUPS:
+        return
+    keys = {(instance.assigned_staff_id, month_start(instance.start_time))}
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        keys.add((previous[0], month_start(previous[1])))
+    refresh_rollups(keys)
+
+
+def _refresh_after_delete(sender, instance, **kwargs):
+    if settings.WORKLOAD_ROLLUPS:
+        refresh_rollups({(instance.assigned_staff_id, month_start(instance.start_time))})
+
+
+def register_rollup_signals():
+    pre_save.connect(_remember_previous, sender=Shift, dispatch_uid='workload-rollup-pre-save')
+    post_save.connect(_refresh_after_save, sender=Shift, dispatch_uid='workload-rollup-save')
+    post_delete.connect(_refresh_after_delete, sender=Shift, dispatch_uid='workload-rollup-delete')
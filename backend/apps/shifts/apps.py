@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class ShiftsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.shifts"
+
+    def ready(self):
+        from .analytics import register_rollup_signals
+        from .snapshots import register_snapshot_signals
+        from .recurrence import register_override_signals
+        from .models import Shift, Schedule, RecurringShift
+        from apps.staff.sync import register_tombstone_signals
+        from apps.staff.events import register_event_signals, shift_event
+        from apps.staff.conditional import register_etag_models
+        register_rollup_signals()
+        register_snapshot_signals()
+        register_override_signals()
+        register_tombstone_signals(Shift)
+        register_event_signals(Shift, shift_event)
+        register_etag_models(Shift, Schedule.shifts.through, RecurringShift)
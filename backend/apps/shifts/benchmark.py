@@ -0,0 +1,147 @@
+"""
+Synthetic-load benchmarks for the main read endpoints.
+
+``seed_dataset`` builds a scaled observatory with the seed commands (N
+staff, a multi-month horizon of shifts and daily availability, one
+published schedule) and ``benchmark_endpoints`` requests each endpoint in
+ENDPOINTS through the test client, recording:
+
+- latency: min / median / p95 / max over ``repeat`` timed requests
+- queries: number of SQL queries for one request
+- peak_kb: peak Python allocations during one request (tracemalloc)
+- bytes: response body size
+
+The query count is what catches N+1 regressions: it must not grow with the
+data size. ``compare`` diffs two result files produced by the
+benchmark_api command.
+"""
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Shift, Schedule
+
+
+BENCHMARK_START = date(2025, 1, 1)
+
+# Window requested by the range endpoints
+WINDOW_DAYS = 31
+
+# name -> path, formatted with start, end (ISO dates) and schedule (id)
+ENDPOINTS = {
+    'shift_list': '/api/shifts/?start_time__gte={start}T00:00:00Z&start_time__lt={end}T23:59:59Z&page_size=100',
+    'schedule_retrieve': '/api/schedules/{schedule}/',
+    'daily_availability_range': '/api/staff/daily-availability/?date__gte={start}&date__lte={end}&page_size=1000',
+    'staff_list': '/api/staff/members/',
+    'calendar': '/api/shifts/calendar/?start_date={start}&end_date={end}',
+}
+
+
+def seed_dataset(staff, days, seed=1, start=BENCHMARK_START):
+    """
+    Seed ``staff`` synthetic staff with ``days`` of shifts and availability
+    starting at ``start``, plus a published schedule holding the shifts of
+    the benchmark window; returns that schedule.
+    """
+    options = ['--seed', str(seed), '--start', start.isoformat(), '--days', str(days)]
+    call_command('setup_teams', stdout=StringIO())
+    call_command('seed_rubin_data', '--staff', str(staff), *options, stdout=StringIO())
+    call_command('seed_daily_availability', *options, stdout=StringIO())
+
+    end = start + timedelta(days=WINDOW_DAYS - 1)
+    schedule = Schedule.objects.create(
+        name=f'Benchmark {staff} staff', start_date=start, end_date=end, status='published'
+    )
+    shift_ids = Shift.objects.filter(start_time__date__gte=start, start_time__date__lte=end).values_list('id', flat=True)
+    Schedule.shifts.through.objects.bulk_create([
+        Schedule.shifts.through(schedule_id=schedule.id, shift_id=shift_id) for shift_id in shift_ids
+    ])
+    return schedule
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def clear_caches():
+    # Measure the uncached path of cached endpoints too
+    for cache in caches.all():
+        cache.clear()
+
+
+def measure(client, path, repeat):
+    """Query count, peak memory, size and latency (ms) of GET ``path``"""
+    clear_caches()
+    # The query log is a bounded deque; once seeding has filled it the
+    # captured slice would always be empty
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path)
+    if response.status_code != 200:
+        raise RuntimeError(f'GET {path} returned {response.status_code}')
+
+    clear_caches()
+    tracemalloc.start()
+    client.get(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        clear_caches()
+        begin = time.perf_counter()
+        client.get(path)
+        timings.append((time.perf_counter() - begin) * 1000)
+
+    return {
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+        'bytes': len(response.content),
+        'min_ms': round(min(timings), 2),
+        'median_ms': round(statistics.median(timings), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def benchmark_endpoints(schedule, repeat=5, endpoints=None, start=BENCHMARK_START):
+    """Measure every endpoint in ``endpoints`` (default: all of ENDPOINTS)"""
+    client = APIClient()
+    params = {
+        'start': start.isoformat(),
+        'end': (start + timedelta(days=WINDOW_DAYS - 1)).isoformat(),
+        'schedule': schedule.id,
+    }
+    return {
+        name: measure(client, ENDPOINTS[name].format(**params), repeat)
+        for name in (endpoints or ENDPOINTS)
+    }
+
+
+def compare(baseline, current, threshold=0.25):
+    """
+    Regressions of ``current`` against ``baseline`` (both benchmark_api
+    results): any increase in query count, or a median latency more than
+    ``threshold`` (a fraction) slower. Returns a list of messages.
+    """
+    before = {(row['staff'], row['endpoint']): row for row in baseline['results']}
+    problems = []
+    for row in current['results']:
+        old = before.get((row['staff'], row['endpoint']))
+        if old is None:
+            continue
+        label = f"{row['endpoint']} @ {row['staff']} staff"
+        if row['queries'] > old['queries']:
+            problems.append(f"{label}: queries {old['queries']} -> {row['queries']}")
+        if old['median_ms'] and row['median_ms'] > old['median_ms'] * (1 + threshold):
+            problems.append(f"{label}: median {old['median_ms']}ms -> {row['median_ms']}ms")
+    return problems
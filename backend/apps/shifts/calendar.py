@@ -0,0 +1,121 @@
+"""
+Calendar grid builder for the schedule view.
+
+Joins staff members, shifts and effective availability (daily codes with
+availability windows applied) for a date range on the server so the
+calendar can render staff rows x date columns from a single response. The
+grid is always built with a fixed number of queries (one for staff, one for
+shifts, two for recurring shifts, two for availability) regardless of how
+many staff members or days are requested. Recurring shift occurrences are
+merged in with stored shifts (``id`` null, ``recurrence`` set).
+"""
+import heapq
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from apps.staff.availability import resolve_availability
+from apps.staff.models import StaffMember
+from .models import Shift, RecurringShift
+from .recurrence import expand, occurrence_values
+
+# Upper bound on the number of days a single grid can span
+MAX_GRID_DAYS = 366
+
+CELL_FIELDS = (
+    'id', 'assigned_staff_id', 'start_time', 'end_time', 'status', 'recurrence_id', 'recurrence_date',
+    'shift_type_id', 'shift_type__code', 'shift_type__name', 'shift_type__color',
+)
+
+
+def date_range(start_date, end_date):
+    """Return the list of dates from start_date to end_date (inclusive)"""
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def day_bounds(start_date, end_date):
+    """Return aware datetimes covering [start_date 00:00, end_date + 1 day 00:00)"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(start_date, time.min), tz)
+    end = timezone.make_aware(datetime.combine(end_date + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def build_calendar_grid(start_date, end_date, staff_queryset=None):
+    """
+    Build the calendar grid payload for the given inclusive date range.
+
+    Shifts are bucketed by the local date of their start time, matching how
+    the calendar places them. Availability is returned as one code character
+    per date so a row costs a single string rather than one object per cell;
+    the windows that shaped it are listed alongside.
+    """
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    staff_members = list(staff_queryset.select_related('user', 'team'))
+    staff_ids = [member.id for member in staff_members]
+
+    dates = date_range(start_date, end_date)
+    range_start, range_end = day_bounds(start_date, end_date)
+
+    shifts = Shift.objects.filter(
+        assigned_staff_id__in=staff_ids,
+        start_time__gte=range_start,
+        start_time__lt=range_end,
+    ).order_by('start_time', 'id').values(*CELL_FIELDS)
+    recurring = RecurringShift.objects.filter(
+        assigned_staff_id__in=staff_ids, dtstart__lte=end_date,
+    ).exclude(last_date__lt=start_date).select_related('shift_type')
+    occurrences = expand(recurring, start_date, end_date)
+
+    availability = resolve_availability(staff_ids, start_date, end_date)
+
+    shift_types = {}
+    cells = {staff_id: {} for staff_id in staff_ids}
+    for shift in heapq.merge(
+        shifts, (occurrence_values(occurrence, CELL_FIELDS) for occurrence in occurrences),
+        key=lambda shift: shift['start_time'],
+    ):
+        day = timezone.localtime(shift['start_time']).date().isoformat()
+        shift_type_id = shift['shift_type_id']
+        if shift_type_id not in shift_types:
+            shift_types[shift_type_id] = {
+                'id': shift_type_id,
+                'code': shift['shift_type__code'],
+                'name': shift['shift_type__name'],
+                'color': shift['shift_type__color'],
+            }
+        cells[shift['assigned_staff_id']].setdefault(day, []).append({
+            'id': shift['id'],
+            'shift_type': shift_type_id,
+            'status': shift['status'],
+            'start_time': shift['start_time'],
+            'end_time': shift['end_time'],
+            'recurrence': shift['recurrence_id'],
+            'recurrence_date': shift['recurrence_date'],
+        })
+
+    rows = []
+    for member in staff_members:
+        rows.append({
+            'staff_member': {
+                'id': member.id,
+                'full_name': member.full_name,
+                'role': member.role,
+                'role_display': member.get_role_display(),
+                'team': member.team_id,
+                'team_code': member.team.code if member.team else None,
+            },
+            'availability': availability[member.id]['availability'],
+            'availability_notes': availability[member.id]['notes'],
+            'availability_windows': availability[member.id]['windows'],
+            'shifts': cells[member.id],
+        })
+
+    return {
+        'start_date': start_date,
+        'end_date': end_date,
+        'dates': dates,
+        'shift_types': list(shift_types.values()),
+        'rows': rows,
+    }
@@ -0,0 +1,152 @@
+"""
+Shift conflict detection.
+
+Finds three kinds of problems for assigned, non-cancelled shifts:
+- overlaps: two shifts for the same staff member whose times intersect
+- availability: a shift on a day the staff member marked 'X'
+- rest: breaks between work blocks shorter than ``min_rest_days``, and runs
+  of night shifts longer than ``max_consecutive_nights``
+
+``find_conflicts`` checks a whole range in one pass: shifts are loaded once
+ordered by (assigned_staff, start_time), which the existing index serves, and
+each staff member's intervals are swept with a heap of active end times, so
+the work is O(n log n) plus the number of conflicts reported.
+``check_shift`` validates a single shift before it is saved.
+"""
+import heapq
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.staff.models import StaffMember, DailyAvailability
+from .calendar import day_bounds
+from .models import Shift, MAX_SHIFT_DURATION
+from .scheduler import is_night_shift
+
+
+def check_shift(staff_member_id, start_time, end_time, exclude_id=None):
+    """
+    Return a list of error messages if assigning this shift would overlap
+    another of the staff member's shifts or fall on one of their 'X' days.
+    """
+    errors = []
+    overlapping = Shift.objects.filter(
+        assigned_staff_id=staff_member_id,
+        start_time__gt=start_time - MAX_SHIFT_DURATION,
+        start_time__lt=end_time,
+        end_time__gt=start_time,
+    ).exclude(status='cancelled')
+    if exclude_id is not None:
+        overlapping = overlapping.exclude(pk=exclude_id)
+    clash = overlapping.select_related('shift_type').first()
+    if clash is not None:
+        errors.append(
+            f'Overlaps {clash.shift_type.name} shift from '
+            f'{timezone.localtime(clash.start_time):%Y-%m-%d %H:%M} to '
+            f'{timezone.localtime(clash.end_time):%Y-%m-%d %H:%M}'
+        )
+
+    day = timezone.localtime(start_time).date()
+    if DailyAvailability.objects.filter(
+        staff_member_id=staff_member_id, date=day, availability_code='X'
+    ).exists():
+        errors.append(f'Staff member is unavailable on {day}')
+    return errors
+
+
+def find_conflicts(start_date, end_date, staff_queryset=None):
+    """
+    Report every overlap, availability violation and rest-rule breach that
+    touches the inclusive date range [start_date, end_date].
+    """
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    staff = {
+        member.id: member
+        for member in staff_queryset.only('id', 'min_rest_days', 'max_consecutive_nights')
+    }
+    lookback = timedelta(days=max(
+        [max(m.min_rest_days, m.max_consecutive_nights) for m in staff.values()] or [0]
+    ) + 1)
+    window_start, window_end = day_bounds(start_date, end_date)
+    load_start, load_end = day_bounds(start_date - lookback, end_date + lookback)
+
+    shifts = Shift.objects.filter(
+        assigned_staff_id__in=staff,
+        start_time__gt=load_start - MAX_SHIFT_DURATION,
+        start_time__lt=load_end,
+    ).exclude(status='cancelled').order_by('assigned_staff_id', 'start_time', 'id').values_list(
+        'id', 'assigned_staff_id', 'start_time', 'end_time'
+    )
+
+    unavailable = set(DailyAvailability.objects.filter(
+        staff_member_id__in=staff,
+        date__gte=start_date,
+        date__lte=end_date,
+        availability_code='X',
+    ).values_list('staff_member_id', 'date'))
+
+    result = {'overlaps': [], 'availability': [], 'rest': [], 'consecutive_nights': []}
+    current_staff = None
+    for shift_id, staff_id, start_time, end_time in shifts:
+        if staff_id != current_staff:
+            if current_staff is not None:
+                _check_days(staff[current_staff], work_days, night_days, start_date, end_date, result)
+            current_staff = staff_id
+            active = []
+            work_days = []
+            night_days = set()
+
+        # Sweep: drop shifts that ended before this one starts; whatever is
+        # left in the heap overlaps it
+        while active and active[0][0] <= start_time:
+            heapq.heappop(active)
+        for other_end, other_id in active:
+            if start_time < window_end and min(end_time, other_end) > window_start:
+                result['overlaps'].append({
+                    'staff_member': staff_id,
+                    'shifts': [other_id, shift_id],
+                })
+        heapq.heappush(active, (end_time, shift_id))
+
+        day = timezone.localtime(start_time).date()
+        if (staff_id, day) in unavailable:
+            result['availability'].append({'staff_member': staff_id, 'shift': shift_id, 'date': day})
+        if not work_days or work_days[-1] != day:
+            work_days.append(day)
+        if is_night_shift(start_time, end_time):
+            night_days.add(day)
+
+    if current_staff is not None:
+        _check_days(staff[current_staff], work_days, night_days, start_date, end_date, result)
+    return result
+
+
+def _check_days(member, work_days, night_days, start_date, end_date, result):
+    """Record rest-day and consecutive-night breaches for one staff member"""
+    for previous, following in zip(work_days, work_days[1:]):
+        rest_days = (following - previous).days - 1
+        if 0 < rest_days < member.min_rest_days and following >= start_date and previous <= end_date:
+            result['rest'].append({
+                'staff_member': member.id,
+                'last_day_worked': previous,
+                'next_day_worked': following,
+                'rest_days': rest_days,
+                'required': member.min_rest_days,
+            })
+
+    run_start = None
+    nights = sorted(night_days)
+    for i, day in enumerate(nights):
+        if run_start is None or (day - nights[i - 1]).days != 1:
+            run_start = day
+        run_ends = i + 1 == len(nights) or (nights[i + 1] - day).days != 1
+        length = (day - run_start).days + 1
+        if run_ends and length > member.max_consecutive_nights and day >= start_date and run_start <= end_date:
+            result['consecutive_nights'].append({
+                'staff_member': member.id,
+                'first_night': run_start,
+                'last_night': day,
+                'nights': length,
+                'allowed': member.max_consecutive_nights,
+            })
@@ -0,0 +1,233 @@
+"""
+Streaming CSV and iCalendar export of shifts.
+
+Rows are read with ``.values().iterator(chunk_size=...)`` and encoded one at
+a time into a StreamingHttpResponse, so memory use does not grow with the
+number of shifts exported. Responses carry an ETag and Last-Modified derived
+from the newest ``Shift.updated_at`` and the row count, letting polling
+calendar clients revalidate with a single aggregate query.
+
+Recurring shifts (apps.shifts.recurrence) are merged into CSV as expanded
+occurrences, in start time order, and exported to iCalendar as one
+repeating event per rule (RRULE, with EXDATE for skipped and
+materialised dates).
+"""
+import csv
+import hashlib
+import heapq
+from datetime import date, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .models import Shift
+from .recurrence import first_occurrence, occurrence_times, occurrence_values, to_rrule
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    'id', 'start_time', 'end_time', 'status', 'description', 'updated_at',
+    'shift_type__code', 'shift_type__name',
+    'assigned_staff_id', 'assigned_staff__employee_id',
+    'assigned_staff__user__first_name', 'assigned_staff__user__last_name',
+    'assigned_staff__team__code', 'telescope__name',
+]
+
+CSV_HEADER = [
+    'id', 'date', 'start_time', 'end_time', 'shift_code', 'shift_name', 'status',
+    'staff_member', 'employee_id', 'staff_name', 'team', 'telescope', 'description',
+]
+
+ICS_STATUS = {
+    'scheduled': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'in_progress': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+class Echo:
+    """File-like object whose write() returns the value, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def staff_name(row):
+    return f"{row['assigned_staff__user__first_name'] or ''} {row['assigned_staff__user__last_name'] or ''}".strip()
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER)
+    for row in rows:
+        start = timezone.localtime(row['start_time'])
+        yield writer.writerow([
+            row['id'],
+            start.date().isoformat(),
+            start.isoformat(),
+            timezone.localtime(row['end_time']).isoformat(),
+            row['shift_type__code'],
+            row['shift_type__name'],
+            row['status'],
+            row['assigned_staff_id'] or '',
+            row['assigned_staff__employee_id'] or '',
+            staff_name(row),
+            row['assigned_staff__team__code'] or '',
+            row['telescope__name'] or '',
+            row['description'],
+        ])
+
+
+def ics_escape(value):
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def ics_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def ics_line(line):
+    """Fold a content line to 75 octets as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # Do not split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def ics_local_time(name, values):
+    """
+    A DTSTART/DTEND/EXDATE line in local time, so repeating events keep
+    their wall-clock time across DST changes (UTC when that is the zone)
+    """
+    tz_name = timezone.get_current_timezone_name()
+    if tz_name == 'UTC':
+        return f"{name}:{','.join(ics_time(value) for value in values)}"
+    local = ','.join(timezone.localtime(value).strftime('%Y%m%dT%H%M%S') for value in values)
+    return f'{name};TZID={tz_name}:{local}'
+
+
+def ics_event(row, uid, times):
+    summary = f"{row['shift_type__name']} ({row['shift_type__code']})"
+    name = staff_name(row)
+    if name:
+        summary = f'{summary} - {name}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f"DTSTAMP:{ics_time(row['updated_at'])}",
+        f"LAST-MODIFIED:{ics_time(row['updated_at'])}",
+        *times,
+        f'SUMMARY:{ics_escape(summary)}',
+        f"STATUS:{ICS_STATUS.get(row['status'], 'TENTATIVE')}",
+    ]
+    if row['telescope__name']:
+        lines.append(f"LOCATION:{ics_escape(row['telescope__name'])}")
+    if row['description']:
+        lines.append(f"DESCRIPTION:{ics_escape(row['description'])}")
+    lines.append('END:VEVENT')
+    return ''.join(ics_line(line) for line in lines)
+
+
+def iter_ics(rows, calendar_name='Shifts', domain='shift-scheduler', recurring=(), materialised=None):
+    """
+    ``recurring`` RecurringShifts become repeating events; ``materialised``
+    maps their ids to the dates stored as Shifts, which are excluded.
+    """
+    yield ics_line('BEGIN:VCALENDAR')
+    yield ics_line('VERSION:2.0')
+    yield ics_line('PRODID:-//Observatory Shift Scheduler//EN')
+    yield ics_line('CALSCALE:GREGORIAN')
+    yield ics_line(f'X-WR-CALNAME:{ics_escape(calendar_name)}')
+    for row in rows:
+        times = [f"DTSTART:{ics_time(row['start_time'])}", f"DTEND:{ics_time(row['end_time'])}"]
+        yield ics_event(row, f"shift-{row['id']}@{domain}", times)
+    for rule in recurring:
+        # DTSTART must be the first occurrence
+        first = first_occurrence(rule.rule, rule.dtstart)
+        occurrence = rule.occurrence(first)
+        row = occurrence_values(occurrence, EXPORT_FIELDS)
+        row['updated_at'] = rule.updated_at
+        times = [
+            ics_local_time('DTSTART', [occurrence.start_time]),
+            ics_local_time('DTEND', [occurrence.end_time]),
+            f'RRULE:{to_rrule(rule.rule)}',
+        ]
+        skipped = sorted({date.fromisoformat(day) for day in rule.exdates} | set((materialised or {}).get(rule.id, ())))
+        if skipped:
+            starts = [occurrence_times(day, rule.start_time, rule.end_time)[0] for day in skipped]
+            times.append(ics_local_time('EXDATE', starts))
+        yield ics_event(row, f'recurring-shift-{rule.id}@{domain}', times)
+    yield ics_line('END:VCALENDAR')
+
+
+def export_validators(queryset, file_format, recurring=None):
+    """
+    Return (etag, last_modified) for the filtered queryset with one aggregate
+    query, plus one for the filtered RecurringShifts when given
+    """
+    summary = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    last_modified = summary['last_modified']
+    key = f"{file_format}:{summary['count']}:{last_modified.isoformat() if last_modified else ''}"
+    if recurring is not None:
+        rules = recurring.order_by().aggregate(last_modified=Max('updated_at'), count=Count('id'))
+        if rules['last_modified'] and (last_modified is None or rules['last_modified'] > last_modified):
+            last_modified = rules['last_modified']
+        key = f"{key}:{rules['count']}:{rules['last_modified'].isoformat() if rules['last_modified'] else ''}"
+    digest = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"', last_modified
+
+
+def export_response(request, queryset, file_format, filename='shifts', occurrences=(), recurring=None):
+    """
+    Stream the queryset as CSV or iCalendar, or answer 304 if unchanged.
+    CSV merges in ``occurrences`` (sorted unsaved Shifts); iCalendar adds the
+    ``recurring`` RecurringShift queryset as repeating events.
+    """
+    etag, last_modified = export_validators(queryset, file_format, recurring)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if not_modified is not None:
+        return not_modified
+
+    rows = queryset.values(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'ics':
+        rules = list(recurring) if recurring is not None else []
+        materialised = {}
+        if rules:
+            for rule_id, day in Shift.objects.filter(recurrence__in=rules).values_list('recurrence_id', 'recurrence_date'):
+                materialised.setdefault(rule_id, []).append(day)
+        response = StreamingHttpResponse(
+            iter_ics(rows, domain=request.get_host(), recurring=rules, materialised=materialised),
+            content_type='text/calendar; charset=utf-8',
+        )
+    else:
+        if occurrences:
+            rows = heapq.merge(
+                rows, (occurrence_values(shift, EXPORT_FIELDS) for shift in occurrences),
+                key=lambda row: row['start_time'],
+            )
+        response = StreamingHttpResponse(iter_csv(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    response['ETag'] = etag
+    if timestamp is not None:
+        response['Last-Modified'] = http_date(timestamp)
+    # Clients may keep the file but must revalidate before using it
+    patch_cache_control(response, no_cache=True)
+    return response
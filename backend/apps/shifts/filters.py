@@ -0,0 +1,88 @@
+import django_filters
+from django.utils import timezone
+from .models import Shift, RecurringShift, MAX_SHIFT_DURATION
+
+
+class ShiftFilter(django_filters.FilterSet):
+    """
+    Filters for Shift lists, including date-range and overlap lookups.
+    
+    ``overlaps_start``/``overlaps_end`` select shifts intersecting the
+    half-open window [overlaps_start, overlaps_end). Because shifts never
+    last longer than MAX_SHIFT_DURATION, the lower bound is also applied to
+    start_time so the (start_time, end_time) index keeps the scan bounded
+    to the window instead of all earlier history.
+    """
+    start_time__gte = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='gte')
+    start_time__gt = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='gt')
+    start_time__lte = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='lte')
+    start_time__lt = django_filters.IsoDateTimeFilter(field_name='start_time', lookup_expr='lt')
+    end_time__gte = django_filters.IsoDateTimeFilter(field_name='end_time', lookup_expr='gte')
+    end_time__lte = django_filters.IsoDateTimeFilter(field_name='end_time', lookup_expr='lte')
+    overlaps_start = django_filters.IsoDateTimeFilter(method='filter_overlaps_start')
+    overlaps_end = django_filters.IsoDateTimeFilter(method='filter_overlaps_end')
+    team = django_filters.NumberFilter(field_name='assigned_staff__team')
+    schedule = django_filters.NumberFilter(field_name='schedules')
+    
+    class Meta:
+        model = Shift
+        fields = ['shift_type', 'status', 'assigned_staff', 'telescope']
+    
+    def filter_overlaps_start(self, queryset, name, value):
+        return queryset.filter(
+            start_time__gt=value - MAX_SHIFT_DURATION,
+            end_time__gt=value,
+        )
+    
+    def filter_overlaps_end(self, queryset, name, value):
+        return queryset.filter(start_time__lt=value)
+    
+    # Recurring shift occurrences (apps.shifts.recurrence) are not rows, so
+    # the same filters are applied to their rules and, for times, in Python
+    
+    def occurrence_window(self):
+        """
+        (first, last) local dates occurrences matching the time filters can
+        fall on, or None when the filters leave either end open.
+        """
+        data = self.form.cleaned_data
+        lower = [data[name] for name in ('start_time__gte', 'start_time__gt') if data.get(name)]
+        if data.get('overlaps_start'):
+            lower.append(data['overlaps_start'] - MAX_SHIFT_DURATION)
+        upper = [data[name] for name in ('start_time__lte', 'start_time__lt', 'overlaps_end') if data.get(name)]
+        if not lower or not upper:
+            return None
+        return timezone.localdate(max(lower)), timezone.localdate(min(upper))
+    
+    def recurring_queryset(self, first=None, last=None):
+        """RecurringShifts that can have occurrences matching the non-time filters within [first, last]"""
+        data = self.form.cleaned_data
+        # Occurrences are never cancelled nor part of a schedule
+        if data.get('status') not in (None, '', 'scheduled') or data.get('schedule') is not None:
+            return RecurringShift.objects.none()
+        queryset = RecurringShift.objects.all()
+        if last is not None:
+            queryset = queryset.filter(dtstart__lte=last)
+        if first is not None:
+            queryset = queryset.exclude(last_date__lt=first)
+        for name in ('shift_type', 'assigned_staff', 'telescope'):
+            if data.get(name) is not None:
+                queryset = queryset.filter(**{name: data[name]})
+        if data.get('team') is not None:
+            queryset = queryset.filter(assigned_staff__team=data['team'])
+        return queryset
+    
+    def occurrence_matches(self, shift):
+        """Whether an occurrence passes the time filters"""
+        data = self.form.cleaned_data
+        checks = [
+            ('start_time__gte', lambda value: shift.start_time >= value),
+            ('start_time__gt', lambda value: shift.start_time > value),
+            ('start_time__lte', lambda value: shift.start_time <= value),
+            ('start_time__lt', lambda value: shift.start_time < value),
+            ('end_time__gte', lambda value: shift.end_time >= value),
+            ('end_time__lte', lambda value: shift.end_time <= value),
+            ('overlaps_start', lambda value: shift.end_time > value),
+            ('overlaps_end', lambda value: shift.start_time < value),
+        ]
+        return all(check(data[name]) for name, check in checks if data.get(name))
@@ -0,0 +1,63 @@
+"""
+Management command to fill unassigned shifts for a team automatically.
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.staff.models import Team, ShiftType
+from apps.shifts.models import Schedule
+from apps.shifts.scheduler import AutoScheduler
+
+
+class Command(BaseCommand):
+    help = 'Assigns staff to unassigned shifts respecting availability and rest rules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', required=True, help='Team code (e.g. OBS)')
+        parser.add_argument('--start', required=True, type=date.fromisoformat, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', required=True, type=date.fromisoformat, help='Last day, inclusive (YYYY-MM-DD)')
+        parser.add_argument(
+            '--shift-types',
+            help='Comma-separated shift type codes to fill (default: all of the team\'s types)'
+        )
+        parser.add_argument('--schedule', type=int, help='Only fill shifts belonging to this schedule id')
+        parser.add_argument('--dry-run', action='store_true', help='Compute assignments without saving them')
+
+    def handle(self, *args, **options):
+        try:
+            team = Team.objects.get(code=options['team'])
+        except Team.DoesNotExist:
+            raise CommandError(f'Team "{options["team"]}" does not exist')
+        
+        if options['end'] < options['start']:
+            raise CommandError('--end must be on or after --start')
+        
+        shift_types = None
+        if options['shift_types']:
+            codes = [code.strip() for code in options['shift_types'].split(',')]
+            shift_types = list(ShiftType.objects.filter(team=team, code__in=codes))
+            missing = set(codes) - {shift_type.code for shift_type in shift_types}
+            if missing:
+                raise CommandError(f'Unknown shift type codes for {team.code}: {", ".join(sorted(missing))}')
+        
+        schedule = None
+        if options['schedule']:
+            try:
+                schedule = Schedule.objects.get(pk=options['schedule'])
+            except Schedule.DoesNotExist:
+                raise CommandError(f'Schedule {options["schedule"]} does not exist')
+        
+        scheduler = AutoScheduler(team, options['start'], options['end'], shift_types=shift_types, schedule=schedule)
+        result = scheduler.run(dry_run=options['dry_run'])
+        
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(result["assigned"])} shifts for {team.name}'))
+        if result['unfilled']:
+            self.stdout.write(self.style.WARNING(
+                f'{len(result["unfilled"])} shifts could not be filled without breaking hard constraints'
+            ))
+        
+        penalties = result['penalties']
+        self.stdout.write('\nSoft penalties:')
+        self.stdout.write(f'  Assignments on "?" days: {penalties["maybe_days"]}')
+        self.stdout.write(f'  Night/day preference mismatches: {penalties["preference_mismatches"]}')
+        self.stdout.write(f'  Hours spread across team: {penalties["hours_spread"]}')
@@ -0,0 +1,125 @@
+"""
+Management command to benchmark the main API endpoints on synthetic data.
+
+Each data size is seeded into a fresh test database (the configured
+database is never touched), every endpoint is measured, and the results
+are written as JSON so runs on different commits can be compared:
+
+    python manage.py benchmark_api --sizes 50 200 --output before.json
+    python manage.py benchmark_api --sizes 50 200 --compare before.json
+
+With --compare the command fails when a query count grew or a median
+latency regressed by more than --threshold percent.
+"""
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from apps.shifts.benchmark import ENDPOINTS, seed_dataset, benchmark_endpoints, compare
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks latency, query count and memory of key API endpoints at several data sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[50, 200],
+            help='Numbers of staff to benchmark with (default: 50 200)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=180,
+            help='Days of shifts and availability to seed (default: 180)'
+        )
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint (default: 5)')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=list(ENDPOINTS),
+            help='Only benchmark this endpoint (repeatable)'
+        )
+        parser.add_argument('--output', help='Write results to this JSON file')
+        parser.add_argument('--compare', help='Baseline JSON file to check for regressions')
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=25,
+            help='Allowed median latency regression in percent (default: 25)'
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 31:
+            raise CommandError('--days must be at least 31')
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Cannot read baseline {options["compare"]}: {exc}')
+
+        results = []
+        setup_test_environment()
+        try:
+            for size in options['sizes']:
+                self.stdout.write(f'Seeding {size} staff x {options["days"]} days...')
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    schedule = seed_dataset(size, options['days'], options['seed'])
+                    measured = benchmark_endpoints(schedule, options['repeat'], options['endpoint'])
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+                for endpoint, row in measured.items():
+                    results.append({'staff': size, 'endpoint': endpoint, **row})
+                    self.stdout.write(
+                        f'  {endpoint:<26} {row["median_ms"]:>9.2f}ms median  {row["p95_ms"]:>9.2f}ms p95  '
+                        f'{row["queries"]:>3} queries  {row["peak_kb"]:>9.1f}KB peak'
+                    )
+        finally:
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'commit': self.git_commit(),
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'days': options['days'],
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {len(results)} results to {options["output"]}'))
+
+        if baseline is not None:
+            problems = compare(baseline, report, options['threshold'] / 100)
+            if problems:
+                for problem in problems:
+                    self.stdout.write(self.style.ERROR(f'  ✗ {problem}'))
+                raise CommandError(f'{len(problems)} regression(s) against {options["compare"]}')
+            self.stdout.write(self.style.SUCCESS(f'✓ No regressions against {options["compare"]}'))
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,85 @@
+"""
+Management command to generate shifts from a weekly ShiftType rotation.
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.staff.models import Team
+from apps.observatory.models import Telescope
+from apps.shifts.models import Schedule
+from apps.shifts.rotation import materialise_rotation
+from apps.shifts.serializers import RotationSerializer
+
+
+class Command(BaseCommand):
+    help = 'Generates shifts for a team from a weekly pattern of shift type codes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--team', required=True, help='Team code (e.g. OBS)')
+        parser.add_argument('--start', required=True, type=date.fromisoformat, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', required=True, type=date.fromisoformat, help='Last day, inclusive (YYYY-MM-DD)')
+        parser.add_argument(
+            '--pattern',
+            action='append',
+            required=True,
+            help='Weekday and shift type codes, e.g. daily=1,2,3,4 or sat=B (repeatable)'
+        )
+        parser.add_argument('--schedule', type=int, help='Attach shifts to this existing schedule id')
+        parser.add_argument('--name', help='Create a new draft schedule with this name and attach shifts to it')
+        parser.add_argument('--telescope', help='Telescope code to set on every shift')
+
+    def handle(self, *args, **options):
+        try:
+            team = Team.objects.get(code=options['team'])
+        except Team.DoesNotExist:
+            raise CommandError(f'Team "{options["team"]}" does not exist')
+        
+        pattern = {}
+        for entry in options['pattern']:
+            day, _, codes = entry.partition('=')
+            if not codes:
+                raise CommandError(f'Invalid pattern "{entry}", expected weekday=code,code')
+            pattern[day.strip().lower()] = [code.strip() for code in codes.split(',') if code.strip()]
+        
+        data = {
+            'team': team.id,
+            'start_date': options['start'],
+            'end_date': options['end'],
+            'pattern': pattern,
+        }
+        if options['telescope']:
+            telescope = Telescope.objects.filter(code=options['telescope']).first()
+            if telescope is None:
+                raise CommandError(f'Telescope "{options["telescope"]}" does not exist')
+            data['telescope'] = telescope.id
+        
+        serializer = RotationSerializer(data=data)
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        params = serializer.validated_data
+        
+        schedule = None
+        if options['schedule']:
+            try:
+                schedule = Schedule.objects.get(pk=options['schedule'])
+            except Schedule.DoesNotExist:
+                raise CommandError(f'Schedule {options["schedule"]} does not exist')
+        elif options['name']:
+            schedule = Schedule.objects.create(
+                name=options['name'],
+                start_date=params['start_date'],
+                end_date=params['end_date'],
+            )
+        
+        created = materialise_rotation(
+            params['start_date'],
+            params['end_date'],
+            params['weekly'],
+            schedule=schedule,
+            telescope=params.get('telescope'),
+        )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Created {created} shifts for {team.name} from {params["start_date"]} to {params["end_date"]}'
+        ))
+        if schedule:
+            self.stdout.write(self.style.SUCCESS(f'✓ Attached to schedule: {schedule.name}'))
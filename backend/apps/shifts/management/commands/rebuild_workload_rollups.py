@@ -0,0 +1,32 @@
+"""
+Management command to recompute monthly workload rollups.
+
+Use after enabling WORKLOAD_ROLLUPS or after bulk edits that bypass model
+signals (queryset.update, bulk_create).
+"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.staff.models import StaffMember, Team
+from apps.shifts.analytics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recomputes per-staff monthly workload rollups from shifts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', required=True, type=date.fromisoformat, help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', required=True, type=date.fromisoformat, help='Last day, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--team', help='Team code (default: all teams)')
+
+    def handle(self, *args, **options):
+        if options['end'] < options['start']:
+            raise CommandError('--end must be on or after --start')
+        
+        staff = StaffMember.objects.all()
+        if options['team']:
+            if not Team.objects.filter(code=options['team']).exists():
+                raise CommandError(f'Team "{options["team"]}" does not exist')
+            staff = staff.filter(team__code=options['team'])
+        
+        count = rebuild_rollups(options['start'], options['end'], staff)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {count} monthly rollups'))
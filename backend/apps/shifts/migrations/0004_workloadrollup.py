@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0003_migrate_shift_type_data'),
+        ('staff', '0004_add_not_set_availability_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkloadRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('shifts', models.PositiveIntegerField(default=0)),
+                ('hours', models.FloatField(default=0)),
+                ('night_shifts', models.PositiveIntegerField(default=0)),
+                ('weekend_shifts', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('staff_member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='workload_rollups', to='staff.staffmember')),
+            ],
+            options={
+                'ordering': ['month', 'staff_member'],
+                'unique_together': {('staff_member', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shifts', '0004_workloadrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('payload', models.BinaryField(blank=True, help_text='gzip JSON, empty while stale', null=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+                ('schedule', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='shifts.schedule')),
+            ],
+        ),
+    ]
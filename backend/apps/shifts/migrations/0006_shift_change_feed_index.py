@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observatory', '0001_initial'),
+        ('shifts', '0005_schedulesnapshot'),
+        ('staff', '0007_tombstone_change_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shift',
+            index=models.Index(fields=['updated_at', 'id'], name='shifts_shif_updated_fca743_idx'),
+        ),
+    ]
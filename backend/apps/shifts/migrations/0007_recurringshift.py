@@ -0,0 +1,59 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:04
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('observatory', '0001_initial'),
+        ('shifts', '0006_shift_change_feed_index'),
+        ('staff', '0007_tombstone_change_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shift',
+            name='recurrence_date',
+            field=models.DateField(blank=True, help_text='Date of the occurrence this shift replaces', null=True),
+        ),
+        migrations.CreateModel(
+            name='RecurringShift',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rrule', models.CharField(help_text='Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,TU,WE,TH', max_length=200)),
+                ('dtstart', models.DateField(help_text='Date the rule starts from')),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField(help_text='Ends the next day when not after start_time')),
+                ('exdates', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Dates skipped')),
+                ('last_date', models.DateField(blank=True, editable=False, help_text='Date of the final occurrence, empty if endless', null=True)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assigned_staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_shifts', to='staff.staffmember')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_recurring_shifts', to=settings.AUTH_USER_MODEL)),
+                ('shift_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recurring_shifts', to='staff.shifttype')),
+                ('telescope', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recurring_shifts', to='observatory.telescope')),
+            ],
+            options={
+                'ordering': ['dtstart', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='shift',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='overrides', to='shifts.recurringshift'),
+        ),
+        migrations.AddConstraint(
+            model_name='shift',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurrence__isnull', False)), fields=('recurrence', 'recurrence_date'), name='unique_recurrence_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringshift',
+            index=models.Index(fields=['dtstart', 'last_date'], name='shifts_recu_dtstart_75d05f_idx'),
+        ),
+    ]
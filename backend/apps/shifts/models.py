@@ -1,8 +1,14 @@
+from datetime import timedelta
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from apps.staff.models import StaffMember, ShiftType
 from apps.observatory.models import Telescope
 
 
+# Longest allowed shift; lets overlap queries bound their index range scans
+MAX_SHIFT_DURATION = timedelta(days=7)
+
+
 class Shift(models.Model):
     """
     Represents a single shift assignment.
@@ -49,6 +55,16 @@ class Shift(models.Model):
     description = models.TextField(blank=True)
     notes = models.TextField(blank=True, help_text="Internal notes")
     
+    # Set on a materialised occurrence of a recurring shift
+    recurrence = models.ForeignKey(
+        'RecurringShift',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='overrides'
+    )
+    recurrence_date = models.DateField(null=True, blank=True, help_text="Date of the occurrence this shift replaces")
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -64,6 +80,15 @@ class Shift(models.Model):
         indexes = [
             models.Index(fields=['start_time', 'end_time']),
             models.Index(fields=['assigned_staff', 'start_time']),
+            # Change feed (apps.staff.sync) keyset order
+            models.Index(fields=['updated_at', 'id']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence', 'recurrence_date'],
+                condition=models.Q(recurrence__isnull=False),
+                name='unique_recurrence_occurrence',
+            ),
         ]
     
     def __str__(self):
@@ -82,10 +107,97 @@ class Shift(models.Model):
         return self.shift_type.code if self.shift_type else "?"
     
     def clean(self):
-        """Validate that end_time is after start_time"""
+        """Validate timing and that the assignment does not clash with other shifts or availability"""
         from django.core.exceptions import ValidationError
         if self.end_time <= self.start_time:
             raise ValidationError('End time must be after start time')
+        if self.end_time - self.start_time > MAX_SHIFT_DURATION:
+            raise ValidationError(f'Shifts cannot last longer than {MAX_SHIFT_DURATION.days} days')
+        if self.assigned_staff_id and self.status != 'cancelled':
+            from .conflicts import check_shift
+            errors = check_shift(self.assigned_staff_id, self.start_time, self.end_time, exclude_id=self.pk)
+            if errors:
+                raise ValidationError({'assigned_staff': errors})
+
+
+class RecurringShift(models.Model):
+    """
+    A standing shift pattern (e.g. Day Shift Lead every Mon-Thu) stored as a
+    recurrence rule and expanded into occurrences on demand; see
+    apps.shifts.recurrence.
+    """
+    shift_type = models.ForeignKey(ShiftType, on_delete=models.PROTECT, related_name='recurring_shifts')
+    assigned_staff = models.ForeignKey(
+        StaffMember,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recurring_shifts'
+    )
+    telescope = models.ForeignKey(
+        Telescope,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recurring_shifts'
+    )
+    
+    # Pattern
+    rrule = models.CharField(max_length=200, help_text="Recurrence rule, e.g. FREQ=WEEKLY;BYDAY=MO,TU,WE,TH")
+    dtstart = models.DateField(help_text="Date the rule starts from")
+    start_time = models.TimeField()
+    end_time = models.TimeField(help_text="Ends the next day when not after start_time")
+    exdates = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder, help_text="Dates skipped")
+    last_date = models.DateField(
+        null=True, blank=True, editable=False, help_text="Date of the final occurrence, empty if endless"
+    )
+    
+    description = models.TextField(blank=True)
+    
+    # Metadata
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='created_recurring_shifts'
+    )
+    
+    class Meta:
+        ordering = ['dtstart', 'id']
+        indexes = [
+            models.Index(fields=['dtstart', 'last_date']),
+        ]
+    
+    def __str__(self):
+        staff_name = self.assigned_staff.full_name if self.assigned_staff else "Unassigned"
+        return f"{self.shift_type.name} - {staff_name} ({self.rrule} from {self.dtstart})"
+    
+    @property
+    def rule(self):
+        from .recurrence import parse_rrule
+        return parse_rrule(self.rrule)
+    
+    def save(self, *args, **kwargs):
+        from .recurrence import last_occurrence
+        self.last_date = last_occurrence(self.rule, self.dtstart)
+        super().save(*args, **kwargs)
+    
+    def occurrence(self, day):
+        """Unsaved Shift for the occurrence on ``day``"""
+        from .recurrence import occurrence_times
+        start, end = occurrence_times(day, self.start_time, self.end_time)
+        return Shift(
+            shift_type=self.shift_type,
+            assigned_staff=self.assigned_staff,
+            telescope=self.telescope,
+            start_time=start,
+            end_time=end,
+            description=self.description,
+            recurrence=self,
+            recurrence_date=day,
+        )
 
 
 class Schedule(models.Model):
@@ -128,7 +240,9 @@ class Schedule(models.Model):
     
     @property
     def total_shifts(self):
-        """Count total shifts in this schedule"""
+        """Count total shifts in this schedule (uses the annotated count when present)"""
+        if hasattr(self, 'shift_count'):
+            return self.shift_count
         return self.shifts.count()
     
     def clean(self):
@@ -136,3 +250,51 @@ class Schedule(models.Model):
         from django.core.exceptions import ValidationError
         if self.end_date <= self.start_date:
             raise ValidationError('End date must be after start date')
+
+
+class WorkloadRollup(models.Model):
+    """
+    Monthly totals of a staff member's assigned, non-cancelled shifts.
+    Kept current on Shift save/delete when WORKLOAD_ROLLUPS is enabled.
+    """
+    staff_member = models.ForeignKey(
+        StaffMember,
+        on_delete=models.CASCADE,
+        related_name='workload_rollups'
+    )
+    month = models.DateField(help_text="First day of the month")
+    
+    shifts = models.PositiveIntegerField(default=0)
+    hours = models.FloatField(default=0)
+    night_shifts = models.PositiveIntegerField(default=0)
+    weekend_shifts = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['month', 'staff_member']
+        unique_together = [['staff_member', 'month']]
+    
+    def __str__(self):
+        return f"{self.staff_member} {self.month:%Y-%m}: {self.shifts} shifts, {self.hours:.1f}h"
+
+
+class ScheduleSnapshot(models.Model):
+    """
+    Serialized, gzip-compressed JSON of a published Schedule as retrieve
+    renders it. Built on publish and served until a member shift (or data
+    shown with it) changes, which clears the payload; the next build bumps
+    the version.
+    """
+    schedule = models.OneToOneField(
+        Schedule,
+        on_delete=models.CASCADE,
+        related_name='snapshot'
+    )
+    version = models.PositiveIntegerField(default=0)
+    payload = models.BinaryField(null=True, blank=True, help_text="gzip JSON, empty while stale")
+    built_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        state = 'current' if self.payload is not None else 'stale'
+        return f"{self.schedule} v{self.version} ({state})"
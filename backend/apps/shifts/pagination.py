@@ -0,0 +1,10 @@
+from apps.staff.pagination import KeysetPagination, SelectablePagination
+
+
+class ShiftKeysetPagination(KeysetPagination):
+    ordering = ('start_time', 'id')
+
+
+class ShiftPagination(SelectablePagination):
+    """Page numbers by default, keyset on (start_time, id) on request"""
+    keyset_class = ShiftKeysetPagination
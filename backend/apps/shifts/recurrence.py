@@ -0,0 +1,360 @@
+"""
+Recurring shifts: RRULE parsing and lazy occurrence expansion.
+
+A RecurringShift stores a standing pattern such as "Day Shift Lead every
+Mon-Thu" once, as an RFC 5545 recurrence rule
+(``FREQ=WEEKLY;BYDAY=MO,TU,WE,TH``) starting on ``dtstart``, instead of one
+Shift row per day. Occurrences are worked out on demand for the window a
+request asks about and come back as unsaved Shift instances (``id`` None,
+``recurrence`` and ``recurrence_date`` set), so serializers, the calendar
+and exports treat them like stored shifts.
+
+Editing one occurrence materialises it: a concrete Shift is stored with
+``recurrence``/``recurrence_date`` pointing back at the rule, and from
+then on it replaces that date's occurrence. Dates listed in ``exdates``
+are skipped; deleting a materialised Shift adds its date there so the
+occurrence stays gone.
+
+The shift list (with a bounded start_time window), the calendar and the
+CSV export merge occurrences in with stored shifts; the iCalendar export
+emits each rule once with its RRULE for calendar clients to expand.
+
+Supported rule parts: FREQ (DAILY or WEEKLY), INTERVAL, BYDAY (plain
+weekdays), COUNT and UNTIL. Weeks start on Monday and, as in most
+implementations, ``dtstart`` is only an occurrence when it matches BYDAY.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from functools import cmp_to_key
+from itertools import islice
+
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from apps.staff.pagination import KeysetPagination
+
+
+FREQUENCIES = ('DAILY', 'WEEKLY')
+WEEKDAY_CODES = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# Keep COUNT rules cheap to walk from their start
+MAX_COUNT = 1000
+MAX_INTERVAL = 52
+
+# Longest window one request may expand
+MAX_EXPANSION_DAYS = 3 * 366
+
+
+class Rule:
+    """A parsed recurrence rule"""
+
+    def __init__(self, freq, interval=1, byday=(), count=None, until=None):
+        self.freq = freq
+        self.interval = interval
+        self.byday = tuple(sorted(set(byday)))
+        self.count = count
+        self.until = until
+
+
+def parse_until(value):
+    # UNTIL is a date (20250630) or a UTC date-time (20250630T235959Z)
+    return datetime.strptime(value[:8], '%Y%m%d').date()
+
+
+def parse_rrule(text):
+    """Parse an RRULE string into a Rule; raises ValueError with a readable message"""
+    text = text.strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[6:]
+    parts = {}
+    for part in filter(None, text.split(';')):
+        name, sep, value = part.partition('=')
+        if not sep or not value:
+            raise ValueError(f'Malformed rule part: {part}')
+        parts[name.strip().upper()] = value.strip().upper()
+
+    freq = parts.pop('FREQ', None)
+    if freq not in FREQUENCIES:
+        raise ValueError(f'FREQ must be one of {", ".join(FREQUENCIES)}')
+    kwargs = {}
+    try:
+        if 'INTERVAL' in parts:
+            kwargs['interval'] = int(parts.pop('INTERVAL'))
+            if not 1 <= kwargs['interval'] <= MAX_INTERVAL:
+                raise ValueError
+        if 'COUNT' in parts:
+            kwargs['count'] = int(parts.pop('COUNT'))
+            if not 1 <= kwargs['count'] <= MAX_COUNT:
+                raise ValueError
+        if 'UNTIL' in parts:
+            kwargs['until'] = parse_until(parts.pop('UNTIL'))
+    except ValueError:
+        raise ValueError(
+            f'INTERVAL must be between 1 and {MAX_INTERVAL}, COUNT between 1 and {MAX_COUNT}, UNTIL a date'
+        )
+    if 'count' in kwargs and 'until' in kwargs:
+        raise ValueError('COUNT and UNTIL cannot be combined')
+    if 'BYDAY' in parts:
+        days = parts.pop('BYDAY').split(',')
+        unknown = [day for day in days if day not in WEEKDAY_CODES]
+        if unknown:
+            raise ValueError(f'Unsupported BYDAY values: {", ".join(unknown)}')
+        kwargs['byday'] = [WEEKDAY_CODES.index(day) for day in days]
+    # Weeks always start on Monday
+    if parts.get('WKST') == 'MO':
+        del parts['WKST']
+    if parts:
+        raise ValueError(f'Unsupported rule parts: {", ".join(sorted(parts))}')
+    return Rule(freq, **kwargs)
+
+
+def occurrence_dates(rule, dtstart, start, end):
+    """Dates of ``rule`` from ``dtstart`` that fall within [start, end], in order"""
+    last = end if rule.until is None else min(end, rule.until)
+    # COUNT rules are walked from the start to number their occurrences;
+    # others jump straight to the period holding ``start``
+    first = dtstart if rule.count is not None else max(dtstart, start)
+    produced = 0
+
+    if rule.freq == 'DAILY':
+        step = rule.interval
+        day = dtstart + timedelta(days=-(-(first - dtstart).days // step) * step)
+        while day <= last:
+            if not rule.byday or day.weekday() in rule.byday:
+                produced += 1
+                if rule.count is not None and produced > rule.count:
+                    return
+                if day >= start:
+                    yield day
+            day += timedelta(days=step)
+        return
+
+    weekdays = rule.byday or (dtstart.weekday(),)
+    week0 = dtstart - timedelta(days=dtstart.weekday())
+    periods = (first - week0).days // 7 // rule.interval
+    week = week0 + timedelta(weeks=periods * rule.interval)
+    while week <= last:
+        for weekday in weekdays:
+            day = week + timedelta(days=weekday)
+            if day < dtstart:
+                continue
+            if day > last:
+                return
+            produced += 1
+            if rule.count is not None and produced > rule.count:
+                return
+            if day >= start:
+                yield day
+        week += timedelta(weeks=rule.interval)
+
+
+def first_occurrence(rule, dtstart):
+    """Date of the rule's first occurrence, or None if it has none"""
+    # A rule with any occurrences has one in every span of ``interval`` weeks
+    # (after the first, partial week)
+    return next(occurrence_dates(rule, dtstart, dtstart, dtstart + timedelta(weeks=2 * rule.interval)), None)
+
+
+def last_occurrence(rule, dtstart):
+    """Date of the rule's final occurrence, or None if it repeats forever"""
+    if rule.until is not None:
+        end = rule.until
+    elif rule.count is not None:
+        # At least one occurrence per ``interval`` weeks (see above)
+        end = dtstart + timedelta(weeks=rule.interval * (rule.count + 1))
+    else:
+        return None
+    last = None
+    for last in occurrence_dates(rule, dtstart, dtstart, end):
+        pass
+    return last
+
+
+def occurrence_times(day, start_time, end_time):
+    """Aware (start, end) of an occurrence on ``day``; ends the next day when end_time is not after start_time"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, start_time), tz)
+    end = timezone.make_aware(datetime.combine(day, end_time), tz)
+    if end <= start:
+        end = timezone.make_aware(datetime.combine(day + timedelta(days=1), end_time), tz)
+    return start, end
+
+
+def expand(rules, start_date, end_date):
+    """
+    Unsaved Shift instances for every occurrence of ``rules`` (RecurringShift
+    instances, ideally with their relations selected) on dates within
+    [start_date, end_date], sorted by start time. Dates in a rule's
+    ``exdates`` or already materialised as a Shift are skipped (one query).
+    """
+    from .models import Shift
+
+    rules = list(rules)
+    if not rules:
+        return []
+    materialised = set(
+        Shift.objects.filter(
+            recurrence__in=rules, recurrence_date__gte=start_date, recurrence_date__lte=end_date
+        ).values_list('recurrence_id', 'recurrence_date')
+    )
+    occurrences = []
+    for recurring in rules:
+        skipped = {date.fromisoformat(day) for day in recurring.exdates}
+        for day in occurrence_dates(recurring.rule, recurring.dtstart, start_date, end_date):
+            if day in skipped or (recurring.id, day) in materialised:
+                continue
+            occurrences.append(recurring.occurrence(day))
+    occurrences.sort(key=lambda shift: (shift.start_time, shift.recurrence_id))
+    return occurrences
+
+
+def occurrence_values(shift, fields):
+    """``queryset.values(*fields)``-style dict for an unsaved occurrence"""
+    row = {}
+    for name in fields:
+        value = shift
+        for attr in name.split('__'):
+            value = getattr(value, attr, None)
+            if value is None:
+                break
+        row[name] = value
+    return row
+
+
+def to_rrule(rule):
+    """RFC 5545 RRULE value for ``rule`` (UNTIL as the end of that local day in UTC)"""
+    parts = [f'FREQ={rule.freq}']
+    if rule.interval != 1:
+        parts.append(f'INTERVAL={rule.interval}')
+    if rule.byday:
+        parts.append(f'BYDAY={",".join(WEEKDAY_CODES[day] for day in rule.byday)}')
+    if rule.count is not None:
+        parts.append(f'COUNT={rule.count}')
+    if rule.until is not None:
+        until = timezone.make_aware(datetime.combine(rule.until, time(23, 59, 59)))
+        parts.append(f'UNTIL={until.astimezone(dt_timezone.utc).strftime("%Y%m%dT%H%M%SZ")}')
+    return ';'.join(parts)
+
+
+class OccurrenceListMixin:
+    """
+    Merge recurring shift occurrences into a Shift viewset's list when its
+    ``filterset_class`` (a ShiftFilter) bounds start_time at both ends.
+    A page reads stored shifts only up to its end (see MergedShifts), through
+    the viewset's values serializer when it would use one. Keyset-paginated
+    lists (``?pagination=cursor``) walk stored shifts only.
+    """
+    occurrence_select_related = ('assigned_staff__user', 'assigned_staff__team', 'shift_type', 'telescope')
+
+    def get_occurrence_filterset(self, request):
+        """The bound, valid filterset of this request, or None"""
+        filterset = self.filterset_class(request.query_params, queryset=self.get_queryset(), request=request)
+        return filterset if filterset.is_valid() else None
+
+    def get_recurring(self, request, filterset, window=()):
+        """RecurringShifts matching the request's filters, within the (first, last) ``window`` if given"""
+        rules = filterset.recurring_queryset(*window).select_related(*self.occurrence_select_related)
+        return filters.SearchFilter().filter_queryset(request, rules, self)
+
+    def get_occurrences(self, request, filterset):
+        """Occurrences matching the request's filters, or [] when its window is open"""
+        window = filterset.occurrence_window()
+        if window is None:
+            return []
+        first, last = window
+        rules = list(self.get_recurring(request, filterset, window))
+        # Only the part of the window each rule is active in gets expanded
+        for rule in rules:
+            until = last if rule.last_date is None else min(last, rule.last_date)
+            if (until - max(first, rule.dtstart)).days >= MAX_EXPANSION_DAYS:
+                raise ValidationError(
+                    f'Date range cannot exceed {MAX_EXPANSION_DAYS} days when expanding recurring shifts'
+                )
+        return [shift for shift in expand(rules, first, last) if filterset.occurrence_matches(shift)]
+
+    def list(self, request, *args, **kwargs):
+        wants_keyset = getattr(self.paginator, 'wants_keyset', None)
+        filterset = self.get_occurrence_filterset(request)
+        occurrences = []
+        if filterset is not None and not (wants_keyset is not None and wants_keyset(request)):
+            occurrences = self.get_occurrences(request, filterset)
+        if not occurrences:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        # Occurrences only know their shift type's id, so shift_type sorts by it
+        columns = {'shift_type': 'shift_type_id'}
+        ordering = [
+            (columns.get(name.lstrip('-'), name.lstrip('-')), name.startswith('-'))
+            for name in filters.OrderingFilter().get_ordering(request, queryset, self) or ['start_time']
+        ]
+        queryset = queryset.order_by(*[('-' if descending else '') + attr for attr, descending in ordering], 'id')
+        if getattr(self, 'use_values_serializer', lambda: False)():
+            serializer_class = self.values_serializer_used = self.values_serializer_class
+            queryset = serializer_class.values(queryset)
+            occurrences = [occurrence_values(shift, serializer_class.columns) for shift in occurrences]
+            serialize = lambda rows: serializer_class(rows).data
+        else:
+            serialize = lambda rows: self.get_serializer(rows, many=True).data
+
+        shifts = MergedShifts(queryset, occurrences, ordering)
+        page = self.paginate_queryset(shifts)
+        if page is not None:
+            return self.get_paginated_response(serialize(page))
+        return Response(serialize(shifts[:]))
+
+
+class MergedShifts:
+    """
+    Stored shifts (a queryset already sorted by ``ordering``) and
+    occurrences as one sorted sequence for the paginator. A slice fetches
+    only the stored rows up to its end and merges the occurrences in;
+    stored shifts come first on ties. Rows may be model instances or
+    ``values()`` dicts.
+    """
+
+    def __init__(self, queryset, occurrences, ordering):
+        self.queryset = queryset
+        self.ordering = ordering
+        self.key = cmp_to_key(self.compare)
+        self.occurrences = sorted(occurrences, key=self.key)
+        self.count = None
+
+    def compare(self, a, b):
+        for attr, descending in self.ordering:
+            x, y = KeysetPagination.position_value(a, attr), KeysetPagination.position_value(b, attr)
+            if x != y:
+                return (x < y) - (x > y) if descending else (x > y) - (x < y)
+        return 0
+
+    def __len__(self):
+        if self.count is None:
+            self.count = self.queryset.count() + len(self.occurrences)
+        return self.count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        stored = self.queryset if index.stop is None else self.queryset[:index.stop]
+        return list(islice(heapq.merge(stored, self.occurrences, key=self.key), index.start, index.stop))
+
+def _skip_deleted_override(sender, instance, **kwargs):
+    # Without an override or an EXDATE the occurrence would come back
+    if instance.recurrence_id is None or instance.recurrence_date is None:
+        return
+    from .models import RecurringShift
+
+    recurring = RecurringShift.objects.filter(pk=instance.recurrence_id).first()
+    day = instance.recurrence_date.isoformat()
+    if recurring is not None and day not in recurring.exdates:
+        recurring.exdates = sorted([*recurring.exdates, day])
+        recurring.save(update_fields=['exdates', 'updated_at'])
+
+
+def register_override_signals():
+    from .models import Shift
+
+    post_delete.connect(_skip_deleted_override, sender=Shift, dispatch_uid='recurring-shift-override-delete')
@@ -0,0 +1,83 @@
+"""
+Materialise a weekly rotation of ShiftTypes into concrete Shift rows.
+
+A rotation pattern maps weekdays to lists of ShiftType codes, e.g.
+``{'daily': ['1', '2'], 'sat': ['B']}``. Every day in the range gets one
+shift per listed type, timed from the type's default start/end times.
+All rows are written with ``bulk_create`` and attached to a Schedule with
+a single bulk insert into the through table.
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.staff.events import publish, shift_event
+from .models import Shift, Schedule
+from .snapshots import invalidate_snapshots
+
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+
+# Upper bound on how many days one request may generate
+MAX_ROTATION_DAYS = 366
+
+
+def expand_pattern(pattern):
+    """
+    Turn a {weekday: [codes]} mapping into seven lists of codes (Monday first).
+    The 'daily' key applies to every weekday without its own entry.
+    """
+    daily = pattern.get('daily', [])
+    return [list(pattern.get(day, daily)) for day in WEEKDAYS]
+
+
+def shift_times(shift_type, day):
+    """Return aware (start, end) datetimes for a shift type on a given date"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, shift_type.default_start_time), tz)
+    if shift_type.default_end_time is not None:
+        end = timezone.make_aware(datetime.combine(day, shift_type.default_end_time), tz)
+        if end <= start:
+            end += timedelta(days=1)
+    else:
+        end = start + timedelta(hours=float(shift_type.default_duration_hours))
+    return start, end
+
+
+def materialise_rotation(start_date, end_date, weekly, schedule=None, telescope=None, created_by=None):
+    """
+    Create shifts for every day in [start_date, end_date] from ``weekly``,
+    a list of seven lists of ShiftType instances (Monday first).
+
+    Returns the number of shifts created.
+    """
+    shifts = []
+    day = start_date
+    while day <= end_date:
+        for shift_type in weekly[day.weekday()]:
+            start, end = shift_times(shift_type, day)
+            shifts.append(Shift(
+                shift_type=shift_type,
+                start_time=start,
+                end_time=end,
+                telescope=telescope,
+                created_by=created_by,
+            ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        created = Shift.objects.bulk_create(shifts, batch_size=500)
+        if schedule is not None:
+            Through = Schedule.shifts.through
+            Through.objects.bulk_create(
+                [Through(schedule_id=schedule.id, shift_id=shift.id) for shift in created],
+                batch_size=500,
+            )
+            Schedule.objects.filter(pk=schedule.pk).update(updated_at=timezone.now())
+            # The through-table insert sends no m2m_changed signal
+            invalidate_snapshots(schedule=schedule)
+        # bulk_create sends no post_save signals
+        publish([shift_event(shift) for shift in created])
+    return len(created)
+
@@ -0,0 +1,281 @@
+"""
+Automatic shift assignment.
+
+Fills unassigned Shift slots for a team over a date range. Hard constraints
+are never broken:
+- no shift on a day marked 'X' in DailyAvailability
+- at most one shift per staff member per day
+- at least ``min_rest_days`` days off between blocks of working days
+- no more than ``max_consecutive_nights`` night shifts in a row
+
+Within those, the engine minimises soft penalties: assignments on '?' days,
+uneven hours across the team, and night/day shifts that go against
+``prefers_night_shifts``.
+
+All state is loaded up front with a fixed number of queries and held in
+per-staff integer bitsets (bit i = day i of the horizon), so checking a
+candidate is a handful of bit operations rather than ORM queries.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.staff.bitmap import availability_bits
+from apps.staff.events import publish, shift_event
+from apps.staff.models import StaffMember
+from .calendar import day_bounds
+from .models import Shift
+from .snapshots import invalidate_snapshots
+
+
+# Shifts starting at or after this local hour (or crossing midnight) are nights
+NIGHT_START_HOUR = 16
+
+# Soft penalty weights
+MAYBE_PENALTY = 20.0
+PREFERENCE_PENALTY = 5.0
+FAIRNESS_WEIGHT = 1.0  # per hour already worked in the window
+
+
+def is_night_shift(start_time, end_time):
+    """Return True if a shift counts as a night shift"""
+    start = timezone.localtime(start_time)
+    end = timezone.localtime(end_time)
+    return start.hour >= NIGHT_START_HOUR or end.date() > start.date()
+
+
+def _previous_bit(mask, index):
+    """Index of the highest set bit below index, or None"""
+    below = mask & ((1 << index) - 1)
+    return below.bit_length() - 1 if below else None
+
+
+def _next_bit(mask, index):
+    """Index of the lowest set bit above index, or None"""
+    above = mask >> (index + 1)
+    if not above:
+        return None
+    return index + (above & -above).bit_length()
+
+
+def _run_length(mask, index):
+    """Length of the run of consecutive set bits containing index"""
+    length = 1
+    i = index - 1
+    while i >= 0 and (mask >> i) & 1:
+        length += 1
+        i -= 1
+    i = index + 1
+    while (mask >> i) & 1:
+        length += 1
+        i += 1
+    return length
+
+
+class StaffState:
+    """Per-staff bitsets and counters used while solving"""
+    __slots__ = ('member', 'work', 'nights', 'unavailable', 'maybe', 'hours')
+
+    def __init__(self, member):
+        self.member = member
+        self.work = 0
+        self.nights = 0
+        self.unavailable = 0
+        self.maybe = 0
+        self.hours = 0.0
+
+    def can_take(self, day, night):
+        """Check every hard constraint for working on the given day index"""
+        bit = 1 << day
+        if (self.work | self.unavailable) & bit:
+            return False
+
+        rest = self.member.min_rest_days
+        previous = _previous_bit(self.work, day)
+        if previous is not None and 0 < day - previous - 1 < rest:
+            return False
+        following = _next_bit(self.work, day)
+        if following is not None and 0 < following - day - 1 < rest:
+            return False
+
+        if night and _run_length(self.nights | bit, day) > self.member.max_consecutive_nights:
+            return False
+        return True
+
+    def cost(self, day, night):
+        """Soft penalty for working on the given day index"""
+        cost = FAIRNESS_WEIGHT * self.hours
+        if self.maybe & (1 << day):
+            cost += MAYBE_PENALTY
+        if night != self.member.prefers_night_shifts:
+            cost += PREFERENCE_PENALTY
+        return cost
+
+    def take(self, day, night, hours):
+        bit = 1 << day
+        self.work |= bit
+        if night:
+            self.nights |= bit
+        self.hours += hours
+
+
+class AutoScheduler:
+    """
+    Assigns active team members to the team's unassigned shifts.
+
+    Usage:
+        result = AutoScheduler(team, start_date, end_date).run()
+
+    Pass ``shift_types`` to limit which slots are filled, ``schedule`` to
+    only fill that schedule's shifts, and ``dry_run=True`` to ``run`` to
+    compute assignments without saving them.
+    """
+
+    def __init__(self, team, start_date, end_date, shift_types=None, schedule=None):
+        self.team = team
+        self.start_date = start_date
+        self.end_date = end_date
+        self.shift_types = shift_types
+        self.schedule = schedule
+
+    def run(self, dry_run=False):
+        if dry_run:
+            return self.solve()
+        with transaction.atomic():
+            result = self.solve(lock=True)
+            self.apply()
+        return result
+
+    def get_slots(self, lock=False):
+        range_start, range_end = day_bounds(self.start_date, self.end_date)
+        slots = Shift.objects.filter(
+            assigned_staff__isnull=True,
+            shift_type__team=self.team,
+            start_time__gte=range_start,
+            start_time__lt=range_end,
+        ).exclude(status='cancelled').order_by('start_time', 'id')
+        if self.shift_types is not None:
+            slots = slots.filter(shift_type__in=self.shift_types)
+        if self.schedule is not None:
+            slots = slots.filter(schedules=self.schedule)
+        if lock:
+            slots = slots.select_for_update()
+        return list(slots)
+
+    def load_state(self):
+        """Build per-staff bitsets from staff, existing shifts and availability"""
+        members = list(StaffMember.objects.filter(team=self.team, status='active').order_by('id'))
+        self.states = {member.id: StaffState(member) for member in members}
+
+        # Look far enough around the window that rest and night rules see
+        # the blocks worked just before and just after it
+        lookback = max(
+            [max(m.min_rest_days, m.max_consecutive_nights) for m in members] or [0]
+        ) + 1
+        self.horizon_start = self.start_date - timedelta(days=lookback)
+        horizon_end = self.end_date + timedelta(days=lookback)
+        horizon_bounds = day_bounds(self.horizon_start, horizon_end)
+        window_start, window_end = day_bounds(self.start_date, self.end_date)
+
+        existing = Shift.objects.filter(
+            assigned_staff_id__in=self.states,
+            start_time__gte=horizon_bounds[0],
+            start_time__lt=horizon_bounds[1],
+        ).exclude(status='cancelled').values_list('assigned_staff_id', 'start_time', 'end_time')
+        for staff_id, start_time, end_time in existing:
+            state = self.states[staff_id]
+            day = self.day_index(start_time)
+            state.work |= 1 << day
+            if is_night_shift(start_time, end_time):
+                state.nights |= 1 << day
+            if window_start <= start_time < window_end:
+                state.hours += (end_time - start_time).total_seconds() / 3600
+
+        # One bitmap row per staff member per month instead of a row per day
+        offset = (self.start_date - self.horizon_start).days
+        for staff_id, bits in availability_bits(self.states, self.start_date, self.end_date).items():
+            self.states[staff_id].unavailable = bits['unavailable'] << offset
+            self.states[staff_id].maybe = bits['maybe'] << offset
+
+    def day_index(self, moment):
+        return (timezone.localtime(moment).date() - self.horizon_start).days
+
+    def solve(self, lock=False):
+        """Compute assignments greedily, day by day, most constrained slot first"""
+        slots = self.get_slots(lock=lock)
+        self.load_state()
+        self.assignments = []
+        unfilled = []
+
+        by_day = {}
+        for slot in slots:
+            by_day.setdefault(self.day_index(slot.start_time), []).append(slot)
+
+        states = list(self.states.values())
+        for day in sorted(by_day):
+            pending = []
+            for slot in by_day[day]:
+                night = is_night_shift(slot.start_time, slot.end_time)
+                candidates = [state for state in states if state.can_take(day, night)]
+                pending.append((slot, night, candidates))
+
+            while pending:
+                # Only one shift per person per day, so drop anyone already
+                # placed today before choosing the tightest slot
+                pending = [
+                    (slot, night, [c for c in candidates if not c.work & (1 << day)])
+                    for slot, night, candidates in pending
+                ]
+                pending.sort(key=lambda item: len(item[2]))
+                slot, night, candidates = pending.pop(0)
+                if not candidates:
+                    unfilled.append(slot)
+                    continue
+                best = min(candidates, key=lambda state: (state.cost(day, night), state.member.id))
+                best.take(day, night, slot.duration_hours)
+                self.assignments.append((slot, best.member))
+
+        return self.summarise(unfilled)
+
+    def summarise(self, unfilled):
+        maybe_days = 0
+        preference_mismatches = 0
+        for slot, member in self.assignments:
+            state = self.states[member.id]
+            if state.maybe & (1 << self.day_index(slot.start_time)):
+                maybe_days += 1
+            if is_night_shift(slot.start_time, slot.end_time) != member.prefers_night_shifts:
+                preference_mismatches += 1
+        hours = [state.hours for state in self.states.values()]
+        return {
+            'assigned': [
+                {'shift': slot.id, 'staff_member': member.id}
+                for slot, member in self.assignments
+            ],
+            'unfilled': [slot.id for slot in unfilled],
+            'penalties': {
+                'maybe_days': maybe_days,
+                'preference_mismatches': preference_mismatches,
+                'hours_spread': round(max(hours) - min(hours), 2) if hours else 0,
+            },
+        }
+
+    def apply(self):
+        """Save computed assignments with a single bulk update"""
+        now = timezone.now()
+        shifts = []
+        for slot, member in self.assignments:
+            slot.assigned_staff = member
+            # bulk_update skips auto_now, so stamp updated_at ourselves
+            slot.updated_at = now
+            shifts.append(slot)
+        Shift.objects.bulk_update(shifts, ['assigned_staff', 'updated_at'], batch_size=500)
+        # bulk_update sends no signals either, so refresh rollups and
+        # snapshots and push live events here
+        invalidate_snapshots(schedule__shifts__in=shifts)
+        publish([shift_event(slot) for slot in shifts])
+        if settings.WORKLOAD_ROLLUPS:
+            from .analytics import month_start, refresh_rollups
+            refresh_rollups({(slot.assigned_staff_id, month_start(slot.start_time)) for slot in shifts})
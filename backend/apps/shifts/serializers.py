@@ -1,7 +1,15 @@
 from rest_framework import serializers
-from .models import Shift, Schedule
+from .models import Shift, RecurringShift, Schedule, MAX_SHIFT_DURATION
+from apps.staff.models import Team, ShiftType
 from apps.staff.serializers import StaffMemberSerializer, ShiftTypeSerializer
+from apps.observatory.models import Telescope
 from apps.observatory.serializers import TelescopeListSerializer
+from apps.staff.values import ValuesSerializer, format_datetime, full_name
+from .calendar import MAX_GRID_DAYS
+from .conflicts import check_shift
+from .analytics import PERIODS
+from .rotation import WEEKDAYS, MAX_ROTATION_DAYS, expand_pattern, shift_times
+from .recurrence import MAX_EXPANSION_DAYS, parse_rrule, first_occurrence, expand
 
 
 class ShiftSerializer(serializers.ModelSerializer):
@@ -11,6 +19,11 @@ class ShiftSerializer(serializers.ModelSerializer):
     shift_type_details = ShiftTypeSerializer(source='shift_type', read_only=True)
     duration_hours = serializers.ReadOnlyField()
     shift_code = serializers.ReadOnlyField()
+    # Columns read by property-backed fields (see apps.staff.fieldsets)
+    field_sources = {
+        'duration_hours': ['start_time', 'end_time'],
+        'shift_code': ['shift_type__code'],
+    }
     
     class Meta:
         model = Shift
@@ -18,9 +31,32 @@ class ShiftSerializer(serializers.ModelSerializer):
             'id', 'shift_type', 'shift_type_details', 'shift_code', 'status',
             'start_time', 'end_time', 'assigned_staff', 'assigned_staff_details',
             'telescope', 'telescope_details', 'description', 'notes',
-            'duration_hours', 'created_at', 'updated_at', 'created_by'
+            'duration_hours', 'recurrence', 'recurrence_date',
+            'created_at', 'updated_at', 'created_by'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by']
+        read_only_fields = ['id', 'recurrence', 'recurrence_date', 'created_at', 'updated_at', 'created_by']
+    
+    def validate(self, attrs):
+        start_time = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time:
+            if end_time <= start_time:
+                raise serializers.ValidationError('End time must be after start time')
+            if end_time - start_time > MAX_SHIFT_DURATION:
+                raise serializers.ValidationError(
+                    f'Shifts cannot last longer than {MAX_SHIFT_DURATION.days} days'
+                )
+        
+        if 'assigned_staff' in attrs:
+            staff_id = attrs['assigned_staff'].id if attrs['assigned_staff'] else None
+        else:
+            staff_id = getattr(self.instance, 'assigned_staff_id', None)
+        status = attrs.get('status', getattr(self.instance, 'status', 'scheduled'))
+        if staff_id and start_time and end_time and status != 'cancelled':
+            errors = check_shift(staff_id, start_time, end_time, exclude_id=getattr(self.instance, 'pk', None))
+            if errors:
+                raise serializers.ValidationError({'assigned_staff': errors})
+        return attrs
 
 
 class ShiftListSerializer(serializers.ModelSerializer):
@@ -31,6 +67,11 @@ class ShiftListSerializer(serializers.ModelSerializer):
     shift_code = serializers.ReadOnlyField()
     shift_name = serializers.CharField(source='shift_type.name', read_only=True)
     shift_color = serializers.CharField(source='shift_type.color', read_only=True)
+    field_sources = {
+        'staff_name': ['assigned_staff__user__first_name', 'assigned_staff__user__last_name'],
+        'duration_hours': ['start_time', 'end_time'],
+        'shift_code': ['shift_type__code'],
+    }
     
     class Meta:
         model = Shift
@@ -38,14 +79,137 @@ class ShiftListSerializer(serializers.ModelSerializer):
             'id', 'shift_type', 'shift_code', 'shift_name', 'shift_color',
             'status', 'start_time', 'end_time', 'assigned_staff',
             'staff_name', 'staff_team', 'telescope', 'telescope_name',
-            'duration_hours'
+            'duration_hours', 'recurrence', 'recurrence_date'
         ]
 
 
+class ShiftListValuesSerializer(ValuesSerializer):
+    """ShiftListSerializer output built from queryset.values() (see apps.staff.values)"""
+    columns = (
+        'id', 'shift_type_id', 'shift_type__code', 'shift_type__name', 'shift_type__color',
+        'status', 'start_time', 'end_time', 'assigned_staff_id', 'assigned_staff__user__first_name',
+        'assigned_staff__user__last_name', 'assigned_staff__team__code', 'telescope_id', 'telescope__name',
+        'recurrence_id', 'recurrence_date',
+    )
+    
+    def to_representation(self, row):
+        start, end = row['start_time'], row['end_time']
+        item = {
+            'id': row['id'],
+            'shift_type': row['shift_type_id'],
+            'shift_code': row['shift_type__code'],
+            'shift_name': row['shift_type__name'],
+            'shift_color': row['shift_type__color'],
+            'status': row['status'],
+            'start_time': format_datetime(start, self.tz),
+            'end_time': format_datetime(end, self.tz),
+            'assigned_staff': row['assigned_staff_id'],
+        }
+        # The serializer skips fields whose source passes through a null relation
+        if row['assigned_staff_id'] is not None:
+            item['staff_name'] = full_name(row['assigned_staff__user__first_name'], row['assigned_staff__user__last_name'])
+            if row['assigned_staff__team__code'] is not None:
+                item['staff_team'] = row['assigned_staff__team__code']
+        item['telescope'] = row['telescope_id']
+        if row['telescope_id'] is not None:
+            item['telescope_name'] = row['telescope__name']
+        item['duration_hours'] = (end - start).total_seconds() / 3600
+        item['recurrence'] = row['recurrence_id']
+        item['recurrence_date'] = row['recurrence_date'] and row['recurrence_date'].isoformat()
+        return item
+
+
+class RecurringShiftSerializer(serializers.ModelSerializer):
+    """
+    Serializer for RecurringShift model (see apps.shifts.recurrence).
+    
+    Without start_time and end_time the occurrences take the shift type's
+    default times.
+    """
+    shift_code = serializers.CharField(source='shift_type.code', read_only=True)
+    staff_name = serializers.CharField(source='assigned_staff.full_name', read_only=True)
+    exdates = serializers.ListField(child=serializers.DateField(), required=False)
+    field_sources = {
+        'staff_name': ['assigned_staff__user__first_name', 'assigned_staff__user__last_name'],
+    }
+    
+    class Meta:
+        model = RecurringShift
+        fields = [
+            'id', 'shift_type', 'shift_code', 'assigned_staff', 'staff_name', 'telescope',
+            'rrule', 'dtstart', 'start_time', 'end_time', 'exdates', 'last_date',
+            'description', 'created_at', 'updated_at', 'created_by'
+        ]
+        read_only_fields = ['id', 'last_date', 'created_at', 'updated_at', 'created_by']
+        extra_kwargs = {'start_time': {'required': False}, 'end_time': {'required': False}}
+    
+    def validate_rrule(self, value):
+        try:
+            parse_rrule(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+    
+    def validate_exdates(self, value):
+        # Stored as ISO strings in a JSON list
+        return sorted({day.isoformat() for day in value})
+    
+    def validate(self, attrs):
+        current = lambda name: attrs.get(name, getattr(self.instance, name, None))
+        shift_type = current('shift_type')
+        if self.instance is None and 'start_time' not in attrs and 'end_time' not in attrs:
+            if shift_type.default_start_time is None or (
+                shift_type.default_end_time is None and shift_type.default_duration_hours is None
+            ):
+                raise serializers.ValidationError(
+                    f'Give start_time and end_time: shift type {shift_type.code} has no default times'
+                )
+            start, end = shift_times(shift_type, attrs['dtstart'])
+            attrs['start_time'], attrs['end_time'] = start.time(), end.time()
+        elif current('start_time') is None or current('end_time') is None:
+            raise serializers.ValidationError('Give both start_time and end_time, or neither to use the shift type defaults')
+        
+        if first_occurrence(parse_rrule(current('rrule')), current('dtstart')) is None:
+            raise serializers.ValidationError({'rrule': 'The rule has no occurrences on or after dtstart'})
+        return attrs
+
+
+class RecurringOccurrenceQuerySerializer(serializers.Serializer):
+    """Validates query parameters for listing a recurring shift's occurrences"""
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        if (attrs['end_date'] - attrs['start_date']).days >= MAX_EXPANSION_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_EXPANSION_DAYS} days')
+        return attrs
+
+
+class MaterialiseOccurrenceSerializer(serializers.Serializer):
+    """
+    Picks the occurrence of ``context['recurring']`` to store as a Shift.
+    On success ``occurrence`` holds it as an unsaved Shift.
+    """
+    date = serializers.DateField()
+    
+    def validate(self, attrs):
+        occurrences = expand([self.context['recurring']], attrs['date'], attrs['date'])
+        if not occurrences:
+            raise serializers.ValidationError(
+                {'date': 'No pending occurrence on this date (not in the rule, skipped or already materialised)'}
+            )
+        attrs['occurrence'] = occurrences[0]
+        return attrs
+
+
 class ScheduleSerializer(serializers.ModelSerializer):
     """Serializer for Schedule model"""
     shifts_details = ShiftListSerializer(source='shifts', many=True, read_only=True)
     total_shifts = serializers.ReadOnlyField()
+    # total_shifts counts the shifts relation, no columns
+    field_sources = {'total_shifts': []}
     
     class Meta:
         model = Schedule
@@ -60,9 +224,127 @@ class ScheduleSerializer(serializers.ModelSerializer):
 class ScheduleListSerializer(serializers.ModelSerializer):
     """Simplified serializer for schedule lists"""
     total_shifts = serializers.ReadOnlyField()
+    # Read from the shift_count annotation
+    field_sources = {'total_shifts': []}
     
     class Meta:
         model = Schedule
         fields = [
             'id', 'name', 'start_date', 'end_date', 'status', 'total_shifts'
         ]
+
+
+class CalendarGridQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the calendar grid endpoint"""
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    team = serializers.IntegerField(required=False)
+    team__name = serializers.CharField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        if (attrs['end_date'] - attrs['start_date']).days >= MAX_GRID_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_GRID_DAYS} days')
+        return attrs
+
+
+class AutoAssignSerializer(serializers.Serializer):
+    """Validates the request body for automatic shift assignment"""
+    team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all())
+    shift_types = serializers.PrimaryKeyRelatedField(
+        queryset=ShiftType.objects.all(), many=True, required=False
+    )
+    dry_run = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        for shift_type in attrs.get('shift_types', []):
+            if shift_type.team_id != attrs['team'].id:
+                raise serializers.ValidationError(
+                    f'Shift type {shift_type.code} does not belong to team {attrs["team"].code}'
+                )
+        return attrs
+
+
+class RotationSerializer(serializers.Serializer):
+    """
+    Validates a weekly rotation to materialise into shifts.
+    
+    ``pattern`` maps weekday keys (mon..sun, or daily) to lists of the
+    team's ShiftType codes. On success ``weekly`` holds seven lists of
+    ShiftType instances, Monday first.
+    """
+    team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all())
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    pattern = serializers.DictField(child=serializers.ListField(child=serializers.CharField()))
+    telescope = serializers.PrimaryKeyRelatedField(queryset=Telescope.objects.all(), required=False)
+    
+    def validate_pattern(self, value):
+        unknown = set(value) - set(WEEKDAYS) - {'daily'}
+        if unknown:
+            raise serializers.ValidationError(
+                f'Unknown weekday keys: {", ".join(sorted(unknown))}. Use {", ".join(WEEKDAYS)} or daily'
+            )
+        return value
+    
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        if (attrs['end_date'] - attrs['start_date']).days >= MAX_ROTATION_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_ROTATION_DAYS} days')
+        
+        weekly_codes = expand_pattern(attrs['pattern'])
+        codes = {code for day in weekly_codes for code in day}
+        shift_types = {
+            shift_type.code: shift_type
+            for shift_type in ShiftType.objects.filter(team=attrs['team'], code__in=codes, is_active=True)
+        }
+        missing = codes - set(shift_types)
+        if missing:
+            raise serializers.ValidationError(
+                f'Unknown shift type codes for {attrs["team"].code}: {", ".join(sorted(missing))}'
+            )
+        untimed = [
+            code for code, shift_type in shift_types.items()
+            if shift_type.default_start_time is None
+            or (shift_type.default_end_time is None and shift_type.default_duration_hours is None)
+        ]
+        if untimed:
+            raise serializers.ValidationError(
+                f'Shift types need a default start time and an end time or duration: {", ".join(sorted(untimed))}'
+            )
+        
+        attrs['weekly'] = [[shift_types[code] for code in day] for day in weekly_codes]
+        return attrs
+
+
+class ConflictQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the conflicts endpoint"""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    team = serializers.IntegerField(required=False)
+    staff_member = serializers.IntegerField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError('end must be on or after start')
+        if (attrs['end'] - attrs['start']).days >= MAX_GRID_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_GRID_DAYS} days')
+        return attrs
+
+
+class WorkloadQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the workload analytics endpoint"""
+    start = serializers.DateField()
+    end = serializers.DateField()
+    team = serializers.IntegerField(required=False)
+    staff_member = serializers.IntegerField(required=False)
+    period = serializers.ChoiceField(choices=PERIODS, default='month')
+    
+    def validate(self, attrs):
+        if attrs['end'] < attrs['start']:
+            raise serializers.ValidationError('end must be on or after start')
+        if (attrs['end'] - attrs['start']).days >= MAX_GRID_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_GRID_DAYS} days')
+        return attrs
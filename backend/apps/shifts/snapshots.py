@@ -0,0 +1,119 @@
+"""
+Frozen JSON snapshots of published schedules.
+
+A published Schedule is read far more often than it changes, so its
+retrieve response is rendered once, gzip-compressed and stored in a
+ScheduleSnapshot. Retrieve then serves those bytes with one query: as-is
+to clients that accept gzip, decompressed otherwise, with an ETag built
+from the snapshot version so unchanged rosters answer 304.
+
+Any change to what the response shows clears the payload (one UPDATE):
+saving or deleting a member shift, adding or removing shifts, editing the
+schedule, or renaming the staff member, team, shift type or telescope
+shown with its shifts. The next retrieve rebuilds it under a new version.
+Writes that skip signals (bulk_update, raw bulk_create into the through
+table) call ``invalidate_snapshots`` themselves.
+"""
+import gzip
+import re
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, pre_delete, m2m_changed
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from apps.observatory.models import Telescope
+from config.renderers import ORJSONRenderer
+from apps.staff.models import StaffMember, Team, ShiftType
+from .models import Shift, Schedule, ScheduleSnapshot
+
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+# Path from ScheduleSnapshot to each model whose data appears in a snapshot
+SNAPSHOT_SOURCES = {
+    Shift: 'schedule__shifts',
+    StaffMember: 'schedule__shifts__assigned_staff',
+    User: 'schedule__shifts__assigned_staff__user',
+    Team: 'schedule__shifts__assigned_staff__team',
+    ShiftType: 'schedule__shifts__shift_type',
+    Telescope: 'schedule__shifts__telescope',
+}
+
+
+def store_snapshot(schedule_id, data):
+    """Freeze ``data`` (ScheduleSerializer output) as the schedule's next snapshot version"""
+    payload = gzip.compress(ORJSONRenderer().render(data), mtime=0)
+    snapshot, _ = ScheduleSnapshot.objects.get_or_create(schedule_id=schedule_id)
+    snapshot.version += 1
+    snapshot.payload = payload
+    snapshot.built_at = timezone.now()
+    snapshot.save()
+    return snapshot
+
+
+def current_snapshot(schedule_id):
+    """The stored snapshot of a published schedule, or None if there is none or it is stale"""
+    return ScheduleSnapshot.objects.filter(
+        schedule_id=schedule_id,
+        schedule__status='published',
+        payload__isnull=False,
+    ).only('schedule_id', 'version', 'payload').first()
+
+
+def invalidate_snapshots(**lookups):
+    """Mark the snapshots matching ``lookups`` stale"""
+    ScheduleSnapshot.objects.filter(payload__isnull=False, **lookups).update(payload=None)
+
+
+def snapshot_etag(snapshot):
+    return f'"schedule-{snapshot.schedule_id}-v{snapshot.version}"'
+
+
+def snapshot_response(request, snapshot):
+    """Serve the stored bytes, gzip-encoded when the client accepts it"""
+    etag = snapshot_etag(snapshot)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        payload = bytes(snapshot.payload)
+        if ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            response = HttpResponse(payload, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(payload), content_type='application/json')
+    response['ETag'] = etag
+    response['X-Snapshot-Version'] = snapshot.version
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+
+def _invalidate_for_instance(sender, instance, **kwargs):
+    invalidate_snapshots(**{SNAPSHOT_SOURCES[sender]: instance})
+
+
+def _invalidate_for_schedule(sender, instance, **kwargs):
+    invalidate_snapshots(schedule=instance)
+
+
+def _invalidate_for_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_snapshots(schedule=instance)
+    elif pk_set:
+        invalidate_snapshots(schedule_id__in=pk_set)
+    else:
+        invalidate_snapshots(schedule__shifts=instance)
+
+
+def register_snapshot_signals():
+    for model in SNAPSHOT_SOURCES:
+        uid = f'schedule-snapshot-{model._meta.label_lower}'
+        post_save.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'{uid}-save')
+        # Before the delete, while the shift is still in its schedules
+        pre_delete.connect(_invalidate_for_instance, sender=model, dispatch_uid=f'{uid}-delete')
+    post_save.connect(_invalidate_for_schedule, sender=Schedule, dispatch_uid='schedule-snapshot-schedule-save')
+    m2m_changed.connect(
+        _invalidate_for_membership, sender=Schedule.shifts.through, dispatch_uid='schedule-snapshot-membership'
+    )
@@ -1,3 +1,1302 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APITestCase
+
+from apps.observatory.models import Telescope
+from config.profiling import fingerprint
+from apps.staff.bitmap import rebuild_bitmaps
+from apps.staff.models import Team, ShiftType, StaffMember, StaffAvailability, DailyAvailability
+from .benchmark import ENDPOINTS, seed_dataset, benchmark_endpoints, compare
+from .filters import ShiftFilter
+from .models import Shift, RecurringShift, Schedule, ScheduleSnapshot, WorkloadRollup
+from .recurrence import parse_rrule, occurrence_dates, last_occurrence, to_rrule, expand
+from .serializers import ShiftListSerializer
+from .scheduler import AutoScheduler
+
+
+def make_team(code='OBS', name='Observing Specialists'):
+    return Team.objects.create(code=code, name=name)
+
+
+def make_shift_type(team, code='1', name='Day Shift Lead', color='#f59e0b'):
+    return ShiftType.objects.create(team=team, code=code, name=name, color=color)
+
+
+def make_staff(team, index):
+    user = User.objects.create(
+        username=f'{team.code.lower()}{index}',
+        first_name=f'First{index}',
+        last_name=f'Last{index:03d}',
+    )
+    return StaffMember.objects.create(
+        user=user,
+        team=team,
+        employee_id=f'{team.code}{index:03d}',
+        role='telescope_operator',
+        hire_date=date(2024, 1, 1),
+    )
+
+
+def make_shift(staff, shift_type, day, start=time(8, 0), hours=8):
+    start_time = timezone.make_aware(datetime.combine(day, start))
+    return Shift.objects.create(
+        shift_type=shift_type,
+        assigned_staff=staff,
+        start_time=start_time,
+        end_time=start_time + timedelta(hours=hours),
+    )
+
+
+class CalendarGridTests(APITestCase):
+    url = '/api/shifts/calendar/'
+
+    def setUp(self):
+        self.team = make_team()
+        self.other_team = make_team(code='SCI', name='Support Scientists')
+        self.shift_type = make_shift_type(self.team)
+        self.start = date(2025, 3, 1)
+
+    def populate(self, staff_count, days):
+        existing = StaffMember.objects.count()
+        members = [make_staff(self.team, existing + i) for i in range(staff_count)]
+        for offset in range(days):
+            day = self.start + timedelta(days=offset)
+            for member in members:
+                make_shift(member, self.shift_type, day)
+                DailyAvailability.objects.create(staff_member=member, date=day, availability_code='A')
+        return members
+
+    def test_grid_joins_shifts_and_availability(self):
+        member = make_staff(self.team, 1)
+        make_shift(member, self.shift_type, self.start + timedelta(days=1))
+        DailyAvailability.objects.create(
+            staff_member=member, date=self.start + timedelta(days=2),
+            availability_code='X', notes='Vacation'
+        )
+
+        response = self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-03-03'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['dates'], [date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 3)])
+        row = response.data['rows'][0]
+        self.assertEqual(row['staff_member']['id'], member.id)
+        self.assertEqual(row['staff_member']['team_code'], 'OBS')
+        self.assertEqual(row['availability'], '--X')
+        self.assertEqual(row['availability_notes'], {'2025-03-03': 'Vacation'})
+        self.assertEqual(list(row['shifts']), ['2025-03-02'])
+        self.assertEqual(row['shifts']['2025-03-02'][0]['shift_type'], self.shift_type.id)
+        self.assertEqual(response.data['shift_types'][0]['code'], '1')
+
+    def test_team_filter_restricts_rows(self):
+        make_staff(self.team, 1)
+        make_staff(self.other_team, 2)
+
+        response = self.client.get(self.url, {
+            'start_date': '2025-03-01', 'end_date': '2025-03-01', 'team': self.other_team.id
+        })
+
+        self.assertEqual([row['staff_member']['team_code'] for row in response.data['rows']], ['SCI'])
+
+    def test_grid_applies_availability_windows(self):
+        member = make_staff(self.team, 1)
+        DailyAvailability.objects.create(staff_member=member, date=self.start, availability_code='A')
+        StaffAvailability.objects.create(
+            staff_member=member, start_date=self.start, end_date=self.start + timedelta(days=1),
+            availability_type='unavailable', reason='Vacation',
+        )
+
+        response = self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-03-03'})
+
+        row = response.data['rows'][0]
+        self.assertEqual(row['availability'], 'XX-')
+        self.assertEqual(row['availability_windows'][0]['reason'], 'Vacation')
+
+    def test_query_count_is_independent_of_size(self):
+        # Staff, shifts, recurring shifts, daily availability and availability windows
+        self.populate(staff_count=2, days=3)
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-03-03'})
+
+        self.populate(staff_count=6, days=20)
+        with self.assertNumQueries(5):
+            self.client.get(self.url, {'start_date': '2025-03-01', 'end_date': '2025-03-31'})
+
+    def test_invalid_range_is_rejected(self):
+        response = self.client.get(self.url, {'start_date': '2025-03-05', 'end_date': '2025-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(self.url, {'start_date': '2025-03-05'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ShiftRangeFilterTests(APITestCase):
+    url = '/api/shifts/'
+
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        self.start = date(2025, 3, 1)
+
+    def add_history(self, days, first_day=date(2022, 1, 1)):
+        Shift.objects.bulk_create([
+            Shift(
+                shift_type=self.shift_type,
+                assigned_staff=self.staff,
+                start_time=timezone.make_aware(datetime.combine(first_day + timedelta(days=i), time(8, 0))),
+                end_time=timezone.make_aware(datetime.combine(first_day + timedelta(days=i), time(16, 0))),
+            )
+            for i in range(days)
+        ])
+
+    def test_start_time_range(self):
+        inside = make_shift(self.staff, self.shift_type, self.start)
+        make_shift(self.staff, self.shift_type, self.start + timedelta(days=10))
+
+        response = self.client.get(self.url, {
+            'start_time__gte': '2025-03-01', 'start_time__lt': '2025-03-05'
+        })
+
+        self.assertEqual([row['id'] for row in response.data['results']], [inside.id])
+
+    def test_overlap_window(self):
+        # Night shift starting the evening before the window reaches into it
+        overnight = make_shift(self.staff, self.shift_type, self.start - timedelta(days=1), start=time(20, 0), hours=10)
+        inside = make_shift(self.staff, self.shift_type, self.start)
+        make_shift(self.staff, self.shift_type, self.start - timedelta(days=2))
+        make_shift(self.staff, self.shift_type, self.start + timedelta(days=1))
+
+        response = self.client.get(self.url, {
+            'overlaps_start': '2025-03-01T00:00:00Z', 'overlaps_end': '2025-03-02T00:00:00Z'
+        })
+
+        self.assertEqual([row['id'] for row in response.data['results']], [overnight.id, inside.id])
+
+    def test_rejects_overlong_shift(self):
+        response = self.client.post(self.url, {
+            'shift_type': self.shift_type.id,
+            'start_time': '2025-03-01T08:00:00Z',
+            'end_time': '2025-03-20T08:00:00Z',
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_range_query_count_stays_flat_with_history(self):
+        params = {'start_time__gte': '2025-03-01', 'start_time__lt': '2025-03-08'}
+        self.add_history(7, first_day=self.start)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, params)
+
+        # Three more years of history outside the window
+        self.add_history(3 * 365)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(large), len(small))
+
+    def test_range_queries_use_start_time_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        self.add_history(365)
+        for params in (
+            {'start_time__gte': '2025-03-01', 'start_time__lt': '2025-03-08'},
+            {'overlaps_start': '2025-03-01T00:00:00Z', 'overlaps_end': '2025-03-08T00:00:00Z'},
+        ):
+            plan = ShiftFilter(params, queryset=Shift.objects.all()).qs.explain()
+            self.assertIn('shifts_shif_start_t_261732_idx', plan)
+
+    def test_keyset_pagination_walks_every_row_once(self):
+        # Several shifts share a start time, so ties must be broken on id
+        for i in range(5):
+            make_shift(self.staff, self.shift_type, self.start + timedelta(days=i // 2))
+
+        seen = []
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertNotIn('count', response.data)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Shift.objects.order_by('start_time', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_keyset_pagination_skips_count(self):
+        self.add_history(30)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url, {'pagination': 'cursor', 'page_size': 10})
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class QueryCountTests(APITestCase):
+    """List and retrieve must cost the same number of queries at any size"""
+
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.start = date(2025, 3, 1)
+        self.schedule = Schedule.objects.create(
+            name='March', start_date=self.start, end_date=self.start + timedelta(days=30)
+        )
+
+    def add_shifts(self, count):
+        existing = StaffMember.objects.count()
+        for i in range(count):
+            staff = make_staff(self.team, existing + i)
+            shift = make_shift(staff, self.shift_type, self.start + timedelta(days=i))
+            self.schedule.shifts.add(shift)
+        Schedule.objects.create(name=f'Extra {existing}', start_date=self.start, end_date=self.start + timedelta(days=1))
+
+    def assertConstantQueries(self, url, expected):
+        self.add_shifts(1)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_shifts(5)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_shift_list(self):
+        self.assertConstantQueries('/api/shifts/', 3)
+
+    def test_shift_retrieve(self):
+        self.add_shifts(1)
+        shift = Shift.objects.first()
+        shift.telescope = Telescope.objects.create(name='Rubin', code='LSST', aperture=8.4)
+        shift.save()
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/shifts/{shift.id}/')
+
+    def test_schedule_list(self):
+        self.assertConstantQueries('/api/schedules/', 3)
+
+    def test_schedule_list_total_shifts(self):
+        self.add_shifts(3)
+        response = self.client.get('/api/schedules/', {'search': 'March'})
+        self.assertEqual(response.data['results'][0]['total_shifts'], 3)
+
+    def test_schedule_retrieve(self):
+        # Draft schedule: one query looking for a published snapshot, the
+        # ETag aggregate, then the schedule and its prefetched shifts
+        self.assertConstantQueries(f'/api/schedules/{self.schedule.id}/', 4)
+
+
+class AutoSchedulerTests(APITestCase):
+
+    def setUp(self):
+        self.team = make_team()
+        self.day_type = make_shift_type(self.team, code='1', name='Day Shift Lead')
+        self.night_type = make_shift_type(self.team, code='3', name='Late Shift Lead')
+        self.start = date(2025, 3, 3)
+
+    def add_slots(self, days, shift_type=None, start=time(8, 0), hours=8):
+        shift_type = shift_type or self.day_type
+        slots = []
+        for offset in range(days):
+            start_time = timezone.make_aware(datetime.combine(self.start + timedelta(days=offset), start))
+            slots.append(Shift(
+                shift_type=shift_type, start_time=start_time, end_time=start_time + timedelta(hours=hours)
+            ))
+        return Shift.objects.bulk_create(slots)
+
+    def run_scheduler(self, days, **kwargs):
+        return AutoScheduler(self.team, self.start, self.start + timedelta(days=days - 1), **kwargs).run()
+
+    def worked_days(self, staff):
+        return sorted(
+            (timezone.localtime(start).date() - self.start).days
+            for start in Shift.objects.filter(assigned_staff=staff).values_list('start_time', flat=True)
+        )
+
+    def test_never_assigns_unavailable_days(self):
+        available = make_staff(self.team, 1)
+        unavailable = make_staff(self.team, 2)
+        DailyAvailability.objects.create(staff_member=unavailable, date=self.start, availability_code='X')
+        self.add_slots(1)
+
+        result = self.run_scheduler(1)
+
+        self.assertEqual(result['assigned'][0]['staff_member'], available.id)
+        self.assertEqual(Shift.objects.get().assigned_staff, available)
+
+    def test_avoids_maybe_days_when_possible(self):
+        maybe = make_staff(self.team, 1)
+        other = make_staff(self.team, 2)
+        DailyAvailability.objects.create(staff_member=maybe, date=self.start, availability_code='?')
+        self.add_slots(1)
+
+        self.run_scheduler(1)
+
+        self.assertEqual(Shift.objects.get().assigned_staff, other)
+
+    def test_respects_rest_days_between_blocks(self):
+        staff = make_staff(self.team, 1)
+        staff.min_rest_days = 2
+        staff.save()
+        # Fixed shift on day 3 means days 1 and 5 would leave a one-day gap
+        make_shift(staff, self.day_type, self.start + timedelta(days=3))
+        self.add_slots(7)
+
+        self.run_scheduler(7)
+
+        days = self.worked_days(staff)
+        gaps = [b - a - 1 for a, b in zip(days, days[1:])]
+        self.assertTrue(all(gap == 0 or gap >= 2 for gap in gaps), days)
+
+    def test_caps_consecutive_nights(self):
+        staff = make_staff(self.team, 1)
+        staff.max_consecutive_nights = 3
+        staff.min_rest_days = 1
+        staff.save()
+        self.add_slots(10, shift_type=self.night_type, start=time(17, 0))
+
+        result = self.run_scheduler(10)
+
+        self.assertEqual(self.worked_days(staff), [0, 1, 2, 4, 5, 6, 8, 9])
+        self.assertEqual(len(result['unfilled']), 2)
+
+    def test_dry_run_does_not_save(self):
+        make_staff(self.team, 1)
+        self.add_slots(3)
+
+        result = AutoScheduler(self.team, self.start, self.start + timedelta(days=2)).run(dry_run=True)
+
+        self.assertEqual(len(result['assigned']), 3)
+        self.assertFalse(Shift.objects.filter(assigned_staff__isnull=False).exists())
+
+    def test_quarter_for_fifty_staff_and_eight_shift_types(self):
+        shift_types = [self.day_type, self.night_type] + [
+            make_shift_type(self.team, code=str(i), name=f'Type {i}') for i in range(4, 10)
+        ]
+        for i in range(50):
+            staff = make_staff(self.team, i)
+            if i % 5 == 0:
+                DailyAvailability.objects.bulk_create([
+                    DailyAvailability(staff_member=staff, date=self.start + timedelta(days=d), availability_code='X')
+                    for d in range(0, 90, 3)
+                ])
+        # bulk_create skips signals, so build the monthly bitmaps explicitly
+        rebuild_bitmaps(self.start, self.start + timedelta(days=90))
+        for i, shift_type in enumerate(shift_types):
+            self.add_slots(90, shift_type=shift_type, start=time(6 + i * 2, 0))
+
+        started = datetime.now()
+        with CaptureQueriesContext(connection) as queries:
+            result = self.run_scheduler(90)
+        elapsed = (datetime.now() - started).total_seconds()
+
+        # Slots, staff, existing shifts and availability; the rest are bulk UPDATE batches
+        selects = [q for q in queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 4)
+        self.assertLess(elapsed, 10)
+        self.assertEqual(len(result['assigned']) + len(result['unfilled']), 720)
+        self.assertFalse(Shift.objects.filter(
+            assigned_staff__daily_availability__availability_code='X',
+            assigned_staff__daily_availability__date=self.start + timedelta(days=3),
+            start_time__date=self.start + timedelta(days=3),
+        ).exists())
+        for staff in StaffMember.objects.all():
+            days = self.worked_days(staff)
+            self.assertEqual(len(days), len(set(days)))
+            gaps = [b - a - 1 for a, b in zip(days, days[1:])]
+            self.assertTrue(all(gap == 0 or gap >= staff.min_rest_days for gap in gaps))
+
+    def test_schedule_auto_assign_action(self):
+        staff = make_staff(self.team, 1)
+        slot = self.add_slots(1)[0]
+        outside = self.add_slots(1)[0]
+        schedule = Schedule.objects.create(name='Week', start_date=self.start, end_date=self.start + timedelta(days=6))
+        schedule.shifts.add(slot)
+
+        response = self.client.post(
+            f'/api/schedules/{schedule.id}/auto-assign/', {'team': self.team.id}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned'], [{'shift': slot.id, 'staff_member': staff.id}])
+        outside.refresh_from_db()
+        self.assertIsNone(outside.assigned_staff)
+
+    def test_schedule_auto_assign_rejects_foreign_shift_types(self):
+        schedule = Schedule.objects.create(name='Week', start_date=self.start, end_date=self.start + timedelta(days=6))
+        other_type = make_shift_type(make_team(code='SCI', name='Support Scientists'), code='D')
+
+        response = self.client.post(
+            f'/api/schedules/{schedule.id}/auto-assign/',
+            {'team': self.team.id, 'shift_types': [other_type.id]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class RotationTests(APITestCase):
+
+    def setUp(self):
+        self.team = make_team()
+        self.day_lead = ShiftType.objects.create(
+            team=self.team, code='1', name='Day Shift Lead',
+            default_start_time=time(8, 0), default_end_time=time(16, 0)
+        )
+        self.late = ShiftType.objects.create(
+            team=self.team, code='L', name='Late Night Shift',
+            default_start_time=time(17, 0), default_end_time=time(1, 0)
+        )
+        self.backup = ShiftType.objects.create(
+            team=self.team, code='B', name='Backup',
+            default_start_time=time(10, 0), default_duration_hours=4
+        )
+        self.schedule = Schedule.objects.create(
+            name='Week', start_date=date(2025, 3, 3), end_date=date(2025, 3, 9)
+        )
+        self.url = f'/api/schedules/{self.schedule.id}/rotation/'
+
+    def test_generates_weekly_pattern(self):
+        response = self.client.post(self.url, {
+            'team': self.team.id, 'pattern': {'daily': ['1', 'L'], 'sat': ['B'], 'sun': []},
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5 * 2 + 1)
+        self.assertEqual(self.schedule.shifts.count(), 11)
+        late = Shift.objects.filter(shift_type=self.late).first()
+        self.assertEqual(late.duration_hours, 8)
+        backup = Shift.objects.get(shift_type=self.backup)
+        self.assertEqual(timezone.localtime(backup.start_time).date(), date(2025, 3, 8))
+        self.assertEqual(backup.duration_hours, 4)
+
+    def test_year_of_shifts_uses_bulk_inserts(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'team': self.team.id, 'start_date': '2025-01-01', 'end_date': '2025-12-31',
+                'pattern': {'daily': ['1', 'L', 'B']},
+            }, format='json')
+
+        self.assertEqual(response.data['created'], 365 * 3)
+        self.assertEqual(self.schedule.shifts.count(), 365 * 3)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertLess(len(inserts), 20)
+
+    def test_publishes_one_event_batch(self):
+        broker = mock.Mock()
+        with mock.patch('apps.staff.events.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(self.url, {
+                    'team': self.team.id, 'pattern': {'daily': ['L']},
+                }, format='json')
+
+        broker.publish.assert_called_once()
+        events = broker.publish.call_args.args[0]
+        self.assertEqual(len(events), 7)
+        self.assertEqual(
+            (events[0]['type'], events[0]['shift_type'], events[0]['start'], events[0]['end']),
+            ('shift', self.late.id, '2025-03-03', '2025-03-04'),
+        )
+
+    def test_rejects_unknown_codes_and_untimed_types(self):
+        ShiftType.objects.create(team=self.team, code='T', name='Training')
+
+        response = self.client.post(self.url, {'team': self.team.id, 'pattern': {'daily': ['9']}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {'team': self.team.id, 'pattern': {'daily': ['T']}}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {'team': self.team.id, 'pattern': {'someday': ['1']}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Shift.objects.exists())
+
+    def test_management_command_creates_schedule(self):
+        call_command(
+            'materialise_rotation', '--team', 'OBS', '--start', '2025-03-03', '--end', '2025-03-09',
+            '--pattern', 'daily=1,L', '--name', 'Generated', stdout=StringIO()
+        )
+
+        schedule = Schedule.objects.get(name='Generated')
+        self.assertEqual(schedule.shifts.count(), 14)
+
+
+class ConflictTests(APITestCase):
+    url = '/api/shifts/conflicts/'
+
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        self.start = date(2025, 3, 3)
+
+    def test_create_rejects_double_booking_and_unavailable_days(self):
+        make_shift(self.staff, self.shift_type, self.start)
+        DailyAvailability.objects.create(
+            staff_member=self.staff, date=self.start + timedelta(days=1), availability_code='X'
+        )
+
+        overlapping = self.client.post('/api/shifts/', {
+            'shift_type': self.shift_type.id, 'assigned_staff': self.staff.id,
+            'start_time': '2025-03-03T12:00:00Z', 'end_time': '2025-03-03T20:00:00Z',
+        })
+        unavailable = self.client.post('/api/shifts/', {
+            'shift_type': self.shift_type.id, 'assigned_staff': self.staff.id,
+            'start_time': '2025-03-04T08:00:00Z', 'end_time': '2025-03-04T16:00:00Z',
+        })
+        back_to_back = self.client.post('/api/shifts/', {
+            'shift_type': self.shift_type.id, 'assigned_staff': self.staff.id,
+            'start_time': '2025-03-03T16:00:00Z', 'end_time': '2025-03-03T23:00:00Z',
+        })
+
+        self.assertEqual(overlapping.status_code, 400)
+        self.assertIn('assigned_staff', overlapping.data)
+        self.assertEqual(unavailable.status_code, 400)
+        self.assertEqual(back_to_back.status_code, 201)
+
+    def test_update_ignores_the_shift_itself(self):
+        shift = make_shift(self.staff, self.shift_type, self.start)
+
+        response = self.client.patch(f'/api/shifts/{shift.id}/', {'notes': 'Moved desk'})
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_reports_overlaps_availability_and_rest_breaches(self):
+        self.staff.min_rest_days = 2
+        self.staff.max_consecutive_nights = 2
+        self.staff.save()
+        first = make_shift(self.staff, self.shift_type, self.start)
+        # Created directly so save-time validation does not block the fixtures
+        second = make_shift(self.staff, self.shift_type, self.start, start=time(12, 0))
+        make_shift(self.staff, self.shift_type, self.start + timedelta(days=2))
+        for offset in range(5, 8):
+            make_shift(self.staff, self.shift_type, self.start + timedelta(days=offset), start=time(20, 0))
+        DailyAvailability.objects.create(
+            staff_member=self.staff, date=self.start + timedelta(days=2), availability_code='X'
+        )
+
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-31'})
+
+        self.assertEqual(response.data['overlaps'], [{'staff_member': self.staff.id, 'shifts': [first.id, second.id]}])
+        self.assertEqual([item['date'] for item in response.data['availability']], [date(2025, 3, 5)])
+        self.assertEqual(
+            [(item['last_day_worked'], item['next_day_worked']) for item in response.data['rest']],
+            [(date(2025, 3, 3), date(2025, 3, 5))]
+        )
+        self.assertEqual(response.data['consecutive_nights'][0]['nights'], 3)
+        self.assertEqual(response.data['count'], 4)
+
+    def test_year_check_uses_fixed_queries(self):
+        others = [make_staff(self.team, i) for i in range(2, 12)]
+        Shift.objects.bulk_create([
+            Shift(
+                shift_type=self.shift_type,
+                assigned_staff=member,
+                start_time=timezone.make_aware(datetime.combine(date(2025, 1, 1) + timedelta(days=d), time(8, 0))),
+                end_time=timezone.make_aware(datetime.combine(date(2025, 1, 1) + timedelta(days=d), time(16, 0))),
+            )
+            for member in others for d in range(365)
+        ])
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'start': '2025-01-01', 'end': '2025-12-31'})
+
+        self.assertEqual(response.data['count'], 0)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        self.other = make_staff(self.team, 2)
+        self.start = date(2025, 3, 3)
+        self.shift = make_shift(self.staff, self.shift_type, self.start)
+        self.shift.description = 'Engineering night; dome, closed'
+        self.shift.save()
+        make_shift(self.other, self.shift_type, self.start)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_per_staff_member(self):
+        response = self.client.get('/api/shifts/export/csv/', {'assigned_staff': self.staff.id})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = self.content(response).strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('id,date,start_time'))
+        self.assertIn('First1 Last001', lines[1])
+
+    def test_ics_per_schedule(self):
+        schedule = Schedule.objects.create(name='Week', start_date=self.start, end_date=self.start + timedelta(days=6))
+        schedule.shifts.add(self.shift)
+
+        response = self.client.get('/api/shifts/export/ics/', {'schedule': schedule.id})
+
+        body = self.content(response)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+        self.assertIn(f'UID:shift-{self.shift.id}@', body)
+        self.assertIn('DTSTART:20250303T080000Z', body)
+        self.assertIn('DESCRIPTION:Engineering night\; dome\\, closed', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+    def test_conditional_requests_get_304_until_a_shift_changes(self):
+        first = self.client.get('/api/shifts/export/ics/', {'team': self.team.id})
+        self.content(first)
+
+        # Shifts and recurring shifts aggregates
+        with self.assertNumQueries(2):
+            cached = self.client.get(
+                '/api/shifts/export/ics/', {'team': self.team.id}, HTTP_IF_NONE_MATCH=first['ETag']
+            )
+        self.assertEqual(cached.status_code, 304)
+
+        self.shift.status = 'confirmed'
+        self.shift.save()
+        changed = self.client.get(
+            '/api/shifts/export/ics/', {'team': self.team.id}, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+
+class WorkloadTests(APITestCase):
+    url = '/api/shifts/workload/'
+
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        self.other = make_staff(self.team, 2)
+        self.start = date(2025, 3, 3)  # Monday
+
+    def add_week(self):
+        make_shift(self.staff, self.shift_type, self.start)
+        make_shift(self.staff, self.shift_type, self.start + timedelta(days=5), start=time(20, 0), hours=10)
+        cancelled = make_shift(self.other, self.shift_type, self.start)
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        DailyAvailability.objects.create(staff_member=self.staff, date=self.start, availability_code='?')
+
+    def test_totals_and_fairness(self):
+        self.add_week()
+
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-31', 'team': self.team.id})
+
+        self.assertEqual(response.status_code, 200)
+        rows = {row['staff_member']: row for row in response.data['staff']}
+        self.assertEqual(rows[self.staff.id]['totals'], {
+            'shifts': 2, 'hours': 18.0, 'night_shifts': 1, 'day_shifts': 1,
+            'weekend_shifts': 1, 'maybe_day_shifts': 1,
+        })
+        self.assertEqual(rows[self.other.id]['totals']['shifts'], 0)
+        self.assertEqual([p['period'] for p in rows[self.staff.id]['periods']], [date(2025, 3, 1)])
+        self.assertEqual(response.data['fairness']['hours']['spread'], 18.0)
+
+    def test_weekly_periods(self):
+        self.add_week()
+        make_shift(self.staff, self.shift_type, self.start + timedelta(days=7))
+
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-31', 'period': 'week'})
+
+        rows = {row['staff_member']: row for row in response.data['staff']}
+        periods = {p['period']: p['shifts'] for p in rows[self.staff.id]['periods']}
+        self.assertEqual(periods, {date(2025, 3, 3): 2, date(2025, 3, 10): 1})
+
+    def test_query_count_stays_flat(self):
+        params = {'start': '2024-04-01', 'end': '2025-03-31'}
+        self.add_week()
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, params)
+
+        for i in range(3, 23):
+            staff = make_staff(self.team, i)
+            for week in range(10):
+                make_shift(staff, self.shift_type, self.start - timedelta(weeks=week))
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url, params)
+        self.assertEqual(len(response.data['staff']), 22)
+        self.assertEqual(len(large), len(small))
+
+    def test_rejects_bad_period(self):
+        response = self.client.get(self.url, {'start': '2025-03-01', 'end': '2025-03-31', 'period': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(WORKLOAD_ROLLUPS=True)
+    def test_rollups_follow_shift_changes(self):
+        shift = make_shift(self.staff, self.shift_type, self.start, hours=6)
+        rollup = WorkloadRollup.objects.get(staff_member=self.staff, month=date(2025, 3, 1))
+        self.assertEqual((rollup.shifts, rollup.hours), (1, 6.0))
+
+        shift.assigned_staff = self.other
+        shift.save()
+        self.assertEqual(WorkloadRollup.objects.get(staff_member=self.staff).shifts, 0)
+        self.assertEqual(WorkloadRollup.objects.get(staff_member=self.other).shifts, 1)
+
+        shift.delete()
+        self.assertEqual(WorkloadRollup.objects.get(staff_member=self.other).shifts, 0)
+
+    @override_settings(WORKLOAD_ROLLUPS=True)
+    def test_rollup_report_matches_live_report(self):
+        self.add_week()
+        params = {'start': '2025-03-01', 'end': '2025-03-31'}
+        from_rollups = self.client.get(self.url, params).data
+
+        with override_settings(WORKLOAD_ROLLUPS=False):
+            live = self.client.get(self.url, params).data
+        self.assertEqual(from_rollups, live)
+
+    def test_rebuild_command(self):
+        self.add_week()
+        out = StringIO()
+        call_command(
+            'rebuild_workload_rollups', '--start', '2025-03-01', '--end', '2025-03-31', '--team', 'OBS', stdout=out
+        )
+
+        self.assertIn('Rebuilt 2 monthly rollups', out.getvalue())
+        rollup = WorkloadRollup.objects.get(staff_member=self.staff, month=date(2025, 3, 1))
+        self.assertEqual((rollup.shifts, rollup.night_shifts, rollup.weekend_shifts), (2, 1, 1))
+
+
+class BenchmarkTests(TestCase):
+    def test_query_counts_do_not_grow_with_data(self):
+        small = benchmark_endpoints(seed_dataset(4, 31), repeat=1)
+        self.assertEqual(set(small), set(ENDPOINTS))
+        large = benchmark_endpoints(seed_dataset(16, 31, seed=2), repeat=1)
+        for endpoint in ENDPOINTS:
+            self.assertEqual(large[endpoint]['queries'], small[endpoint]['queries'], endpoint)
+            self.assertGreater(large[endpoint]['bytes'], 0)
+
+    def test_compare_flags_query_and_latency_regressions(self):
+        row = {'staff': 50, 'endpoint': 'calendar', 'queries': 4, 'median_ms': 10.0}
+        baseline = {'results': [row]}
+        self.assertEqual(compare(baseline, {'results': [dict(row, median_ms=12.0)]}), [])
+        problems = compare(baseline, {'results': [dict(row, queries=5, median_ms=20.0)]})
+        self.assertEqual(len(problems), 2)
+
+
+class ProfilingMiddlewareTests(APITestCase):
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        for i in range(3):
+            make_shift(make_staff(self.team, i), self.shift_type, date(2025, 3, 1) + timedelta(days=i))
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            metric, *fields = entry.split(';')
+            entries[metric] = dict(field.split('=', 1) for field in fields)
+        return entries
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/shifts/')
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'total', 'view', 'db', 'app', 'render'})
+        self.assertEqual(timings['db']['desc'], f'"{len(queries)} queries"')
+        self.assertEqual(timings['view']['desc'], '"ShiftViewSet.list (ShiftListValuesSerializer)"')
+        self.assertGreaterEqual(float(timings['total']['dur']), float(timings['view']['dur']))
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/shifts/'))
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_logs_repeated_queries(self):
+        with self.assertLogs('config.profiling', level='WARNING') as logs:
+            for shift in Shift.objects.all():
+                self.client.patch(f'/api/shifts/{shift.id}/', {'notes': 'x'})
+        self.assertIn('Slow request PATCH /api/shifts/', logs.output[0])
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE id IN (%s, %s) AND b = 'x' LIMIT 21"),
+                         'SELECT a FROM t WHERE id IN (...) AND b = ? LIMIT ?')
+
+    def test_profile_sampling(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_DIR=directory):
+                self.client.get('/api/shifts/calendar/', {'start_date': '2025-03-01', 'end_date': '2025-03-07'})
+            dumps = list(Path(directory).glob('*-GET-api-shifts-calendar-*.prof'))
+        self.assertEqual(len(dumps), 1)
+
+
+class ScheduleSnapshotTests(APITestCase):
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        self.shifts = [
+            make_shift(self.staff, self.shift_type, date(2025, 3, 1) + timedelta(days=i)) for i in range(3)
+        ]
+        response = self.client.post('/api/schedules/', {
+            'name': 'March', 'start_date': '2025-03-01', 'end_date': '2025-03-31',
+            'status': 'published', 'shifts': [shift.id for shift in self.shifts],
+        })
+        self.assertEqual(response.status_code, 201)
+        self.schedule = Schedule.objects.get(pk=response.data['id'])
+        self.url = f'/api/schedules/{self.schedule.id}/'
+
+    def test_publish_freezes_snapshot_served_in_one_query(self):
+        snapshot = ScheduleSnapshot.objects.get(schedule=self.schedule)
+        self.assertEqual(snapshot.version, 1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Snapshot-Version'], '1')
+        data = response.json()
+        self.assertEqual(data['total_shifts'], 3)
+        self.assertEqual([shift['staff_name'] for shift in data['shifts_details']], [self.staff.full_name] * 3)
+
+        # Same bytes as a fresh serialization
+        ScheduleSnapshot.objects.all().delete()
+        self.assertEqual(self.client.get(self.url).json(), data)
+
+    def test_gzip_and_conditional_requests(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['id'], self.schedule.id)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_member_changes_invalidate_and_bump_version(self):
+        shift = self.shifts[0]
+        shift.status = 'confirmed'
+        shift.save()
+        self.assertIsNone(ScheduleSnapshot.objects.get(schedule=self.schedule).payload)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Snapshot-Version'], '2')
+        self.assertEqual(response.data['shifts_details'][0]['status'], 'confirmed')
+
+        self.staff.user.last_name = 'Renamed'
+        self.staff.user.save()
+        self.assertEqual(self.client.get(self.url).json()['shifts_details'][0]['staff_name'], self.staff.full_name)
+
+        self.schedule.shifts.remove(self.shifts[2])
+        self.shifts[1].delete()
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['total_shifts'], 1)
+        self.assertEqual(ScheduleSnapshot.objects.get(schedule=self.schedule).version, 4)
+
+    def test_drafts_are_not_snapshotted(self):
+        self.client.patch(self.url, {'status': 'draft'})
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Snapshot-Version', response)
+        self.assertEqual(response.data['status'], 'draft')
+
+
+class ShiftChangeFeedTests(APITestCase):
+    def test_changes_use_list_serializer_and_record_deletions(self):
+        team = make_team()
+        shift_type = make_shift_type(team)
+        since = timezone.now()
+        shifts = [make_shift(make_staff(team, i), shift_type, date(2025, 3, 1 + i)) for i in range(3)]
+        self.client.delete(f'/api/shifts/{shifts[0].id}/')
+
+        # Changed rows, those matching the filters and tombstones
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/shifts/changes/', {'updated_since': since.isoformat()})
+        self.assertEqual([row['id'] for row in response.data['results']], [shifts[1].id, shifts[2].id])
+        self.assertEqual(response.data['results'][0]['staff_name'], shifts[1].assigned_staff.full_name)
+        self.assertEqual(response.data['deleted'], [shifts[0].id])
+
+    def test_rows_edited_out_of_the_filters_are_removed(self):
+        team = make_team()
+        shift_type = make_shift_type(team)
+        first, second = make_staff(team, 1), make_staff(team, 2)
+        shift = make_shift(first, shift_type, date(2025, 3, 1))
+        since = timezone.now()
+        shift.assigned_staff = second
+        shift.save()
+
+        params = {'updated_since': since.isoformat()}
+        response = self.client.get('/api/shifts/changes/', {**params, 'assigned_staff': first.id})
+        self.assertEqual((response.data['results'], response.data['removed']), ([], [shift.id]))
+        response = self.client.get('/api/shifts/changes/', {**params, 'assigned_staff': second.id})
+        self.assertEqual([row['id'] for row in response.data['results']], [shift.id])
+        self.assertEqual(response.data['removed'], [])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        team = make_team()
+        shift_type = make_shift_type(team)
+        self.shifts = [make_shift(make_staff(team, i), shift_type, date(2025, 3, 1 + i)) for i in range(3)]
+
+    def test_fields_trim_payload_and_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/shifts/', {'fields': 'id,start_time,staff_name'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['results'][0],
+            {'id': self.shifts[0].id, 'start_time': '2025-03-01T08:00:00Z', 'staff_name': 'First0 Last000'},
+        )
+        select = queries[-1]['sql']
+        self.assertNotIn('staff_shifttype', select)
+        self.assertNotIn('observatory_telescope', select)
+        self.assertNotIn('"auth_user"."email"', select)
+        self.assertNotIn('"shifts_shift"."notes"', select)
+
+    def test_omit_and_nested_details(self):
+        response = self.client.get('/api/shifts/', {'omit': 'staff_name,staff_team,telescope_name'})
+        self.assertNotIn('staff_name', response.data['results'][0])
+        self.assertEqual(response.data['results'][0]['shift_code'], '1')
+
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/shifts/{self.shifts[0].id}/', {'fields': 'id,assigned_staff_details'})
+        self.assertEqual(set(response.data), {'id', 'assigned_staff_details'})
+        self.assertEqual(response.data['assigned_staff_details']['full_name'], 'First0 Last000')
+
+    def test_unknown_fields_rejected(self):
+        response = self.client.get('/api/shifts/', {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_writes_and_snapshots_use_full_serializer(self):
+        response = self.client.patch(
+            f'/api/shifts/{self.shifts[0].id}/?fields=id', {'notes': 'Swap'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['notes'], 'Swap')
+
+        schedule = Schedule.objects.create(
+            name='March', start_date=date(2025, 3, 1), end_date=date(2025, 3, 31), status='published'
+        )
+        schedule.shifts.set(self.shifts)
+        response = self.client.get(f'/api/schedules/{schedule.id}/', {'fields': 'id,total_shifts'})
+        self.assertEqual(response.data, {'id': schedule.id, 'total_shifts': 3})
+        self.assertFalse(ScheduleSnapshot.objects.filter(schedule=schedule, payload__isnull=False).exists())
+        self.assertIn('shifts_details', self.client.get(f'/api/schedules/{schedule.id}/').json())
+
+
+class ValuesSerializerTests(APITestCase):
+    def setUp(self):
+        team = make_team()
+        shift_type = make_shift_type(team)
+        telescope = Telescope.objects.create(name='Simonyi Survey Telescope', code='SST', aperture=8.4)
+        drifter = make_staff(team, 2)
+        drifter.team = None
+        drifter.save()
+        self.shifts = [
+            make_shift(make_staff(team, 1), shift_type, date(2025, 3, 1)),
+            make_shift(drifter, shift_type, date(2025, 3, 2), start=time(20, 0), hours=10),
+            make_shift(None, shift_type, date(2025, 3, 3)),
+        ]
+        self.shifts[0].telescope = telescope
+        self.shifts[0].start_time += timedelta(microseconds=1234)
+        self.shifts[0].save()
+
+    def test_matches_list_serializer(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/shifts/')
+        expected = ShiftListSerializer(
+            Shift.objects.select_related('assigned_staff__user', 'assigned_staff__team', 'shift_type', 'telescope'),
+            many=True,
+        ).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+        self.assertNotIn('staff_name', response.json()['results'][2])
+
+    def test_keyset_pages_and_sparse_fallback(self):
+        response = self.client.get('/api/shifts/', {'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['id'] for row in response.data['results']], [self.shifts[2].id])
+
+        response = self.client.get('/api/shifts/', {'fields': 'id,duration_hours'})
+        self.assertEqual(response.data['results'][1], {'id': self.shifts[1].id, 'duration_hours': 10.0})
+
+
+class ORJSONRendererTests(TestCase):
+    def test_same_bytes_as_drf(self):
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from config.renderers import ORJSONRenderer
+
+        data = {
+            'when': timezone.make_aware(datetime(2025, 3, 1, 8, 0, 0, 123456)),
+            'day': date(2025, 3, 1),
+            'at': time(8, 30),
+            'hours': Decimal('8.50'),
+            'text': 'Cerro Pachón \u2028 night',
+            'nested': [{'id': 1, 'ratio': 0.5, 'none': None, 'flag': True}],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertEqual(
+            ORJSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+            JSONRenderer().render({'a': 1}, 'application/json; indent=2'),
+        )
+
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        team = make_team()
+        self.shift_type = make_shift_type(team)
+        self.staff = make_staff(team, 1)
+        self.shifts = [make_shift(self.staff, self.shift_type, date(2025, 3, 1 + i)) for i in range(3)]
+        self.schedule = Schedule.objects.create(name='March', start_date=date(2025, 3, 1), end_date=date(2025, 3, 31))
+
+    def revalidate(self, url, params=None):
+        """ETag of a first request and the status of a second one sending it back"""
+        etag = self.client.get(url, params)['ETag']
+        return etag, self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_list_costs_one_query(self):
+        response = self.client.get('/api/shifts/')
+        self.assertIn('no-cache', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            repeat = self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], response['ETag'])
+
+    def test_etag_follows_filters_and_format(self):
+        first = self.client.get('/api/shifts/')['ETag']
+        self.assertNotEqual(self.client.get('/api/shifts/', {'start_date': '2025-03-02'})['ETag'], first)
+        self.assertNotEqual(self.client.get('/api/shifts/', HTTP_ACCEPT='text/html')['ETag'], first)
+
+    def test_writes_change_etag(self):
+        etag, status = self.revalidate('/api/shifts/')
+        self.assertEqual(status, 304)
+
+        self.shifts[0].description = 'Moved'
+        self.shifts[0].save()
+        self.assertEqual(self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get('/api/shifts/')['ETag']
+
+        self.shifts[1].delete()
+        self.assertEqual(self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_dependency_change_after_commit(self):
+        etag, _ = self.revalidate('/api/shifts/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.staff.user.first_name = 'Renamed'
+            self.staff.user.save()
+        self.assertEqual(self.client.get('/api/shifts/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_retrieve(self):
+        url = f'/api/shifts/{self.shifts[0].id}/'
+        etag, status = self.revalidate(url)
+        self.assertEqual(status, 304)
+        self.assertNotEqual(self.client.get(f'/api/shifts/{self.shifts[1].id}/')['ETag'], etag)
+        self.assertEqual(self.client.get('/api/shifts/999999/', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_schedule_membership(self):
+        url = f'/api/schedules/{self.schedule.id}/'
+        etag, status = self.revalidate(url)
+        self.assertEqual(status, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.shifts.add(self.shifts[0])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_keyset_pages_have_no_etag(self):
+        response = self.client.get('/api/shifts/', {'pagination': 'cursor'})
+        self.assertFalse(response.has_header('ETag'))
+
+
+class RecurrenceTests(APITestCase):
+    def setUp(self):
+        self.team = make_team()
+        self.shift_type = make_shift_type(self.team)
+        self.staff = make_staff(self.team, 1)
+        # Monday to Thursday from Monday 3 March 2025
+        self.recurring = RecurringShift.objects.create(
+            shift_type=self.shift_type,
+            assigned_staff=self.staff,
+            rrule='FREQ=WEEKLY;BYDAY=MO,TU,WE,TH',
+            dtstart=date(2025, 3, 3),
+            start_time=time(8, 0),
+            end_time=time(16, 0),
+            exdates=['2025-03-05'],
+        )
+
+    def window(self, first, last):
+        return {'start_time__gte': f'{first}T00:00:00Z', 'start_time__lt': f'{last}T00:00:00Z'}
+
+    def test_occurrence_dates(self):
+        dates = lambda rrule, dtstart, end: list(occurrence_dates(parse_rrule(rrule), dtstart, dtstart, end))
+        self.assertEqual(
+            dates('FREQ=WEEKLY;BYDAY=MO,TH', date(2025, 3, 4), date(2025, 3, 17)),
+            [date(2025, 3, 6), date(2025, 3, 10), date(2025, 3, 13), date(2025, 3, 17)],
+        )
+        self.assertEqual(
+            dates('FREQ=WEEKLY;INTERVAL=2;BYDAY=MO;COUNT=3', date(2025, 3, 3), date(2025, 12, 31)),
+            [date(2025, 3, 3), date(2025, 3, 17), date(2025, 3, 31)],
+        )
+        self.assertEqual(
+            dates('FREQ=DAILY;INTERVAL=3;UNTIL=20250310', date(2025, 3, 1), date(2025, 12, 31)),
+            [date(2025, 3, 1), date(2025, 3, 4), date(2025, 3, 7), date(2025, 3, 10)],
+        )
+        # Windows after the start jump ahead without changing the dates
+        rule = parse_rrule('FREQ=WEEKLY;INTERVAL=2;BYDAY=TU')
+        self.assertEqual(
+            list(occurrence_dates(rule, date(2025, 3, 3), date(2025, 3, 12), date(2025, 3, 31))),
+            [date(2025, 3, 18)],
+        )
+        self.assertEqual(last_occurrence(parse_rrule('FREQ=WEEKLY;BYDAY=FR;COUNT=2'), date(2025, 3, 3)), date(2025, 3, 14))
+        self.assertEqual(to_rrule(parse_rrule('rrule:freq=weekly;byday=th,mo')), 'FREQ=WEEKLY;BYDAY=MO,TH')
+
+    def test_invalid_rules_are_rejected(self):
+        for rrule in ('FREQ=MONTHLY', 'FREQ=WEEKLY;BYDAY=1MO', 'FREQ=DAILY;COUNT=2;UNTIL=20250401', 'FREQ=DAILY;BYSETPOS=1'):
+            with self.assertRaises(ValueError):
+                parse_rrule(rrule)
+        response = self.client.post('/api/recurring-shifts/', {
+            'shift_type': self.shift_type.id, 'rrule': 'FREQ=YEARLY', 'dtstart': '2025-03-03',
+            'start_time': '08:00', 'end_time': '16:00',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rrule', response.data)
+
+    def test_create_stores_last_date(self):
+        response = self.client.post('/api/recurring-shifts/', {
+            'shift_type': self.shift_type.id, 'assigned_staff': self.staff.id,
+            'rrule': 'FREQ=DAILY;COUNT=5', 'dtstart': '2025-03-03', 'start_time': '20:00', 'end_time': '04:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['last_date'], '2025-03-07')
+
+        occurrences = self.client.get(
+            f'/api/recurring-shifts/{response.data["id"]}/occurrences/',
+            {'start_date': '2025-03-06', 'end_date': '2025-03-31'},
+        ).data
+        self.assertEqual([item['start_time'] for item in occurrences], ['2025-03-06T20:00:00Z', '2025-03-07T20:00:00Z'])
+        self.assertEqual(occurrences[0]['end_time'], '2025-03-07T04:00:00Z')
+        self.assertIsNone(occurrences[0]['id'])
+
+    def test_list_merges_occurrences_within_window(self):
+        stored = make_shift(self.staff, self.shift_type, date(2025, 3, 4), start=time(18, 0))
+
+        response = self.client.get('/api/shifts/', self.window('2025-03-03', '2025-03-10'))
+        results = response.data['results']
+        # Mon, Tue, Thu occurrences (Wed skipped) and the stored shift, by start time
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual([item['id'] for item in results], [None, None, stored.id, None])
+        self.assertEqual(results[0]['recurrence'], self.recurring.id)
+        self.assertEqual(results[0]['recurrence_date'], '2025-03-03')
+
+        # Open windows and filters occurrences cannot match leave the list alone
+        self.assertEqual(self.client.get('/api/shifts/', {'start_time__gte': '2025-03-03T00:00:00Z'}).data['count'], 1)
+        self.assertEqual(
+            self.client.get('/api/shifts/', {**self.window('2025-03-03', '2025-03-10'), 'status': 'confirmed'}).data['count'],
+            0,
+        )
+
+    def test_long_windows(self):
+        params = self.window('2020-01-01', '2030-01-01')
+        self.recurring.delete()
+        make_shift(self.staff, self.shift_type, date(2025, 3, 3))
+        self.assertEqual(self.client.get('/api/shifts/', params).data['count'], 1)
+        self.assertEqual(self.client.get('/api/shifts/export/csv/', params).status_code, 200)
+
+        # Only rules active for longer than the cap within the window are refused
+        RecurringShift.objects.create(
+            shift_type=self.shift_type, rrule='FREQ=DAILY;COUNT=10', dtstart=date(2025, 3, 3),
+            start_time=time(8, 0), end_time=time(16, 0),
+        )
+        self.assertEqual(self.client.get('/api/shifts/', params).data['count'], 11)
+        RecurringShift.objects.create(
+            shift_type=self.shift_type, rrule='FREQ=DAILY', dtstart=date(2025, 3, 3),
+            start_time=time(8, 0), end_time=time(16, 0),
+        )
+        self.assertEqual(self.client.get('/api/shifts/', params).status_code, 400)
+
+    def test_merged_pages_read_only_the_stored_rows_they_need(self):
+        stored = [
+            make_shift(self.staff, self.shift_type, date(2025, 3, 1) + timedelta(days=day), start=time(18, 0))
+            for day in range(30)
+        ]
+        occurrences = expand([self.recurring], date(2025, 3, 1), date(2025, 3, 31))
+        expected = sorted(
+            [(shift.id, shift.start_time) for shift in stored] + [(None, shift.start_time) for shift in occurrences],
+            key=lambda item: item[1],
+        )
+        params = self.window('2025-03-01', '2025-04-01')
+        results = lambda page: [(item['id'], parse_datetime(item['start_time'])) for item in page['results']]
+
+        with CaptureQueriesContext(connection) as queries:
+            page = self.client.get('/api/shifts/', {**params, 'page': 2}).data
+        self.assertEqual(page['count'], 46)
+        self.assertEqual(results(page), expected[20:40])
+        # The list query (joined to shift types), not expand()'s lookup of materialised dates
+        list_queries = [query['sql'] for query in queries if query['sql'].startswith('SELECT "shifts_shift"."id"')
+                        and 'JOIN "staff_shifttype"' in query['sql']]
+        self.assertEqual(len(list_queries), 1)
+        self.assertIn('LIMIT 40', list_queries[0])
+        # Read through the values serializer's columns
+        self.assertNotIn('"shifts_shift"."description"', list_queries[0])
+
+        # Sparse fieldsets and descending order go through the same merge
+        page = self.client.get('/api/shifts/', {**params, 'fields': 'id,start_time', 'ordering': '-start_time'}).data
+        self.assertEqual(results(page), expected[::-1][:20])
+
+    def test_materialise_replaces_the_occurrence(self):
+        url = f'/api/recurring-shifts/{self.recurring.id}/materialise/'
+        response = self.client.post(url, {'date': '2025-03-04', 'start_time': '2025-03-04T10:00:00Z'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        shift = Shift.objects.get(id=response.data['id'])
+        self.assertEqual((shift.recurrence_id, shift.recurrence_date), (self.recurring.id, date(2025, 3, 4)))
+        self.assertEqual(shift.end_time, timezone.make_aware(datetime(2025, 3, 4, 16, 0)))
+
+        results = self.client.get('/api/shifts/', self.window('2025-03-03', '2025-03-07')).data['results']
+        self.assertEqual([item['id'] for item in results], [None, shift.id, None])
+
+        # Skipped and already materialised dates have nothing to materialise
+        self.assertEqual(self.client.post(url, {'date': '2025-03-04'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'date': '2025-03-05'}, format='json').status_code, 400)
+
+        # Deleting the stored shift skips the date instead of bringing the occurrence back
+        self.assertEqual(self.client.delete(f'/api/shifts/{shift.id}/').status_code, 204)
+        self.recurring.refresh_from_db()
+        self.assertEqual(self.recurring.exdates, ['2025-03-04', '2025-03-05'])
+        results = self.client.get('/api/shifts/', self.window('2025-03-03', '2025-03-07')).data['results']
+        self.assertEqual([item['recurrence_date'] for item in results], ['2025-03-03', '2025-03-06'])
+
+    def test_skipping_an_occurrence(self):
+        url = f'/api/recurring-shifts/{self.recurring.id}/'
+        response = self.client.patch(url, {'exdates': ['2025-03-06', '2025-03-05']}, format='json')
+        self.assertEqual(response.data['exdates'], ['2025-03-05', '2025-03-06'])
+        dates = [item['recurrence_date'] for item in self.client.get(
+            f'{url}occurrences/', {'start_date': '2025-03-03', 'end_date': '2025-03-09'}
+        ).data]
+        self.assertEqual(dates, ['2025-03-03', '2025-03-04'])
+
+    def test_calendar_cells(self):
+        response = self.client.get('/api/shifts/calendar/', {'start_date': '2025-03-05', 'end_date': '2025-03-06'})
+        cells = response.data['rows'][0]['shifts']
+        self.assertEqual(list(cells), ['2025-03-06'])
+        self.assertIsNone(cells['2025-03-06'][0]['id'])
+        self.assertEqual(cells['2025-03-06'][0]['recurrence'], self.recurring.id)
+        self.assertEqual(response.data['shift_types'][0]['code'], self.shift_type.code)
+
+    def test_exports(self):
+        make_shift(self.staff, self.shift_type, date(2025, 3, 3), start=time(6, 0))
+        csv = b''.join(self.client.get('/api/shifts/export/csv/', self.window('2025-03-03', '2025-03-05')).streaming_content)
+        # Header, the stored shift, then the Monday and Tuesday occurrences
+        self.assertEqual(len(csv.decode().strip().splitlines()), 4)
+
+        ics = b''.join(self.client.get('/api/shifts/export/ics/').streaming_content).decode()
+        self.assertEqual(ics.count('BEGIN:VEVENT'), 2)
+        self.assertIn('RRULE:FREQ=WEEKLY;BYDAY=MO,TU,WE,TH', ics)
+        self.assertIn('EXDATE', ics)
+        self.assertIn(f'UID:recurring-shift-{self.recurring.id}@', ics)
+
+    def test_rule_changes_change_etag(self):
+        params = self.window('2025-03-03', '2025-03-10')
+        etag = self.client.get('/api/shifts/', params)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recurring.exdates = []
+            self.recurring.save()
+        self.assertEqual(self.client.get('/api/shifts/', params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
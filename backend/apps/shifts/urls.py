@@ -1,12 +1,15 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ShiftViewSet, ScheduleViewSet
+from apps.staff.views import event_stream
+from .views import ShiftViewSet, RecurringShiftViewSet, ScheduleViewSet
 
 # Create router and register viewsets
 router = DefaultRouter()
 router.register(r'shifts', ShiftViewSet, basename='shift')
+router.register(r'recurring-shifts', RecurringShiftViewSet, basename='recurring-shift')
 router.register(r'schedules', ScheduleViewSet, basename='schedule')
 
 urlpatterns = [
+    path('events/', event_stream, name='event-stream'),
     path('', include(router.urls)),
 ]
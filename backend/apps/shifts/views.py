@@ -1,34 +1,81 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Prefetch
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Shift, Schedule
+from django.contrib.auth.models import User
+from apps.observatory.models import Telescope
+from apps.staff.models import StaffMember, Team, ShiftType
+from apps.staff.sync import ChangeFeedMixin
+from apps.staff.conditional import ConditionalGetMixin
+from apps.staff.fieldsets import SparseFieldsetMixin
+from apps.staff.values import ValuesListMixin
+from .models import Shift, RecurringShift, Schedule
 from .serializers import (
     ShiftSerializer,
     ShiftListSerializer,
+    ShiftListValuesSerializer,
+    RecurringShiftSerializer,
+    RecurringOccurrenceQuerySerializer,
+    MaterialiseOccurrenceSerializer,
     ScheduleSerializer,
-    ScheduleListSerializer
+    ScheduleListSerializer,
+    CalendarGridQuerySerializer,
+    ConflictQuerySerializer,
+    WorkloadQuerySerializer,
+    AutoAssignSerializer,
+    RotationSerializer
 )
+from .calendar import build_calendar_grid
+from .conflicts import find_conflicts
+from .analytics import workload_report
+from .export import export_response
+from .pagination import ShiftPagination
+from .scheduler import AutoScheduler
+from .rotation import materialise_rotation
+from .recurrence import OccurrenceListMixin, expand
+from .snapshots import current_snapshot, store_snapshot, snapshot_etag, snapshot_response
+from .filters import ShiftFilter
 
 
-class ShiftViewSet(viewsets.ModelViewSet):
+class ShiftViewSet(ConditionalGetMixin, ChangeFeedMixin, SparseFieldsetMixin, OccurrenceListMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for Shift CRUD operations
     """
-    queryset = Shift.objects.select_related(
-        'assigned_staff__user',
-        'telescope',
-        'created_by'
-    ).all()
+    queryset = Shift.objects.all()
     serializer_class = ShiftSerializer
+    values_serializer_class = ShiftListValuesSerializer
+    etag_dependencies = (StaffMember, User, Team, ShiftType, Telescope, RecurringShift)
+    pagination_class = ShiftPagination
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['shift_type', 'status', 'assigned_staff', 'telescope']
+    filterset_class = ShiftFilter
     search_fields = ['description', 'assigned_staff__user__first_name', 'assigned_staff__user__last_name']
     ordering_fields = ['start_time', 'shift_type']
     ordering = ['start_time']
     
+    def get_queryset(self):
+        # Join everything the serializer for this action reads so rows
+        # never trigger per-object queries
+        if self.action in ('list', 'changes'):
+            return Shift.objects.select_related(
+                'assigned_staff__user',
+                'assigned_staff__team',
+                'shift_type',
+                'telescope'
+            )
+        return Shift.objects.select_related(
+            'assigned_staff__user',
+            'assigned_staff__team',
+            'shift_type__team',
+            'telescope'
+        )
+    
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'changes'):
             return ShiftListSerializer
         return ShiftSerializer
     
@@ -38,14 +85,172 @@ class ShiftViewSet(viewsets.ModelViewSet):
             serializer.save(created_by=self.request.user)
         else:
             serializer.save()
+    
+    @action(detail=False, methods=['get'])
+    def calendar(self, request):
+        """
+        Staff rows x date columns with shifts and availability pre-joined.
+        
+        Query params: start_date, end_date (inclusive, YYYY-MM-DD) and
+        optionally team (id) or team__name to restrict the staff rows.
+        """
+        params = CalendarGridQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        staff = StaffMember.objects.all()
+        if 'team' in query:
+            staff = staff.filter(team_id=query['team'])
+        if 'team__name' in query:
+            staff = staff.filter(team__name=query['team__name'])
+        
+        grid = build_calendar_grid(query['start_date'], query['end_date'], staff)
+        return Response(grid)
+    
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<file_format>csv|ics)')
+    def export(self, request, file_format=None):
+        """
+        Stream shifts as CSV or iCalendar.
+        
+        Accepts the same filters as the list, e.g. assigned_staff, team or
+        schedule, and answers conditional requests with 304 when nothing
+        has changed. CSV includes recurring shift occurrences when the
+        start_time window is bounded; iCalendar includes recurring shifts
+        as repeating events.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        filterset = self.get_occurrence_filterset(request)
+        recurring = self.get_recurring(request, filterset, filterset.occurrence_window() or ())
+        if file_format == 'ics':
+            return export_response(request, queryset, file_format, recurring=recurring)
+        occurrences = self.get_occurrences(request, filterset)
+        return export_response(request, queryset, file_format, occurrences=occurrences, recurring=recurring)
+    
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        """
+        Overlapping shifts, shifts on 'X' days and rest-rule breaches.
+        
+        Query params: start, end (inclusive, YYYY-MM-DD) and optionally
+        team or staff_member (ids).
+        """
+        params = ConflictQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        staff = StaffMember.objects.all()
+        if 'team' in query:
+            staff = staff.filter(team_id=query['team'])
+        if 'staff_member' in query:
+            staff = staff.filter(pk=query['staff_member'])
+        
+        conflicts = find_conflicts(query['start'], query['end'], staff)
+        conflicts['count'] = sum(len(items) for items in conflicts.values())
+        return Response(conflicts)
+    
+    @action(detail=False, methods=['get'])
+    def workload(self, request):
+        """
+        Hours, night, weekend and '?'-day shift counts per staff member.
+        
+        Query params: start, end (inclusive, YYYY-MM-DD), period
+        (week, month or total; default month) and optionally team or
+        staff_member (ids).
+        """
+        params = WorkloadQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        staff = StaffMember.objects.all()
+        if 'team' in query:
+            staff = staff.filter(team_id=query['team'])
+        if 'staff_member' in query:
+            staff = staff.filter(pk=query['staff_member'])
+        
+        return Response(workload_report(query['start'], query['end'], staff, period=query['period']))
 
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+class RecurringShiftViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for RecurringShift CRUD operations
+    """
+    queryset = RecurringShift.objects.select_related(
+        'assigned_staff__user', 'assigned_staff__team', 'shift_type', 'telescope'
+    )
+    serializer_class = RecurringShiftSerializer
+    etag_dependencies = (User, ShiftType)
+    # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['shift_type', 'assigned_staff', 'telescope']
+    ordering_fields = ['dtstart']
+    ordering = ['dtstart', 'id']
+    
+    def perform_create(self, serializer):
+        # Only set created_by if user is authenticated
+        if self.request.user.is_authenticated:
+            serializer.save(created_by=self.request.user)
+        else:
+            serializer.save()
+    
+    @action(detail=True, methods=['get'])
+    def occurrences(self, request, pk=None):
+        """
+        Pending occurrences between start_date and end_date (inclusive), in
+        the shift list format with id null.
+        """
+        recurring = self.get_object()
+        params = RecurringOccurrenceQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        occurrences = expand([recurring], query['start_date'], query['end_date'])
+        return Response(ShiftListSerializer(occurrences, many=True).data)
+    
+    @action(detail=True, methods=['post'])
+    def materialise(self, request, pk=None):
+        """
+        Store one occurrence as a Shift so it can be edited on its own.
+        
+        Body: date, plus any Shift fields to change from the occurrence
+        (e.g. assigned_staff, start_time, end_time, status).
+        """
+        recurring = self.get_object()
+        params = MaterialiseOccurrenceSerializer(data=request.data, context={'recurring': recurring})
+        params.is_valid(raise_exception=True)
+        occurrence = params.validated_data['occurrence']
+        
+        data = {
+            'shift_type': occurrence.shift_type_id,
+            'assigned_staff': occurrence.assigned_staff_id,
+            'telescope': occurrence.telescope_id,
+            'start_time': occurrence.start_time,
+            'end_time': occurrence.end_time,
+            'description': occurrence.description,
+        }
+        data.update((name, value) for name, value in request.data.items() if name != 'date')
+        serializer = ShiftSerializer(data=data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                serializer.save(
+                    recurrence=recurring,
+                    recurrence_date=occurrence.recurrence_date,
+                    created_by=request.user if request.user.is_authenticated else None,
+                )
+                # Changes the rule's EXDATEs in the iCalendar export
+                RecurringShift.objects.filter(pk=recurring.pk).update(updated_at=timezone.now())
+        except IntegrityError:
+            return Response({'date': ['This occurrence is already materialised']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ScheduleViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Schedule CRUD operations
     """
-    queryset = Schedule.objects.prefetch_related('shifts').all()
+    queryset = Schedule.objects.all()
     serializer_class = ScheduleSerializer
+    etag_dependencies = (Shift, Schedule.shifts.through, StaffMember, User, Team, ShiftType, Telescope)
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status']
@@ -53,14 +258,105 @@ class ScheduleViewSet(viewsets.ModelViewSet):
     ordering_fields = ['start_date', 'name']
     ordering = ['-start_date']
     
+    def get_queryset(self):
+        if self.action == 'list':
+            return Schedule.objects.annotate(shift_count=Count('shifts'))
+        return Schedule.objects.prefetch_related(
+            Prefetch(
+                'shifts',
+                queryset=Shift.objects.select_related(
+                    'assigned_staff__user',
+                    'assigned_staff__team',
+                    'shift_type',
+                    'telescope'
+                )
+            )
+        )
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ScheduleListSerializer
         return ScheduleSerializer
     
+    def retrieve(self, request, *args, **kwargs):
+        # Published schedules are served from their frozen JSON snapshot,
+        # which always holds every field
+        is_json = request.accepted_renderer.format == 'json' and self.get_fieldset() is None
+        pk = str(kwargs.get(self.lookup_field, ''))
+        if is_json and pk.isdigit():
+            snapshot = current_snapshot(int(pk))
+            if snapshot is not None:
+                return snapshot_response(request, snapshot)
+        
+        response = super().retrieve(request, *args, **kwargs)
+        if is_json and response.status_code == 200 and response.data['status'] == 'published':
+            snapshot = store_snapshot(response.data['id'], response.data)
+            response['ETag'] = snapshot_etag(snapshot)
+            response['X-Snapshot-Version'] = snapshot.version
+        return response
+    
     def perform_create(self, serializer):
         # Only set created_by if user is authenticated
         if self.request.user.is_authenticated:
             serializer.save(created_by=self.request.user)
         else:
             serializer.save()
+        self.freeze_if_published(serializer.instance)
+    
+    def perform_update(self, serializer):
+        serializer.save()
+        self.freeze_if_published(serializer.instance)
+    
+    def freeze_if_published(self, schedule):
+        """Snapshot a schedule as soon as it is published (after its shifts are set)"""
+        if schedule.status == 'published':
+            schedule = self.get_queryset().get(pk=schedule.pk)
+            store_snapshot(schedule.pk, ScheduleSerializer(schedule, context=self.get_serializer_context()).data)
+    
+    @action(detail=True, methods=['post'], url_path='auto-assign')
+    def auto_assign(self, request, pk=None):
+        """
+        Fill this schedule's unassigned shifts for a team automatically.
+        
+        Body: team (id), optional shift_types (ids) and dry_run (bool).
+        """
+        schedule = self.get_object()
+        params = AutoAssignSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        scheduler = AutoScheduler(
+            query['team'],
+            schedule.start_date,
+            schedule.end_date,
+            shift_types=query.get('shift_types'),
+            schedule=schedule,
+        )
+        result = scheduler.run(dry_run=query['dry_run'])
+        result['dry_run'] = query['dry_run']
+        return Response(result)
+    
+    @action(detail=True, methods=['post'])
+    def rotation(self, request, pk=None):
+        """
+        Generate shifts from a weekly ShiftType pattern and attach them here.
+        
+        Body: team (id), pattern ({"mon": ["1", "2"], ..., or "daily": [...]}),
+        optional start_date/end_date (default: the schedule's range) and
+        telescope (id).
+        """
+        schedule = self.get_object()
+        data = {'start_date': schedule.start_date, 'end_date': schedule.end_date, **request.data}
+        params = RotationSerializer(data=data)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        created = materialise_rotation(
+            query['start_date'],
+            query['end_date'],
+            query['weekly'],
+            schedule=schedule,
+            telescope=query.get('telescope'),
+            created_by=request.user if request.user.is_authenticated else None,
+        )
+        return Response({'created': created, 'schedule': schedule.id}, status=status.HTTP_201_CREATED)
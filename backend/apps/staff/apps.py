@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class StaffConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.staff"
+
+    def ready(self):
+        from .bitmap import register_bitmap_signals
+        from django.contrib.auth.models import User
+        from .caching import register_reference_models
+        from .conditional import register_etag_models
+        from .events import register_event_signals, availability_event
+        from .models import Team, ShiftType, StaffMember, DailyAvailability
+        from .sync import register_tombstone_signals
+        register_reference_models(Team, ShiftType)
+        register_etag_models(User, Team, ShiftType, StaffMember)
+        register_bitmap_signals()
+        register_tombstone_signals(DailyAvailability)
+        register_event_signals(DailyAvailability, availability_event)
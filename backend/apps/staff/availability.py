@@ -0,0 +1,92 @@
+"""
+Effective availability: DailyAvailability codes with StaffAvailability
+windows applied on top.
+
+Windows are resolved as ranges, never expanded into daily rows. For each
+staff member the windows overlapping the requested range are loaded once,
+ordered by start date (served by the (staff_member, start_date, end_date)
+index), and each one overwrites a slice of that member's code row, so the
+work is O(days + windows) per staff member.
+
+Precedence on any given day:
+- an 'unavailable' window makes the day 'X', whatever the daily code says
+- an 'available' or 'preferred' window makes the day 'A', except that it
+  never hides an explicit 'X' or '?' entered for that day
+- otherwise the DailyAvailability code applies, '-' when there is none
+"""
+from .models import DailyAvailability, StaffAvailability
+
+
+# Availability code used for days without a DailyAvailability row
+DEFAULT_AVAILABILITY_CODE = '-'
+
+WINDOW_CODES = {
+    'unavailable': 'X',
+    'available': 'A',
+    'preferred': 'A',
+}
+
+# Explicit daily codes that available/preferred windows leave alone
+PROTECTED_CODES = {'X', '?'}
+
+
+def resolve_availability(staff_ids, start_date, end_date):
+    """
+    Return {staff_id: {'availability': str, 'notes': {iso_date: note},
+    'windows': [...]}} for the inclusive range, one code character per
+    day, using two queries.
+    """
+    days = (end_date - start_date).days + 1
+    codes = {staff_id: [DEFAULT_AVAILABILITY_CODE] * days for staff_id in staff_ids}
+    notes = {staff_id: {} for staff_id in staff_ids}
+    windows = {staff_id: [] for staff_id in staff_ids}
+
+    daily = DailyAvailability.objects.filter(
+        staff_member_id__in=staff_ids,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).values_list('staff_member_id', 'date', 'availability_code', 'notes')
+    for staff_id, day, code, note in daily:
+        codes[staff_id][(day - start_date).days] = code
+        if note:
+            notes[staff_id][day.isoformat()] = note
+
+    overlapping = StaffAvailability.objects.filter(
+        staff_member_id__in=staff_ids,
+        start_date__lte=end_date,
+        end_date__gte=start_date,
+    ).order_by('staff_member_id', 'start_date', 'id').values(
+        'id', 'staff_member_id', 'start_date', 'end_date', 'availability_type', 'reason'
+    )
+    for window in overlapping:
+        windows[window['staff_member_id']].append({
+            'id': window['id'],
+            'availability_type': window['availability_type'],
+            'start_date': window['start_date'],
+            'end_date': window['end_date'],
+            'reason': window['reason'],
+        })
+
+    for staff_id, member_windows in windows.items():
+        row = codes[staff_id]
+        # Unavailable windows go last so they win over available ones
+        for window in sorted(member_windows, key=lambda w: w['availability_type'] == 'unavailable'):
+            code = WINDOW_CODES.get(window['availability_type'])
+            if code is None:
+                continue
+            lo = max(0, (window['start_date'] - start_date).days)
+            hi = min(days, (window['end_date'] - start_date).days + 1)
+            if code == 'X':
+                row[lo:hi] = ['X'] * (hi - lo)
+            else:
+                row[lo:hi] = [c if c in PROTECTED_CODES else code for c in row[lo:hi]]
+
+    return {
+        staff_id: {
+            'availability': ''.join(codes[staff_id]),
+            'notes': notes[staff_id],
+            'windows': windows[staff_id],
+        }
+        for staff_id in staff_ids
+    }
+
@@ -0,0 +1,199 @@
+"""
+Monthly availability bitmaps.
+
+DailyAvailability keeps one row per staff member per day. AvailabilityBitmap
+packs a month of effective availability (daily codes with StaffAvailability
+windows applied, see apps.staff.availability) into three integer masks
+(X, ? and A; bit 0 is the 1st), so "who is free between these dates" reads
+one small row per staff member per month and is answered with bitwise ANDs
+in the database.
+
+Bitmaps are refreshed on every DailyAvailability and StaffAvailability
+save/delete and by the bulk availability endpoint. Bulk writes
+(``queryset.update``, ``queryset.delete``, raw ``bulk_create``) must call
+``refresh_bitmaps`` or ``rebuild_bitmaps`` afterwards.
+"""
+import calendar
+from datetime import timedelta
+
+from django.db.models import F, Q, QuerySet
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .availability import resolve_availability
+from .models import StaffMember, DailyAvailability, StaffAvailability, AvailabilityBitmap
+
+
+CODE_FIELDS = {'X': 'unavailable', '?': 'maybe', 'A': 'available'}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def month_end(day):
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+def months_between(start_date, end_date):
+    month = month_start(start_date)
+    while month <= end_date:
+        yield month
+        month = month_end(month) + timedelta(days=1)
+
+
+def day_mask(month, start_date, end_date):
+    """Mask of the days of ``month`` that fall inside [start_date, end_date]"""
+    first = max(start_date, month)
+    last = min(end_date, month_end(month))
+    if first > last:
+        return 0
+    return ((1 << (last.day - first.day + 1)) - 1) << (first.day - 1)
+
+
+def refresh_bitmaps(keys):
+    """
+    Rebuild AvailabilityBitmap rows for the given (staff_member_id, month)
+    pairs from resolved availability (two reads) and one upsert.
+    """
+    keys = {(staff_id, month_start(month)) for staff_id, month in keys}
+    if not keys:
+        return
+    first = min(month for _, month in keys)
+    last = month_end(max(month for _, month in keys))
+
+    staff_ids = {staff_id for staff_id, _ in keys}
+    resolved = resolve_availability(staff_ids, first, last)
+
+    masks = {}
+    for staff_id, month in keys:
+        codes = resolved[staff_id]['availability'][(month - first).days:(month_end(month) - first).days + 1]
+        fields = dict.fromkeys(CODE_FIELDS.values(), 0)
+        for i, code in enumerate(codes):
+            if code in CODE_FIELDS:
+                fields[CODE_FIELDS[code]] |= 1 << i
+        masks[staff_id, month] = fields
+
+    AvailabilityBitmap.objects.bulk_create(
+        [
+            AvailabilityBitmap(staff_member_id=staff_id, month=month, **fields)
+            for (staff_id, month), fields in masks.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['staff_member', 'month'],
+        update_fields=list(CODE_FIELDS.values()),
+    )
+
+
+def rebuild_bitmaps(start_date, end_date, staff_queryset=None):
+    """Recompute every bitmap month touching [start_date, end_date]; returns the row count"""
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    staff_ids = list(staff_queryset.values_list('id', flat=True))
+    months = list(months_between(start_date, end_date))
+    refresh_bitmaps((staff_id, month) for staff_id in staff_ids for month in months)
+    return len(staff_ids) * len(months)
+
+
+def blocked_staff_ids(start_date, end_date, fields=('unavailable',)):
+    """
+    Subquery of staff ids with a bit set in any of ``fields`` between
+    start_date and end_date. Whole months in the middle only need a
+    non-zero mask; the partial months at either end are ANDed with a
+    day mask in the database.
+    """
+    first = month_start(start_date)
+    last = month_start(end_date)
+    first_mask = day_mask(first, start_date, end_date)
+    last_mask = day_mask(last, start_date, end_date)
+
+    bitmaps = AvailabilityBitmap.objects.filter(month__gte=first, month__lte=last)
+    condition = Q()
+    for field in fields:
+        bitmaps = bitmaps.annotate(**{
+            f'{field}_first': F(field).bitand(first_mask),
+            f'{field}_last': F(field).bitand(last_mask),
+        })
+        condition |= (
+            Q(month__gt=first, month__lt=last, **{f'{field}__gt': 0})
+            | Q(month=first, **{f'{field}_first__gt': 0})
+            | Q(month=last, **{f'{field}_last__gt': 0})
+        )
+    return bitmaps.filter(condition).values('staff_member_id')
+
+
+def available_staff(start_date, end_date, staff_queryset=None, include_maybe=True):
+    """
+    Staff with no 'X' day (and, unless include_maybe, no '?' day) in the
+    inclusive range. Days left unset count as available.
+    """
+    if staff_queryset is None:
+        staff_queryset = StaffMember.objects.all()
+    fields = ('unavailable',) if include_maybe else ('unavailable', 'maybe')
+    return staff_queryset.exclude(id__in=blocked_staff_ids(start_date, end_date, fields))
+
+
+def availability_bits(staff_ids, start_date, end_date):
+    """
+    Return {staff_id: {'unavailable': bits, 'maybe': bits, 'available': bits}}
+    where bit i is start_date + i days, read from one bitmap row per month.
+    """
+    result = {staff_id: dict.fromkeys(CODE_FIELDS.values(), 0) for staff_id in staff_ids}
+    rows = AvailabilityBitmap.objects.filter(
+        staff_member_id__in=staff_ids,
+        month__gte=month_start(start_date),
+        month__lte=end_date,
+    ).values_list('staff_member_id', 'month', *CODE_FIELDS.values())
+    for staff_id, month, *masks in rows:
+        window = day_mask(month, start_date, end_date)
+        # Shift the month's bits so that start_date lands on bit 0
+        offset = (month - start_date).days
+        for field, mask in zip(CODE_FIELDS.values(), masks):
+            mask &= window
+            result[staff_id][field] |= mask << offset if offset >= 0 else mask >> -offset
+    return result
+
+
+def _refresh_for_row(sender, instance, **kwargs):
+    # Deleting a staff member cascades to their bitmaps as well, and bulk
+    # queryset deletes rebuild afterwards rather than once per row
+    origin = kwargs.get('origin')
+    if origin is not None and (isinstance(origin, QuerySet) or type(origin) is not sender):
+        return
+    previous = getattr(instance, '_bitmap_previous', None)
+    if sender is DailyAvailability:
+        keys = {(instance.staff_member_id, instance.date)}
+        if previous is not None:
+            keys.add(previous)
+        refresh_bitmaps(keys)
+        return
+    keys = {(instance.staff_member_id, month) for month in months_between(instance.start_date, instance.end_date)}
+    if previous is not None:
+        keys |= {(previous[0], month) for month in months_between(previous[1], previous[2])}
+    refresh_bitmaps(keys)
+
+
+def _remember_window(sender, instance, **kwargs):
+    instance._bitmap_previous = None
+    if instance.pk:
+        instance._bitmap_previous = StaffAvailability.objects.filter(pk=instance.pk).values_list(
+            'staff_member_id', 'start_date', 'end_date'
+        ).first()
+
+
+def _remember_day(sender, instance, **kwargs):
+    # A row moved to another staff member or month leaves its old bit behind
+    instance._bitmap_previous = None
+    if instance.pk:
+        instance._bitmap_previous = DailyAvailability.objects.filter(pk=instance.pk).values_list(
+            'staff_member_id', 'date'
+        ).first()
+
+
+def register_bitmap_signals():
+    for model in (DailyAvailability, StaffAvailability):
+        uid = f'availability-bitmap-{model._meta.model_name}'
+        post_save.connect(_refresh_for_row, sender=model, dispatch_uid=f'{uid}-save')
+        post_delete.connect(_refresh_for_row, sender=model, dispatch_uid=f'{uid}-delete')
+    pre_save.connect(_remember_window, sender=StaffAvailability, dispatch_uid='availability-bitmap-window-pre-save')
+    pre_save.connect(_remember_day, sender=DailyAvailability, dispatch_uid='availability-bitmap-day-pre-save')
@@ -0,0 +1,113 @@
+"""
+Response caching for near-static reference data (teams, shift types,
+telescopes, instruments).
+
+List and retrieve responses are stored in the cache named by
+``REFERENCE_CACHE_ALIAS`` (local memory by default, Redis when
+``REDIS_URL`` is set), keyed on the viewset, action, object id and query
+string. Every key also embeds a version stamp that is replaced whenever one
+of the registered models is saved or deleted, so a write invalidates all
+reference entries at once without scanning keys.
+
+Each entry carries an ETag built from the newest ``updated_at`` and the row
+count of the underlying queryset, so clients can revalidate with
+If-None-Match and get a 304 straight from the cache.
+
+Local memory is per process: with several workers, point ``REDIS_URL`` at a
+shared server or other workers serve stale data until
+``REFERENCE_CACHE_TIMEOUT`` expires. ``queryset.update()`` and
+``bulk_create`` do not send signals; call ``invalidate_reference_cache``
+after using them on these models.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'reference:version'
+
+
+def get_reference_cache():
+    return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+
+def reference_version():
+    cache = get_reference_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # A fresh stamp (rather than restarting at 1) keeps entries written
+        # under an evicted version from ever being served again
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate_reference_cache(**kwargs):
+    """Signal receiver: orphan every cached reference response"""
+    get_reference_cache().set(VERSION_KEY, time.time_ns(), None)
+
+
+def register_reference_models(*models):
+    """Invalidate the reference cache whenever one of these models changes"""
+    for model in models:
+        uid = f'reference-cache-{model._meta.label_lower}'
+        post_save.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'{uid}-save')
+        post_delete.connect(invalidate_reference_cache, sender=model, dispatch_uid=f'{uid}-delete')
+
+
+class CachedReferenceMixin:
+    """
+    Serve list and retrieve from the reference cache with ETag support.
+    Set ``REFERENCE_CACHE_TIMEOUT = 0`` to turn caching off.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        digest = hashlib.md5(query.encode(), usedforsecurity=False).hexdigest()
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        return f'reference:{reference_version()}:{self.basename}:{self.action}:{lookup}:{digest}'
+
+    def get_etag(self, key):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            queryset = queryset.filter(pk=self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        summary = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        stamp = summary['last_modified'].isoformat() if summary['last_modified'] else ''
+        digest = hashlib.md5(f"{key}:{summary['count']}:{stamp}".encode(), usedforsecurity=False).hexdigest()
+        return f'"{digest}"'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        timeout = settings.REFERENCE_CACHE_TIMEOUT
+        if not timeout:
+            return handler(request, *args, **kwargs)
+
+        cache = get_reference_cache()
+        key = self.get_cache_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = {'data': response.data, 'etag': self.get_etag(key)}
+            cache.set(key, entry, timeout)
+
+        not_modified = get_conditional_response(request, etag=entry['etag'])
+        if not_modified is not None:
+            return not_modified
+        response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,132 @@
+"""
+Conditional GETs (ETag / If-None-Match) for list and retrieve.
+
+``ConditionalGetMixin`` gives list and retrieve responses a strong ETag
+computed without rendering anything: one aggregate query for the newest
+``updated_at`` and the row count of the filtered queryset (for retrieve,
+of the requested row), hashed with the query string, the negotiated
+format and a version stamp for each model in ``etag_dependencies``. When
+the request's If-None-Match matches, the answer is a 304 before any row
+is fetched or serialized, so reloading an unchanged calendar costs that
+single query.
+
+``updated_at`` and the count only see the viewset's own rows. Data the
+response shows from other models (a staff member's name on a shift, a
+schedule's shifts) is covered by ``etag_dependencies``: each listed model
+has a stamp in the reference cache that is replaced after every commit
+saving or deleting one of its rows (or changing a many-to-many through
+table). Models are registered with ``register_etag_models`` in their
+app's ``ready()``. Like the reference cache, the stamps are per process
+unless ``REDIS_URL`` points at a shared cache.
+
+Keyset-paginated lists (``?pagination=cursor``) get no ETag: the
+aggregate would bring back the COUNT that keyset pagination avoids.
+
+Bulk writes on a viewset's own model are seen through ``updated_at``;
+``queryset.update()`` must set it. Writes that skip signals on a
+dependency call ``bump_etag_versions`` themselves.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .caching import get_reference_cache
+
+
+def version_key(model):
+    return f'etag-version:{model._meta.label_lower}'
+
+
+def bump_etag_versions(*models):
+    """Replace the stamps of ``models``, changing every ETag that depends on them"""
+    stamp = time.time_ns()
+    get_reference_cache().set_many({version_key(model): stamp for model in models}, None)
+
+
+def etag_versions(models):
+    """Current stamps of ``models`` (one cache round trip)"""
+    cache = get_reference_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # A fresh stamp keeps ETags issued under an evicted one from matching
+        stamp = time.time_ns()
+        for key in missing:
+            cache.add(key, stamp, None)
+        versions = cache.get_many(keys)
+    return [versions.get(key) for key in keys]
+
+
+def _bump_after_commit(sender, **kwargs):
+    # After the commit, so a stamp is never paired with uncommitted rows
+    transaction.on_commit(partial(bump_etag_versions, sender), robust=True)
+
+
+def register_etag_models(*models):
+    """Change the ETags depending on these models whenever one of their rows changes"""
+    for model in models:
+        uid = f'etag-version-{model._meta.label_lower}'
+        if model._meta.auto_created:
+            # Many-to-many through tables only send m2m_changed
+            m2m_changed.connect(_bump_after_commit, sender=model, dispatch_uid=f'{uid}-m2m')
+            continue
+        post_save.connect(_bump_after_commit, sender=model, dispatch_uid=f'{uid}-save')
+        post_delete.connect(_bump_after_commit, sender=model, dispatch_uid=f'{uid}-delete')
+
+
+class ConditionalGetMixin:
+    """ETag / If-None-Match on list and retrieve (see module docstring)"""
+    etag_dependencies = ()
+
+    def list(self, request, *args, **kwargs):
+        wants_keyset = getattr(self.paginator, 'wants_keyset', None)
+        if wants_keyset is not None and wants_keyset(request):
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request):
+        """Strong ETag of this list or retrieve response, or None if it cannot be worked out"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup = ''
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            lookup = self.kwargs[lookup_url_kwarg]
+            try:
+                queryset = queryset.filter(**{self.lookup_field: lookup})
+            except (TypeError, ValueError, ValidationError):
+                return None
+        summary = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        stamp = summary['last_modified'].isoformat() if summary['last_modified'] else ''
+        parts = [
+            self.basename, self.action, str(lookup), request.META.get('QUERY_STRING', ''),
+            request.accepted_media_type, str(summary['count']), stamp,
+            *map(str, etag_versions(self.etag_dependencies)),
+        ]
+        digest = hashlib.md5(':'.join(parts).encode(), usedforsecurity=False).hexdigest()
+        return f'"{digest}"'
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            # Leave responses that set their own validator (snapshots) alone
+            if response.status_code != 200 or response.has_header('ETag'):
+                return response
+        response['ETag'] = etag
+        # Clients may keep the response but must revalidate before using it
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ('Accept',))
+        return response
@@ -0,0 +1,269 @@
+"""
+Live push of Shift and DailyAvailability changes over server-sent events.
+
+``GET /api/events/?team=&start_date=&end_date=&types=`` keeps the
+connection open and sends one SSE message per committed change that
+matches the filters, e.g.::
+
+    event: shift
+    data: {"type": "shift", "action": "saved", "id": 12, "staff_member": 3,
+           "shift_type": 2, "start": "2025-01-06", "end": "2025-01-07"}
+
+Messages only say what changed and where; the calendar refetches that row
+or pulls the change feed (apps.staff.sync) with its stored cursor, which
+also covers anything missed while reconnecting. ``team`` matches the
+team's staff members and shift types as of when the stream opened.
+
+Events are published once the writing transaction commits: by post_save /
+post_delete signals for single rows, and by the bulk paths (availability
+bulk upsert, scheduler apply, rotation) which call ``publish`` themselves.
+Raw SQL writes (seed commands) publish nothing.
+
+EVENTS_BROKER selects the fan-out. InProcessBroker reaches the streams of
+the current process only, which is enough for a single ASGI worker;
+RedisBroker goes through Redis pub/sub so every worker sees every event.
+Streams need an ASGI server (``uvicorn config.asgi:application``): under
+WSGI each open stream would hold a worker thread, so the view answers 501.
+"""
+import asyncio
+import json
+import threading
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import StaffMember, ShiftType
+
+
+# Batches buffered per stream before it is told to resync instead
+MAX_PENDING = 1000
+
+# Reconnect delay suggested to EventSource clients
+RECONNECT_MS = 3000
+
+
+def shift_event(shift, action='saved'):
+    return {
+        'type': 'shift',
+        'action': action,
+        'id': shift.pk,
+        'staff_member': shift.assigned_staff_id,
+        'shift_type': shift.shift_type_id,
+        'start': timezone.localdate(shift.start_time).isoformat(),
+        'end': timezone.localdate(shift.end_time).isoformat(),
+    }
+
+
+def availability_event(row, action='saved'):
+    day = row.date.isoformat()
+    return {
+        'type': 'daily_availability',
+        'action': action,
+        'id': row.pk,
+        'staff_member': row.staff_member_id,
+        'start': day,
+        'end': day,
+        'availability_code': row.availability_code,
+    }
+
+
+class Subscription:
+    """One open stream's queue of event batches, owned by its event loop"""
+
+    def __init__(self, broker, max_pending=MAX_PENDING):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    async def __aenter__(self):
+        self.broker.add(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.broker.remove(self)
+
+    def deliver(self, events):
+        # Called from whichever thread committed the change
+        self.loop.call_soon_threadsafe(self._put, events)
+
+    def _put(self, events):
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def get(self, timeout):
+        """The next batch of events, or None after ``timeout`` seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessBroker:
+    """Fans events out to the streams served by this process"""
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.lock = threading.Lock()
+
+    def add(self, subscription):
+        with self.lock:
+            self.subscriptions.add(subscription)
+
+    def remove(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            try:
+                subscription.deliver(events)
+            except RuntimeError:
+                # Its event loop is gone
+                self.remove(subscription)
+
+    def subscribe(self):
+        return Subscription(self)
+
+
+class RedisSubscription:
+    """Reads event batches from the broker's Redis channel"""
+    overflowed = False
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self.client = redis.asyncio.Redis.from_url(settings.REDIS_URL)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.channel)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.pubsub.unsubscribe(self.channel)
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        return None if message is None else json.loads(message['data'])
+
+
+class RedisBroker:
+    """Fans events out to every process through Redis pub/sub on REDIS_URL; needs the redis package"""
+    channel = 'shift-scheduler:events'
+
+    def __init__(self):
+        import redis
+
+        self.client = redis.Redis.from_url(settings.REDIS_URL)
+
+    def publish(self, events):
+        self.client.publish(self.channel, json.dumps(events))
+
+    def subscribe(self):
+        return RedisSubscription(self.channel)
+
+
+@lru_cache(maxsize=None)
+def _load_broker(path):
+    return import_string(path)()
+
+
+def get_broker():
+    return _load_broker(settings.EVENTS_BROKER)
+
+
+def publish(events):
+    """Send ``events`` to subscribers once the current transaction commits"""
+    if events:
+        transaction.on_commit(partial(_send, list(events)), robust=True)
+
+
+def _send(events):
+    get_broker().publish(events)
+
+
+class EventFilter:
+    """Which events a stream wants, from EventStreamQuerySerializer data"""
+
+    def __init__(self, types=None, start_date=None, end_date=None, staff_ids=None, shift_type_ids=None):
+        self.types = set(types) if types else None
+        self.start = start_date.isoformat() if start_date else None
+        self.end = end_date.isoformat() if end_date else None
+        self.staff_ids = staff_ids
+        self.shift_type_ids = shift_type_ids or set()
+
+    @classmethod
+    def from_query(cls, query):
+        staff_ids = shift_type_ids = None
+        if 'team' in query:
+            staff_ids = set(StaffMember.objects.filter(team_id=query['team']).values_list('id', flat=True))
+            shift_type_ids = set(ShiftType.objects.filter(team_id=query['team']).values_list('id', flat=True))
+        return cls(query.get('types'), query.get('start_date'), query.get('end_date'), staff_ids, shift_type_ids)
+
+    def matches(self, event):
+        if self.types is not None and event['type'] not in self.types:
+            return False
+        # ISO dates compare correctly as strings
+        if self.start is not None and event['end'] < self.start:
+            return False
+        if self.end is not None and event['start'] > self.end:
+            return False
+        if self.staff_ids is not None:
+            return event['staff_member'] in self.staff_ids or event.get('shift_type') in self.shift_type_ids
+        return True
+
+
+def format_event(event):
+    return f'event: {event["type"]}\ndata: {json.dumps(event)}\n\n'
+
+
+async def stream_events(event_filter, heartbeat=None):
+    """SSE body: matching events as they arrive, with a comment line every ``heartbeat`` seconds"""
+    heartbeat = heartbeat or settings.EVENTS_HEARTBEAT_SECONDS
+    async with get_broker().subscribe() as subscription:
+        yield f'retry: {RECONNECT_MS}\n\n'.encode()
+        while True:
+            events = await subscription.get(heartbeat)
+            chunk = ''
+            if subscription.overflowed:
+                # Too far behind to catch up from the queue; refetch instead
+                subscription.overflowed = False
+                chunk += 'event: resync\ndata: {}\n\n'
+            if events is None:
+                chunk += ': keepalive\n\n'
+            else:
+                chunk += ''.join(format_event(event) for event in events if event_filter.matches(event))
+            if chunk:
+                yield chunk.encode()
+
+
+# Model -> event builder, filled by register_event_signals
+_EVENT_BUILDERS = {}
+
+
+def _publish_saved(sender, instance, **kwargs):
+    publish([_EVENT_BUILDERS[sender](instance)])
+
+
+def _publish_deleted(sender, instance, **kwargs):
+    publish([_EVENT_BUILDERS[sender](instance, 'deleted')])
+
+
+def register_event_signals(model, build):
+    """Publish ``build(instance, action)`` whenever a ``model`` row is saved or deleted"""
+    _EVENT_BUILDERS[model] = build
+    label = model._meta.label_lower
+    post_save.connect(_publish_saved, sender=model, dispatch_uid=f'events-{label}-save')
+    post_delete.connect(_publish_deleted, sender=model, dispatch_uid=f'events-{label}-delete')
@@ -0,0 +1,168 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` on read endpoints.
+
+``GET /api/shifts/?fields=id,start_time,end_time,assigned_staff`` returns
+only those keys, and ``?omit=telescope_details,notes`` everything but
+those. Both take comma-separated top-level field names; unknown names
+answer 400.
+
+The serializer is trimmed before any row is read, so dropped fields cost
+nothing per row, and on list and retrieve the query is narrowed to match:
+``.only()`` loads just the columns the remaining fields read, joins and
+prefetches serving only dropped fields are removed. Columns are worked
+out from each field's ``source``; fields backed by a model property or
+method list the columns they read in their serializer's ``field_sources``.
+When a kept field's columns cannot be worked out the query is left as it
+is, so a missing declaration costs speed, never correctness.
+
+Only safe methods are trimmed: writes validate and answer with the full
+serializer.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import ForeignObjectRel
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_fieldset(query_params):
+    """(fields or None, omit) from the query string, or None if neither is given"""
+    fields = query_params.get(FIELDS_PARAM)
+    omit = query_params.get(OMIT_PARAM)
+    if fields is None and omit is None:
+        return None
+    split = lambda value: {name.strip() for name in value.split(',') if name.strip()}
+    return (split(fields) if fields is not None else None), split(omit or '')
+
+
+def trim_fields(serializer, fieldset):
+    """Drop the fields ``fieldset`` excludes from ``serializer`` (or its child)"""
+    if isinstance(serializer, ListSerializer):
+        serializer = serializer.child
+    fields, omit = fieldset
+    known = set(serializer.fields)
+    unknown = ((fields or set()) | omit) - known
+    if unknown:
+        raise ValidationError({'fields': f'Unknown fields: {", ".join(sorted(unknown))}'})
+    for name in known:
+        if (fields is not None and name not in fields) or name in omit:
+            serializer.fields.pop(name)
+    return serializer
+
+
+class Requirements:
+    """Columns (for only), forward joins (select_related) and prefetches a serializer reads"""
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = set()
+        self.joins = set()
+        self.prefetches = set()
+
+    def add(self, path):
+        """
+        Record what reading the ORM lookup ``path`` needs. Returns 'column',
+        'join' or 'prefetch' for what the path ends on, or None when it is
+        not a model path.
+        """
+        model = self.model
+        names = path.split('__')
+        for i, name in enumerate(names):
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                return None
+            prefix = '__'.join(names[:i + 1])
+            if field.many_to_many or isinstance(field, ForeignObjectRel):
+                # Rows from a prefetch are loaded by its own queryset
+                self.prefetches.add(prefix)
+                return 'prefetch'
+            if not field.is_relation:
+                self.columns.add(prefix)
+                return 'column'
+            if i == len(names) - 1:
+                self.columns.add(prefix)
+                return 'join'
+            self.joins.add(prefix)
+            model = field.related_model
+        return None
+
+    def add_serializer(self, serializer, prefix=''):
+        """Record what every field of ``serializer`` reads; False if a field's needs are unknown"""
+        if isinstance(serializer, ListSerializer):
+            serializer = serializer.child
+        sources = getattr(serializer, 'field_sources', {})
+        for name, field in serializer.fields.items():
+            if field.source == '*':
+                return False
+            path = prefix + '__'.join(field.source_attrs)
+            if isinstance(field, BaseSerializer):
+                kind = self.add(path)
+                if kind is None:
+                    return False
+                if kind == 'join':
+                    self.joins.add(path)
+                    if not self.add_serializer(field, path + '__'):
+                        return False
+                continue
+            paths = [prefix + source for source in sources[name]] if name in sources else [path]
+            for path in paths:
+                kind = self.add(path)
+                if kind is None:
+                    return False
+                # Related fields other than primary keys read the related row
+                if kind == 'join' and not isinstance(field, (PrimaryKeyRelatedField, ManyRelatedField)):
+                    self.joins.add(path)
+        return True
+
+    def narrow(self, queryset):
+        """``queryset`` loading only the recorded columns, joins and prefetches"""
+        prefetches = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_to', lookup).split('__')[0] in self.prefetches
+        ]
+        queryset = queryset.select_related(None).prefetch_related(None).prefetch_related(*prefetches)
+        # select_related() without arguments would follow every relation
+        if self.joins:
+            queryset = queryset.select_related(*self.joins)
+        return queryset.only(*self.columns)
+
+
+class SparseFieldsetMixin:
+    """
+    ``?fields=`` / ``?omit=`` support for a GenericAPIView (see module
+    docstring). List and retrieve also narrow the query.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        return parse_fieldset(self.request.query_params)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            trim_fields(serializer, fieldset)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_fieldset()
+        if fieldset is None or self.action not in self.sparse_actions:
+            return queryset
+        serializer = trim_fields(self.get_serializer_class()(context=self.get_serializer_context()), fieldset)
+        requirements = Requirements(queryset.model)
+        if not requirements.add_serializer(serializer):
+            return queryset
+        # Keyset pagination reads its ordering columns from the rows
+        keyset = getattr(getattr(self, 'paginator', None), 'keyset_class', None)
+        for name in getattr(keyset, 'ordering', ()):
+            requirements.add(name)
+        return requirements.narrow(queryset)
@@ -0,0 +1,13 @@
+import django_filters
+from .models import DailyAvailability
+
+
+class DailyAvailabilityFilter(django_filters.FilterSet):
+    """Filters for DailyAvailability lists, including date-range lookups"""
+    date__gte = django_filters.DateFilter(field_name='date', lookup_expr='gte')
+    date__lte = django_filters.DateFilter(field_name='date', lookup_expr='lte')
+    team = django_filters.NumberFilter(field_name='staff_member__team')
+    
+    class Meta:
+        model = DailyAvailability
+        fields = ['staff_member', 'date', 'availability_code']
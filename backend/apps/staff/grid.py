@@ -0,0 +1,91 @@
+"""
+Columnar availability grid: a compact representation of a daily
+availability range.
+
+``GET /api/staff/daily-availability/?format=grid&date__gte=..&date__lte=..``
+(or ``Accept: application/vnd.availability-grid+json``) answers with the
+list's filtered rows packed as::
+
+    {
+      "start_date": "2025-03-01", "end_date": "2025-03-03",
+      "dates": ["2025-03-01", "2025-03-02", "2025-03-03"],
+      "staff": [{"id": 3, "name": "Ana Díaz", "team": 1}, ...],
+      "codes": ["AX-", ...],
+      "notes": [[0, 1, "Conference"]],
+      "legend": {"-": "Not Set", "X": "Unavailable", ...}
+    }
+
+``codes[i][j]`` is staff ``i``'s code on ``dates[j]``, '-' where no row
+exists. ``notes`` lists [staff index, date index, text] for the few cells
+with notes. Staff appear when they have at least one row in the range.
+Unlike the list this is never paginated, so the range is required and
+capped at MAX_GRID_DAYS.
+"""
+from datetime import timedelta
+
+from rest_framework import serializers
+
+from config.renderers import ORJSONRenderer
+from .models import StaffMember, DailyAvailability
+from .values import full_name
+
+
+MAX_GRID_DAYS = 366
+
+# Code used for days without a DailyAvailability row
+NOT_SET = '-'
+
+
+class AvailabilityGridRenderer(ORJSONRenderer):
+    media_type = 'application/vnd.availability-grid+json'
+    format = 'grid'
+
+
+class AvailabilityGridQuerySerializer(serializers.Serializer):
+    """Validates the date range of an availability grid request"""
+    date__gte = serializers.DateField()
+    date__lte = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['date__lte'] < attrs['date__gte']:
+            raise serializers.ValidationError('date__lte must be on or after date__gte')
+        if (attrs['date__lte'] - attrs['date__gte']).days >= MAX_GRID_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {MAX_GRID_DAYS} days')
+        return attrs
+
+
+def availability_grid(queryset, start_date, end_date):
+    """Pack the DailyAvailability rows of ``queryset`` within [start_date, end_date] (two queries)"""
+    days = (end_date - start_date).days + 1
+    rows = queryset.filter(date__gte=start_date, date__lte=end_date).order_by().values_list(
+        'staff_member_id', 'date', 'availability_code', 'notes'
+    )
+
+    codes = {}
+    notes = []
+    for staff_id, day, code, note in rows:
+        if staff_id not in codes:
+            codes[staff_id] = bytearray(NOT_SET.encode() * days)
+        offset = (day - start_date).days
+        codes[staff_id][offset] = ord(code)
+        if note:
+            notes.append((staff_id, offset, note))
+
+    staff = list(
+        StaffMember.objects.filter(id__in=codes)
+        .order_by('user__last_name', 'user__first_name', 'id')
+        .values_list('id', 'user__first_name', 'user__last_name', 'team_id')
+    )
+    index = {staff_id: i for i, (staff_id, *_) in enumerate(staff)}
+    return {
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'dates': [(start_date + timedelta(days=offset)).isoformat() for offset in range(days)],
+        'staff': [
+            {'id': staff_id, 'name': full_name(first, last), 'team': team_id}
+            for staff_id, first, last, team_id in staff
+        ],
+        'codes': [codes[staff_id].decode() for staff_id, *_ in staff],
+        'notes': sorted([index[staff_id], offset, note] for staff_id, offset, note in notes),
+        'legend': dict(DailyAvailability.AVAILABILITY_CODE_CHOICES),
+    }
@@ -0,0 +1,75 @@
+"""
+Fast insert helpers shared by the seed commands.
+
+bulk_create prepares every value of every row through the field (timezone
+conversion, adaptation, expression checks) and compiles a fresh INSERT per
+batch, which dominates once a seed reaches hundreds of thousands of rows.
+Seed data has few distinct values per column (a few thousand dates and
+times, a few hundred staff ids), so ``insert_rows`` adapts each distinct
+value once and sends plain tuples through ``cursor.executemany``.
+
+Like bulk_create these bypass save() and signals; callers rebuild any
+derived tables (bitmaps, rollups) themselves.
+"""
+from django.db import connections, router
+
+
+BATCH_SIZE = 5000
+
+
+def insert_rows(model, field_names, rows, batch_size=BATCH_SIZE):
+    """
+    Insert ``rows`` (tuples ordered like ``field_names``) into ``model``'s
+    table; returns the count. Every other column gets the value save()
+    would give a new instance (field defaults, auto_now timestamps).
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = [model._meta.get_field(name) for name in field_names]
+    template = model()
+    extra = [
+        field for field in model._meta.concrete_fields
+        if field not in fields and not field.primary_key
+    ]
+    extra_values = [field.pre_save(template, add=True) for field in extra]
+    fields += extra
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    caches = [{} for _ in fields]
+
+    def prepare(row):
+        values = []
+        for field, cache, value in zip(fields, caches, (*row, *extra_values)):
+            try:
+                values.append(cache[value])
+            except KeyError:
+                cache[value] = prepared = field.get_db_prep_save(value, connection)
+                values.append(prepared)
+        return values
+
+    count = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(prepare(row))
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            count += len(batch)
+    return count
+
+
+def clear_table(model):
+    """
+    DELETE every row of ``model`` without loading them first. Only for
+    tables that nothing else references; signals are not sent.
+    """
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {}'.format(connection.ops.quote_name(model._meta.db_table)))
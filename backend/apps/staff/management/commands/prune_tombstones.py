@@ -0,0 +1,20 @@
+"""
+Management command to delete change-feed tombstones past their retention.
+
+Run daily (e.g. from cron). Clients whose last sync is older than the
+retention period get 410 from the changes endpoints and refetch.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.staff.models import Tombstone
+from apps.staff.sync import retention_horizon
+
+
+class Command(BaseCommand):
+    help = 'Deletes tombstones older than TOMBSTONE_RETENTION_DAYS'
+
+    def handle(self, *args, **options):
+        if settings.TOMBSTONE_RETENTION_DAYS < 1:
+            raise CommandError('TOMBSTONE_RETENTION_DAYS must be at least 1')
+        count, _ = Tombstone.objects.filter(deleted_at__lt=retention_horizon()).delete()
+        self.stdout.write(self.style.SUCCESS(f'✓ Deleted {count} tombstones'))
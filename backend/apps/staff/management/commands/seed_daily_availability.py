@@ -1,10 +1,22 @@
 """
 Management command to seed daily availability data for existing staff members.
+
+Rows are generated lazily and written with batched executemany inserts
+(see _bulk), so a multi-year horizon for hundreds of staff takes seconds. Pass --seed for a
+reproducible dataset.
 """
-from django.core.management.base import BaseCommand
-from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from datetime import date, datetime, timedelta
 import random
+from apps.staff.bitmap import rebuild_bitmaps
 from apps.staff.models import StaffMember, DailyAvailability
+from ._bulk import clear_table, insert_rows
+
+
+UNAVAILABLE_NOTES = ['Personal appointment', 'Vacation', 'Medical', 'Family obligation']
+MAYBE_NOTES = ['Prefer not to work', 'Family event possible', 'Other commitment']
 
 
 class Command(BaseCommand):
@@ -17,69 +29,90 @@ class Command(BaseCommand):
             default=14,
             help='Number of days to generate availability for (default: 14)'
         )
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for a reproducible dataset'
+        )
 
     def handle(self, *args, **options):
         days = options['days']
-        
-        # Clear existing daily availability
-        DailyAvailability.objects.all().delete()
-        self.stdout.write('Cleared existing daily availability data')
-        
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        rng = random.Random(options['seed'])
+        start_date = options['start'] or datetime.now().date()
+        end_date = start_date + timedelta(days=days - 1)
+
         # Get all active staff members
-        staff_members = StaffMember.objects.filter(status='active')
-        
-        if not staff_members.exists():
+        staff_ids = list(StaffMember.objects.filter(status='active').order_by('id').values_list('id', flat=True))
+
+        if not staff_ids:
             self.stdout.write(self.style.ERROR('No active staff members found. Run seed_rubin_data first.'))
             return
-        
-        # Generate availability for the next X days starting from today
-        start_date = datetime.now().date()
-        
-        created_count = 0
-        
-        for staff in staff_members:
+
+        with transaction.atomic():
+            # Clear existing daily availability, remembering its span so the
+            # bitmaps for those months are rebuilt too
+            previous = DailyAvailability.objects.aggregate(first=Min('date'), last=Max('date'))
+            clear_table(DailyAvailability)
+            self.stdout.write('Cleared existing daily availability data')
+
+            dates = [start_date + timedelta(days=offset) for offset in range(days)]
+            created_count = insert_rows(
+                DailyAvailability,
+                ['staff_member', 'date', 'availability_code', 'notes'],
+                self.generate_rows(rng, staff_ids, dates),
+            )
+
+            # Raw inserts skip the signals that keep bitmaps current
+            rebuild_bitmaps(
+                min(filter(None, [previous['first'], start_date])),
+                max(filter(None, [previous['last'], end_date])),
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully created {created_count} daily availability records for '
+                f'{len(staff_ids)} staff members over {days} days'
+            )
+        )
+
+        # Show summary
+        counts = dict(
+            DailyAvailability.objects.order_by().values_list('availability_code').annotate(count=Count('id'))
+        )
+        self.stdout.write('\nAvailability Code Distribution:')
+        for code, label in DailyAvailability.AVAILABILITY_CODE_CHOICES:
+            count = counts.get(code, 0)
+            percentage = (count / created_count * 100) if created_count > 0 else 0
+            self.stdout.write(f'  {code} ({label}): {count} ({percentage:.1f}%)')
+
+    def generate_rows(self, rng, staff_ids, dates):
+        for staff_id in staff_ids:
             # Generate a pattern for each staff member
             # 70% fully available, 20% some unavailable days, 10% some maybe days
-            pattern_type = random.choices(['available', 'some_unavailable', 'some_maybe'], weights=[70, 20, 10])[0]
-            
-            for day_offset in range(days):
-                current_date = start_date + timedelta(days=day_offset)
-                
+            pattern_type = rng.choices(['available', 'some_unavailable', 'some_maybe'], weights=[70, 20, 10])[0]
+
+            for day in dates:
                 if pattern_type == 'available':
-                    # Fully available
                     code = 'A'
                 elif pattern_type == 'some_unavailable':
                     # Random unavailable days (about 20% of days)
-                    code = random.choices(['A', 'X'], weights=[80, 20])[0]
+                    code = 'X' if rng.random() < 0.2 else 'A'
                 else:  # some_maybe
                     # Mix of available and maybe available (about 30% maybe)
-                    code = random.choices(['A', '?'], weights=[70, 30])[0]
-                
+                    code = '?' if rng.random() < 0.3 else 'A'
+
                 # Add notes for non-available days
                 notes = ''
                 if code == 'X':
-                    notes = random.choice(['Personal appointment', 'Vacation', 'Medical', 'Family obligation'])
+                    notes = rng.choice(UNAVAILABLE_NOTES)
                 elif code == '?':
-                    notes = random.choice(['Prefer not to work', 'Family event possible', 'Other commitment'])
-                
-                DailyAvailability.objects.create(
-                    staff_member=staff,
-                    date=current_date,
-                    availability_code=code,
-                    notes=notes
-                )
-                created_count += 1
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Successfully created {created_count} daily availability records for '
-                f'{staff_members.count()} staff members over {days} days'
-            )
-        )
-        
-        # Show summary
-        self.stdout.write('\nAvailability Code Distribution:')
-        for code, label in DailyAvailability.AVAILABILITY_CODE_CHOICES:
-            count = DailyAvailability.objects.filter(availability_code=code).count()
-            percentage = (count / created_count * 100) if created_count > 0 else 0
-            self.stdout.write(f'  {code} ({label}): {count} ({percentage:.1f}%)')
+                    notes = rng.choice(MAYBE_NOTES)
+
+                yield staff_id, day, code, notes
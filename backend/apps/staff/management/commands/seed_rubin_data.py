@@ -1,91 +1,126 @@
 """
 Seed data for Vera Rubin Observatory - Creates realistic staff and shifts
+
+By default creates the named Rubin roster and 14 days of shifts. With
+--staff N it instead generates N synthetic staff split across both teams,
+and --days D sets the shift horizon, so load-test observatories with
+hundreds of staff and multi-year schedules can be built in seconds. Staff
+are written with bulk_create and shifts with batched executemany inserts
+(see _bulk); pass --seed for a reproducible dataset.
 """
-from django.core.management.base import BaseCommand
+import random
+from datetime import date, datetime, timedelta, time
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 from apps.staff.models import Team, ShiftType, StaffMember
 from apps.shifts.models import Shift
 from apps.observatory.models import Telescope
-from datetime import datetime, timedelta, time
-from django.utils import timezone
+from ._bulk import insert_rows
+
+
+BATCH_SIZE = 2000
+
+OBS_SPECIALISTS = [
+    {'first': 'Sarah', 'last': 'Johnson', 'email': 'sarah.johnson@lsst.org', 'emp_id': 'OBS001'},
+    {'first': 'Michael', 'last': 'Chen', 'email': 'michael.chen@lsst.org', 'emp_id': 'OBS002'},
+    {'first': 'Emily', 'last': 'Rodriguez', 'email': 'emily.rodriguez@lsst.org', 'emp_id': 'OBS003'},
+    {'first': 'David', 'last': 'Kim', 'email': 'david.kim@lsst.org', 'emp_id': 'OBS004'},
+    {'first': 'Jessica', 'last': 'Williams', 'email': 'jessica.williams@lsst.org', 'emp_id': 'OBS005'},
+    {'first': 'Robert', 'last': 'Martinez', 'email': 'robert.martinez@lsst.org', 'emp_id': 'OBS006'},
+]
+
+SUPPORT_SCIENTISTS = [
+    {'first': 'Dr. James', 'last': 'Anderson', 'email': 'james.anderson@lsst.org', 'emp_id': 'SCI001'},
+    {'first': 'Dr. Lisa', 'last': 'Thompson', 'email': 'lisa.thompson@lsst.org', 'emp_id': 'SCI002'},
+    {'first': 'Dr. Daniel', 'last': 'Garcia', 'email': 'daniel.garcia@lsst.org', 'emp_id': 'SCI003'},
+    {'first': 'Dr. Maria', 'last': 'Lopez', 'email': 'maria.lopez@lsst.org', 'emp_id': 'SCI004'},
+]
+
+FIRST_NAMES = [
+    'Ana', 'Ben', 'Carla', 'Diego', 'Elena', 'Felipe', 'Grace', 'Hugo', 'Isabel', 'Javier',
+    'Karen', 'Luis', 'Marta', 'Nicolas', 'Olivia', 'Pablo', 'Quinn', 'Rosa', 'Samuel', 'Tamara',
+]
+LAST_NAMES = [
+    'Alvarez', 'Brown', 'Castro', 'Diaz', 'Evans', 'Fuentes', 'Gomez', 'Hughes', 'Ibarra', 'Jones',
+    'Kumar', 'Lee', 'Morales', 'Nunez', 'Ortiz', 'Perez', 'Rivera', 'Silva', 'Torres', 'Vargas',
+]
+
+# (start time, hours) per shift type code
+SHIFT_TIMES = {
+    '1': (time(8, 0), 8),
+    '2': (time(8, 0), 8),
+    '3': (time(16, 0), 7 + 59 / 60),
+    '4': (time(16, 0), 7 + 59 / 60),
+    'D': (time(9, 0), 8),
+    'L': (time(17, 0), 8),
+}
+
+SHIFT_FIELDS = ['shift_type', 'assigned_staff', 'telescope', 'start_time', 'end_time', 'status']
+
+# Synthetic staff work blocks of WORK_DAYS followed by REST_DAYS off
+WORK_DAYS = 4
+REST_DAYS = 3
 
 
 class Command(BaseCommand):
     help = 'Seed database with Vera Rubin Observatory data'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--staff',
+            type=int,
+            help='Generate this many synthetic staff instead of the named roster'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=14,
+            help='Number of days of shifts to create (default: 14)'
+        )
+        parser.add_argument(
+            '--start',
+            type=date.fromisoformat,
+            help='First day of shifts (YYYY-MM-DD, default: today)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            help='Random seed for a reproducible dataset'
+        )
+
     @transaction.atomic
     def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        if options['staff'] is not None and options['staff'] < 2:
+            raise CommandError('--staff must be at least 2')
+        self.rng = random.Random(options['seed'])
+        start_date = options['start'] or datetime.now().date()
+
         self.stdout.write('Seeding Vera Rubin Observatory data...\n')
-        
+
         # Get teams
-        obs_team = Team.objects.get(code='OBS')
-        sci_team = Team.objects.get(code='SCI')
-        
-        # Create Observing Specialists
-        obs_specialists_data = [
-            {'first': 'Sarah', 'last': 'Johnson', 'email': 'sarah.johnson@lsst.org', 'emp_id': 'OBS001'},
-            {'first': 'Michael', 'last': 'Chen', 'email': 'michael.chen@lsst.org', 'emp_id': 'OBS002'},
-            {'first': 'Emily', 'last': 'Rodriguez', 'email': 'emily.rodriguez@lsst.org', 'emp_id': 'OBS003'},
-            {'first': 'David', 'last': 'Kim', 'email': 'david.kim@lsst.org', 'emp_id': 'OBS004'},
-            {'first': 'Jessica', 'last': 'Williams', 'email': 'jessica.williams@lsst.org', 'emp_id': 'OBS005'},
-            {'first': 'Robert', 'last': 'Martinez', 'email': 'robert.martinez@lsst.org', 'emp_id': 'OBS006'},
-        ]
-        
-        for staff_data in obs_specialists_data:
-            user, created = User.objects.get_or_create(
-                username=staff_data['email'].split('@')[0],
-                defaults={
-                    'first_name': staff_data['first'],
-                    'last_name': staff_data['last'],
-                    'email': staff_data['email']
-                }
-            )
-            if created:
-                staff, _ = StaffMember.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'team': obs_team,
-                        'employee_id': staff_data['emp_id'],
-                        'role': 'telescope_operator',
-                        'status': 'active',
-                        'hire_date': datetime.now().date() - timedelta(days=365),
-                        'phone': f'+1-520-555-{staff_data["emp_id"][-4:]}'
-                    }
-                )
-                self.stdout.write(self.style.SUCCESS(f'  ✓ Created Observing Specialist: {staff.full_name}'))
-        
-        # Create Support Scientists
-        scientists_data = [
-            {'first': 'Dr. James', 'last': 'Anderson', 'email': 'james.anderson@lsst.org', 'emp_id': 'SCI001'},
-            {'first': 'Dr. Lisa', 'last': 'Thompson', 'email': 'lisa.thompson@lsst.org', 'emp_id': 'SCI002'},
-            {'first': 'Dr. Daniel', 'last': 'Garcia', 'email': 'daniel.garcia@lsst.org', 'emp_id': 'SCI003'},
-            {'first': 'Dr. Maria', 'last': 'Lopez', 'email': 'maria.lopez@lsst.org', 'emp_id': 'SCI004'},
-        ]
-        
-        for staff_data in scientists_data:
-            user, created = User.objects.get_or_create(
-                username=staff_data['email'].split('@')[0],
-                defaults={
-                    'first_name': staff_data['first'],
-                    'last_name': staff_data['last'],
-                    'email': staff_data['email']
-                }
-            )
-            if created:
-                staff, _ = StaffMember.objects.get_or_create(
-                    user=user,
-                    defaults={
-                        'team': sci_team,
-                        'employee_id': staff_data['emp_id'],
-                        'role': 'support_scientist',
-                        'status': 'active',
-                        'hire_date': datetime.now().date() - timedelta(days=730),
-                        'phone': f'+1-520-555-{staff_data["emp_id"][-4:]}'
-                    }
-                )
-                self.stdout.write(self.style.SUCCESS(f'  ✓ Created Support Scientist: {staff.full_name}'))
-        
+        try:
+            obs_team = Team.objects.get(code='OBS')
+            sci_team = Team.objects.get(code='SCI')
+        except Team.DoesNotExist:
+            raise CommandError('Teams OBS and SCI are missing. Run setup_teams first.')
+
+        if options['staff']:
+            obs_count = max(1, round(options['staff'] * 0.6))
+            obs_data = self.synthetic_staff('OBS', obs_count)
+            sci_data = self.synthetic_staff('SCI', options['staff'] - obs_count)
+        else:
+            obs_data, sci_data = OBS_SPECIALISTS, SUPPORT_SCIENTISTS
+
+        created = self.create_staff(obs_data, obs_team, 'telescope_operator', 365)
+        created += self.create_staff(sci_data, sci_team, 'support_scientist', 730)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Created {created} staff members'))
+
         # Create telescope
         telescope, created = Telescope.objects.get_or_create(
             code='LSST',
@@ -97,93 +132,124 @@ class Command(BaseCommand):
         )
         if created:
             self.stdout.write(self.style.SUCCESS(f'  ✓ Created telescope: {telescope.name}'))
-        
-        # Create shifts for next 14 days
-        start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        obs_staff = list(StaffMember.objects.filter(team=obs_team))
-        sci_staff = list(StaffMember.objects.filter(team=sci_team))
-        
+
+        obs_staff = list(StaffMember.objects.filter(
+            team=obs_team, employee_id__in=[row['emp_id'] for row in obs_data]
+        ).order_by('employee_id'))
+        sci_staff = list(StaffMember.objects.filter(
+            team=sci_team, employee_id__in=[row['emp_id'] for row in sci_data]
+        ).order_by('employee_id'))
+
         # Get shift types
-        day_lead = ShiftType.objects.get(team=obs_team, code='1')
-        day_shift = ShiftType.objects.get(team=obs_team, code='2')
-        late_lead = ShiftType.objects.get(team=obs_team, code='3')
-        late_shift = ShiftType.objects.get(team=obs_team, code='4')
-        sci_day = ShiftType.objects.get(team=sci_team, code='D')
-        sci_late = ShiftType.objects.get(team=sci_team, code='L')
-        
-        shifts_created = 0
-        for day in range(14):
+        obs_types = [ShiftType.objects.get(team=obs_team, code=code) for code in ['1', '2', '3', '4']]
+        sci_types = [ShiftType.objects.get(team=sci_team, code=code) for code in ['D', 'L']]
+
+        if options['staff']:
+            shifts = self.rotating_shifts(obs_staff, obs_types, telescope, start_date, options['days'])
+            shifts += self.rotating_shifts(sci_staff, sci_types, telescope, start_date, options['days'])
+        else:
+            shifts = self.roster_shifts(obs_staff, sci_staff, obs_types, sci_types, telescope, start_date, options['days'])
+        shift_count = insert_rows(Shift, SHIFT_FIELDS, shifts)
+
+        # Raw inserts skip the signals that keep rollups current
+        if settings.WORKLOAD_ROLLUPS:
+            from apps.shifts.analytics import rebuild_rollups
+            rebuild_rollups(start_date, start_date + timedelta(days=options['days'] - 1))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✓ Created {shift_count} shifts for the next {options["days"]} days'))
+        self.stdout.write(self.style.SUCCESS('✓ Successfully seeded Vera Rubin Observatory data!'))
+
+    def synthetic_staff(self, prefix, count):
+        """Generated rows in the same shape as the named roster"""
+        rows = []
+        for i in range(1, count + 1):
+            # Usernames and ids depend only on the index so reruns reuse them
+            rows.append({
+                'first': self.rng.choice(FIRST_NAMES),
+                'last': self.rng.choice(LAST_NAMES),
+                'email': f'{prefix.lower()}.synthetic{i:05d}@example.org',
+                'emp_id': f'{prefix}-S{i:05d}',
+            })
+        return rows
+
+    def create_staff(self, rows, team, role, tenure_days):
+        """Create missing users and staff members with two bulk inserts; returns the count"""
+        usernames = [row['email'].split('@')[0] for row in rows]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        new_rows = [row for row, username in zip(rows, usernames) if username not in existing]
+        if not new_rows:
+            return 0
+
+        users = User.objects.bulk_create([
+            User(
+                username=row['email'].split('@')[0],
+                first_name=row['first'],
+                last_name=row['last'],
+                email=row['email'],
+            )
+            for row in new_rows
+        ], batch_size=BATCH_SIZE)
+        if users[0].pk is None:
+            # Backends that cannot return ids from bulk inserts
+            by_username = User.objects.in_bulk([user.username for user in users], field_name='username')
+            users = [by_username[user.username] for user in users]
+
+        hire_date = datetime.now().date() - timedelta(days=tenure_days)
+        StaffMember.objects.bulk_create([
+            StaffMember(
+                user=user,
+                team=team,
+                employee_id=row['emp_id'],
+                role=role,
+                status='active',
+                hire_date=hire_date,
+                phone=f'+1-520-555-{row["emp_id"][-4:]}',
+                prefers_night_shifts=self.rng.random() < 0.3,
+            )
+            for user, row in zip(users, new_rows)
+        ], batch_size=BATCH_SIZE)
+        return len(new_rows)
+
+    def make_shift(self, shift_type, staff, telescope, day):
+        """One row ordered like SHIFT_FIELDS"""
+        start, hours = SHIFT_TIMES[shift_type.code]
+        start_time = timezone.make_aware(datetime.combine(day, start))
+        return (shift_type.pk, staff.pk, telescope.pk, start_time, start_time + timedelta(hours=hours), 'scheduled')
+
+    def roster_shifts(self, obs_staff, sci_staff, obs_types, sci_types, telescope, start_date, days):
+        """Six shifts a day rotating through the named roster"""
+        day_lead, day_shift, late_lead, late_shift = obs_types
+        sci_day, sci_late = sci_types
+        shifts = []
+        for day in range(days):
             current_date = start_date + timedelta(days=day)
-            
+
             # Observing Specialists shifts (rotate through staff)
             obs_day_idx = (day * 2) % len(obs_staff)
             obs_late_idx = (day * 2 + 1) % len(obs_staff)
-            
-            # Day Shift Lead (8am-4pm)
-            Shift.objects.create(
-                shift_type=day_lead,
-                assigned_staff=obs_staff[obs_day_idx],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(8, 0))),
-                end_time=timezone.make_aware(datetime.combine(current_date, time(16, 0))),
-                status='scheduled'
-            )
-            
-            # Day Shift (8am-4pm)
-            Shift.objects.create(
-                shift_type=day_shift,
-                assigned_staff=obs_staff[(obs_day_idx + 1) % len(obs_staff)],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(8, 0))),
-                end_time=timezone.make_aware(datetime.combine(current_date, time(16, 0))),
-                status='scheduled'
-            )
-            
-            # Late Shift Lead (4pm-midnight)
-            Shift.objects.create(
-                shift_type=late_lead,
-                assigned_staff=obs_staff[obs_late_idx],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(16, 0))),
-                end_time=timezone.make_aware(datetime.combine(current_date, time(23, 59))),
-                status='scheduled'
-            )
-            
-            # Late Shift (4pm-midnight)
-            Shift.objects.create(
-                shift_type=late_shift,
-                assigned_staff=obs_staff[(obs_late_idx + 1) % len(obs_staff)],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(16, 0))),
-                end_time=timezone.make_aware(datetime.combine(current_date, time(23, 59))),
-                status='scheduled'
-            )
-            
+            shifts.append(self.make_shift(day_lead, obs_staff[obs_day_idx], telescope, current_date))
+            shifts.append(self.make_shift(day_shift, obs_staff[(obs_day_idx + 1) % len(obs_staff)], telescope, current_date))
+            shifts.append(self.make_shift(late_lead, obs_staff[obs_late_idx], telescope, current_date))
+            shifts.append(self.make_shift(late_shift, obs_staff[(obs_late_idx + 1) % len(obs_staff)], telescope, current_date))
+
             # Support Scientists shifts (rotate through scientists)
             sci_idx = day % len(sci_staff)
-            
-            # Support Scientist Day Shift (9am-5pm)
-            Shift.objects.create(
-                shift_type=sci_day,
-                assigned_staff=sci_staff[sci_idx],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(9, 0))),
-                end_time=timezone.make_aware(datetime.combine(current_date, time(17, 0))),
-                status='scheduled'
-            )
-            
-            # Support Scientist Late Night Shift (5pm-1am next day)
-            next_day = current_date + timedelta(days=1)
-            Shift.objects.create(
-                shift_type=sci_late,
-                assigned_staff=sci_staff[(sci_idx + 1) % len(sci_staff)],
-                telescope=telescope,
-                start_time=timezone.make_aware(datetime.combine(current_date, time(17, 0))),
-                end_time=timezone.make_aware(datetime.combine(next_day, time(1, 0))),
-                status='scheduled'
-            )
-            
-            shifts_created += 6
-        
-        self.stdout.write(self.style.SUCCESS(f'\n✓ Created {shifts_created} shifts for the next 14 days'))
-        self.stdout.write(self.style.SUCCESS('✓ Successfully seeded Vera Rubin Observatory data!'))
+            shifts.append(self.make_shift(sci_day, sci_staff[sci_idx], telescope, current_date))
+            shifts.append(self.make_shift(sci_late, sci_staff[(sci_idx + 1) % len(sci_staff)], telescope, current_date))
+        return shifts
+
+    def rotating_shifts(self, staff, shift_types, telescope, start_date, days):
+        """
+        Each staff member works blocks of WORK_DAYS days on one shift type and
+        then rests REST_DAYS, with start offsets staggered so every day is
+        covered. This keeps rest and consecutive-night rules intact.
+        """
+        cycle = WORK_DAYS + REST_DAYS
+        shifts = []
+        for i, member in enumerate(staff):
+            offset = self.rng.randrange(cycle)
+            shift_type = shift_types[i % len(shift_types)]
+            for day in range(days):
+                if (day + offset) % cycle < WORK_DAYS:
+                    shifts.append(self.make_shift(shift_type, member, telescope, start_date + timedelta(days=day)))
+        return shifts
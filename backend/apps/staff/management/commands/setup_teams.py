@@ -4,6 +4,7 @@ and migrate existing shift data.
 """
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from datetime import time
 from apps.staff.models import Team, ShiftType, StaffMember
 from apps.shifts.models import Shift
 
@@ -38,10 +39,10 @@ class Command(BaseCommand):
         
         # Create Shift Types for Observing Specialists
         obs_shift_types = [
-            {'name': 'Day Shift Lead', 'code': '1', 'color': '#f59e0b', 'sort_order': 1},
-            {'name': 'Day Shift', 'code': '2', 'color': '#fbbf24', 'sort_order': 2},
-            {'name': 'Late Shift Lead', 'code': '3', 'color': '#4338ca', 'sort_order': 3},
-            {'name': 'Late Shift', 'code': '4', 'color': '#6366f1', 'sort_order': 4},
+            {'name': 'Day Shift Lead', 'code': '1', 'color': '#f59e0b', 'sort_order': 1, 'start': time(8, 0), 'end': time(16, 0)},
+            {'name': 'Day Shift', 'code': '2', 'color': '#fbbf24', 'sort_order': 2, 'start': time(8, 0), 'end': time(16, 0)},
+            {'name': 'Late Shift Lead', 'code': '3', 'color': '#4338ca', 'sort_order': 3, 'start': time(16, 0), 'end': time(23, 59)},
+            {'name': 'Late Shift', 'code': '4', 'color': '#6366f1', 'sort_order': 4, 'start': time(16, 0), 'end': time(23, 59)},
             {'name': 'Training', 'code': 'T', 'color': '#8b5cf6', 'sort_order': 5},
             {'name': 'Backup', 'code': 'B', 'color': '#10b981', 'sort_order': 6},
         ]
@@ -53,7 +54,9 @@ class Command(BaseCommand):
                 defaults={
                     'name': shift_data['name'],
                     'color': shift_data['color'],
-                    'sort_order': shift_data['sort_order']
+                    'sort_order': shift_data['sort_order'],
+                    'default_start_time': shift_data.get('start'),
+                    'default_end_time': shift_data.get('end'),
                 }
             )
             if created:
@@ -61,8 +64,8 @@ class Command(BaseCommand):
         
         # Create Shift Types for Support Scientists
         sci_shift_types = [
-            {'name': 'Day Shift', 'code': 'D', 'color': '#f59e0b', 'sort_order': 1},
-            {'name': 'Late Night Shift', 'code': 'L', 'color': '#4338ca', 'sort_order': 2},
+            {'name': 'Day Shift', 'code': 'D', 'color': '#f59e0b', 'sort_order': 1, 'start': time(9, 0), 'end': time(17, 0)},
+            {'name': 'Late Night Shift', 'code': 'L', 'color': '#4338ca', 'sort_order': 2, 'start': time(17, 0), 'end': time(1, 0)},
         ]
         
         for shift_data in sci_shift_types:
@@ -72,7 +75,9 @@ class Command(BaseCommand):
                 defaults={
                     'name': shift_data['name'],
                     'color': shift_data['color'],
-                    'sort_order': shift_data['sort_order']
+                    'sort_order': shift_data['sort_order'],
+                    'default_start_time': shift_data.get('start'),
+                    'default_end_time': shift_data.get('end'),
                 }
             )
             if created:
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+CODE_FIELDS = {'X': 'unavailable', '?': 'maybe', 'A': 'available'}
+
+
+def build_bitmaps(apps, schema_editor):
+    DailyAvailability = apps.get_model('staff', 'DailyAvailability')
+    AvailabilityBitmap = apps.get_model('staff', 'AvailabilityBitmap')
+    masks = {}
+    rows = DailyAvailability.objects.filter(availability_code__in=CODE_FIELDS).values_list(
+        'staff_member_id', 'date', 'availability_code'
+    )
+    for staff_id, day, code in rows.iterator():
+        fields = masks.setdefault((staff_id, day.replace(day=1)), dict.fromkeys(CODE_FIELDS.values(), 0))
+        fields[CODE_FIELDS[code]] |= 1 << (day.day - 1)
+    AvailabilityBitmap.objects.bulk_create(
+        [
+            AvailabilityBitmap(staff_member_id=staff_id, month=month, **fields)
+            for (staff_id, month), fields in masks.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0004_add_not_set_availability_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('unavailable', models.PositiveIntegerField(default=0, help_text='Days marked X')),
+                ('maybe', models.PositiveIntegerField(default=0, help_text='Days marked ?')),
+                ('available', models.PositiveIntegerField(default=0, help_text='Days marked A')),
+                ('staff_member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_bitmaps', to='staff.staffmember')),
+            ],
+            options={
+                'ordering': ['month', 'staff_member'],
+                'indexes': [models.Index(fields=['month', 'staff_member'], name='staff_avail_month_c2d199_idx')],
+                'unique_together': {('staff_member', 'month')},
+            },
+        ),
+        migrations.RunPython(build_bitmaps, migrations.RunPython.noop),
+    ]
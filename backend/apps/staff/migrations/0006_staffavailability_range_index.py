@@ -0,0 +1,44 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:25
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def apply_windows(apps, schema_editor):
+    """Fold existing StaffAvailability windows into the availability bitmaps"""
+    StaffAvailability = apps.get_model('staff', 'StaffAvailability')
+    AvailabilityBitmap = apps.get_model('staff', 'AvailabilityBitmap')
+    for window in StaffAvailability.objects.iterator():
+        if window.availability_type not in ('unavailable', 'available', 'preferred'):
+            continue
+        month = window.start_date.replace(day=1)
+        while month <= window.end_date:
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            first = max(window.start_date, month)
+            last = min(window.end_date, next_month - timedelta(days=1))
+            mask = ((1 << (last.day - first.day + 1)) - 1) << (first.day - 1)
+            bitmap, _ = AvailabilityBitmap.objects.get_or_create(staff_member_id=window.staff_member_id, month=month)
+            if window.availability_type == 'unavailable':
+                bitmap.unavailable |= mask
+                bitmap.maybe &= ~mask
+                bitmap.available &= ~mask
+            else:
+                bitmap.available |= mask & ~(bitmap.unavailable | bitmap.maybe)
+            bitmap.save()
+            month = next_month
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0005_availabilitybitmap'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staffavailability',
+            index=models.Index(fields=['staff_member', 'start_date', 'end_date'], name='staff_staff_staff_m_554614_idx'),
+        ),
+        migrations.RunPython(apply_windows, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -160,9 +161,18 @@ class StaffAvailability(models.Model):
         ordering = ['start_date']
         verbose_name = 'Staff Availability'
         verbose_name_plural = 'Staff Availabilities'
+        indexes = [
+            models.Index(fields=['staff_member', 'start_date', 'end_date']),
+        ]
     
     def __str__(self):
         return f"{self.staff_member.full_name}: {self.availability_type} ({self.start_date} to {self.end_date})"
+    
+    def clean(self):
+        """Validate that end_date is not before start_date"""
+        from django.core.exceptions import ValidationError
+        if self.end_date < self.start_date:
+            raise ValidationError('End date cannot be before start date')
 
 
 class DailyAvailability(models.Model):
@@ -202,6 +212,8 @@ class DailyAvailability(models.Model):
         indexes = [
             models.Index(fields=['date']),
             models.Index(fields=['staff_member', 'date']),
+            # Change feed (apps.staff.sync) keyset order
+            models.Index(fields=['updated_at', 'id']),
         ]
     
     def __str__(self):
@@ -210,3 +222,51 @@ class DailyAvailability(models.Model):
     @property
     def availability_display(self):
         return self.get_availability_code_display()
+
+
+class AvailabilityBitmap(models.Model):
+    """
+    One month of a staff member's DailyAvailability packed into bitmasks,
+    bit 0 being the 1st of the month. Derived data kept in sync by
+    apps.staff.bitmap; days with no bit set in any mask are '-' (not set).
+    """
+    staff_member = models.ForeignKey(
+        StaffMember,
+        on_delete=models.CASCADE,
+        related_name='availability_bitmaps'
+    )
+    month = models.DateField(help_text="First day of the month")
+    
+    unavailable = models.PositiveIntegerField(default=0, help_text="Days marked X")
+    maybe = models.PositiveIntegerField(default=0, help_text="Days marked ?")
+    available = models.PositiveIntegerField(default=0, help_text="Days marked A")
+    
+    class Meta:
+        ordering = ['month', 'staff_member']
+        unique_together = [['staff_member', 'month']]
+        indexes = [
+            models.Index(fields=['month', 'staff_member']),
+        ]
+    
+    def __str__(self):
+        return f"{self.staff_member} {self.month:%Y-%m}"
+
+
+class Tombstone(models.Model):
+    """
+    Marker left behind when a synced row (Shift, DailyAvailability) is
+    deleted, so change feeds can tell clients to drop it. Pruned after
+    TOMBSTONE_RETENTION_DAYS by the prune_tombstones command.
+    """
+    model = models.CharField(max_length=100, help_text="app_label.model_name of the deleted row")
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -1,4 +1,23 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_after(ordering, position):
+    """Build (a, b, c) > (va, vb, vc) as an index-friendly Q object"""
+    condition = Q()
+    for i, name in enumerate(ordering):
+        term = Q(**{f'{name}__gt': position[i]})
+        for previous, value in zip(ordering[:i], position[:i]):
+            term &= Q(**{previous: value})
+        condition |= term
+    return Q(**{f'{ordering[0]}__gte': position[0]}) & condition
 
 
 class LargeResultsSetPagination(PageNumberPagination):
@@ -9,3 +28,137 @@ class LargeResultsSetPagination(PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'  # Allow client to override page size
     max_page_size = 10000  # Maximum allowed page size
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+    
+    The cursor encodes the ordering values of the last row on the page and
+    the next page is fetched with a WHERE on those values, so deep pages
+    cost the same as the first one and no COUNT(*) is issued. Subclasses
+    set ``ordering`` to field attnames ending in a unique column.
+    """
+    ordering = ('id',)
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 10000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    display_page_controls = False
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+        
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last_position = [self.position_value(rows[-1], name) for name in self.ordering] if rows else None
+        return rows
+    
+    @staticmethod
+    def position_value(row, name):
+        # Rows are model instances, or dicts from queryset.values()
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+    
+    def after(self, position):
+        return keyset_after(self.ordering, position)
+    
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                self.model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+    
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_position))
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SelectablePagination(BasePagination):
+    """
+    Page-number pagination by default; keyset pagination when the request
+    asks for it with ``?pagination=cursor`` or carries a ``cursor``.
+    """
+    page_number_class = PageNumberPagination
+    keyset_class = KeysetPagination
+    mode_query_param = 'pagination'
+    
+    def wants_keyset(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or self.keyset_class.cursor_query_param in params
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.wants_keyset(request):
+            self.delegate = self.keyset_class()
+        else:
+            self.delegate = self.page_number_class()
+        return self.delegate.paginate_queryset(queryset, request, view)
+    
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+    
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+    
+    def to_html(self):
+        return self.delegate.to_html()
+    
+    @property
+    def display_page_controls(self):
+        return getattr(self.delegate, 'display_page_controls', False)
+
+
+class DailyAvailabilityKeysetPagination(KeysetPagination):
+    ordering = ('date', 'staff_member_id', 'id')
+
+
+class DailyAvailabilityPagination(SelectablePagination):
+    """Large page sizes by default, keyset on (date, staff_member, id) on request"""
+    page_number_class = LargeResultsSetPagination
+    keyset_class = DailyAvailabilityKeysetPagination
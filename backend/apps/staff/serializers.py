@@ -1,6 +1,11 @@
+from datetime import timedelta
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import transaction
 from .models import Team, ShiftType, StaffMember, StaffAvailability, DailyAvailability
+from .bitmap import refresh_bitmaps
+from .values import ValuesSerializer, format_datetime, full_name
+from .events import publish, availability_event
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -40,6 +45,11 @@ class StaffMemberSerializer(serializers.ModelSerializer):
     team_code = serializers.CharField(source='team.code', read_only=True)
     full_name = serializers.ReadOnlyField()
     is_available = serializers.ReadOnlyField()
+    # Columns read by property-backed fields (see apps.staff.fieldsets)
+    field_sources = {
+        'full_name': ['user__first_name', 'user__last_name'],
+        'is_available': ['status'],
+    }
     
     class Meta:
         model = StaffMember
@@ -75,6 +85,9 @@ class StaffMemberCreateSerializer(serializers.ModelSerializer):
 class StaffAvailabilitySerializer(serializers.ModelSerializer):
     """Serializer for StaffAvailability model"""
     staff_member_name = serializers.CharField(source='staff_member.full_name', read_only=True)
+    field_sources = {
+        'staff_member_name': ['staff_member__user__first_name', 'staff_member__user__last_name'],
+    }
     
     class Meta:
         model = StaffAvailability
@@ -83,12 +96,23 @@ class StaffAvailabilitySerializer(serializers.ModelSerializer):
             'end_date', 'availability_type', 'reason', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start_date and end_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'End date cannot be before start date'})
+        return attrs
 
 
 class DailyAvailabilitySerializer(serializers.ModelSerializer):
     """Serializer for DailyAvailability model"""
     staff_member_name = serializers.CharField(source='staff_member.full_name', read_only=True)
     availability_display = serializers.ReadOnlyField()
+    field_sources = {
+        'staff_member_name': ['staff_member__user__first_name', 'staff_member__user__last_name'],
+        'availability_display': ['availability_code'],
+    }
     
     class Meta:
         model = DailyAvailability
@@ -98,3 +122,205 @@ class DailyAvailabilitySerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+
+
+class DailyAvailabilityValuesSerializer(ValuesSerializer):
+    """DailyAvailabilitySerializer output built from queryset.values() (see apps.staff.values)"""
+    columns = (
+        'id', 'staff_member_id', 'staff_member__user__first_name', 'staff_member__user__last_name',
+        'date', 'availability_code', 'notes', 'created_at', 'updated_at',
+    )
+    displays = dict(DailyAvailability.AVAILABILITY_CODE_CHOICES)
+    
+    def to_representation(self, row):
+        code = row['availability_code']
+        return {
+            'id': row['id'],
+            'staff_member': row['staff_member_id'],
+            'staff_member_name': full_name(row['staff_member__user__first_name'], row['staff_member__user__last_name']),
+            'date': row['date'].isoformat(),
+            'availability_code': code,
+            'availability_display': self.displays.get(code, code),
+            'notes': row['notes'],
+            'created_at': format_datetime(row['created_at'], self.tz),
+            'updated_at': format_datetime(row['updated_at'], self.tz),
+        }
+
+
+class AvailableStaffQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the available staff lookup"""
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    include_maybe = serializers.BooleanField(default=True)
+    
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        return attrs
+
+
+class ResolvedAvailabilityQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the resolved availability endpoint"""
+    MAX_DAYS = 366
+    
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    team = serializers.IntegerField(required=False)
+    staff_member = serializers.IntegerField(required=False)
+    
+    def validate(self, attrs):
+        if attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        if (attrs['end_date'] - attrs['start_date']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f'Date range cannot exceed {self.MAX_DAYS} days')
+        return attrs
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Validates query parameters for change feeds (see apps.staff.sync)"""
+    updated_since = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+    
+    def validate_cursor(self, value):
+        from .sync import decode_sync_cursor
+        try:
+            return decode_sync_cursor(value)
+        except ValueError:
+            raise serializers.ValidationError('Invalid cursor')
+    
+    def validate(self, attrs):
+        if ('updated_since' in attrs) == ('cursor' in attrs):
+            raise serializers.ValidationError('Pass exactly one of updated_since or cursor')
+        return attrs
+
+
+class EventStreamQuerySerializer(serializers.Serializer):
+    """Validates query parameters for the live event stream (see apps.staff.events)"""
+    TYPES = ['shift', 'daily_availability']
+    
+    team = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    types = serializers.ListField(
+        child=serializers.ChoiceField(choices=TYPES), required=False, allow_empty=False
+    )
+    
+    def validate(self, attrs):
+        if 'start_date' in attrs and 'end_date' in attrs and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError('end_date must be on or after start_date')
+        return attrs
+
+
+class DailyAvailabilityItemSerializer(serializers.Serializer):
+    """A single (staff_member, date, code, notes) entry for bulk upserts"""
+    staff_member = serializers.IntegerField()
+    date = serializers.DateField()
+    availability_code = serializers.ChoiceField(choices=DailyAvailability.AVAILABILITY_CODE_CHOICES)
+    notes = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+
+
+class DailyAvailabilityBulkSerializer(serializers.Serializer):
+    """
+    Bulk upsert of daily availability.
+    
+    Accepts either ``items`` (a list of entries) or a range: ``staff_member``,
+    ``start_date``, ``end_date`` and ``availability_code`` (plus optional
+    ``notes``) applied to every day in the inclusive range.
+    """
+    MAX_ITEMS = 10000
+    
+    items = DailyAvailabilityItemSerializer(many=True, required=False)
+    staff_member = serializers.IntegerField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    availability_code = serializers.ChoiceField(
+        choices=DailyAvailability.AVAILABILITY_CODE_CHOICES, required=False
+    )
+    notes = serializers.CharField(max_length=200, required=False, allow_blank=True, default='')
+    
+    def validate(self, attrs):
+        range_fields = ['staff_member', 'start_date', 'end_date', 'availability_code']
+        if 'items' in attrs:
+            if any(field in attrs for field in range_fields):
+                raise serializers.ValidationError('Provide either items or a date range, not both')
+            items = attrs['items']
+        else:
+            missing = [field for field in range_fields if field not in attrs]
+            if missing:
+                raise serializers.ValidationError(
+                    f'Provide items, or a range with: {", ".join(missing)}'
+                )
+            if attrs['end_date'] < attrs['start_date']:
+                raise serializers.ValidationError('end_date must be on or after start_date')
+            days = (attrs['end_date'] - attrs['start_date']).days + 1
+            items = [
+                {
+                    'staff_member': attrs['staff_member'],
+                    'date': attrs['start_date'] + timedelta(days=offset),
+                    'availability_code': attrs['availability_code'],
+                    'notes': attrs['notes'],
+                }
+                for offset in range(min(days, self.MAX_ITEMS + 1))
+            ]
+        
+        if len(items) > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'Cannot update more than {self.MAX_ITEMS} days at once')
+        
+        staff_ids = {item['staff_member'] for item in items}
+        known = set(StaffMember.objects.filter(id__in=staff_ids).values_list('id', flat=True))
+        if staff_ids - known:
+            raise serializers.ValidationError(
+                f'Unknown staff members: {", ".join(str(i) for i in sorted(staff_ids - known))}'
+            )
+        
+        # Later entries for the same (staff_member, date) win
+        return {'items': {(item['staff_member'], item['date']): item for item in items}}
+    
+    @transaction.atomic
+    def create(self, validated_data):
+        """Upsert changed rows in a single transaction and return them"""
+        items = validated_data['items']
+        if not items:
+            return []
+        staff_ids = {staff_id for staff_id, _ in items}
+        dates = [day for _, day in items]
+        existing = {
+            (staff_id, day): (code, notes)
+            for staff_id, day, code, notes in DailyAvailability.objects.filter(
+                staff_member_id__in=staff_ids, date__gte=min(dates), date__lte=max(dates)
+            ).values_list('staff_member_id', 'date', 'availability_code', 'notes')
+        }
+        changed = [
+            DailyAvailability(
+                staff_member_id=staff_id,
+                date=day,
+                availability_code=item['availability_code'],
+                notes=item['notes'],
+            )
+            for (staff_id, day), item in items.items()
+            if existing.get((staff_id, day)) != (item['availability_code'], item['notes'])
+        ]
+        if not changed:
+            return []
+        
+        DailyAvailability.objects.bulk_create(
+            changed,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['staff_member', 'date'],
+            update_fields=['availability_code', 'notes', 'updated_at'],
+        )
+        
+        keys = {(row.staff_member_id, row.date) for row in changed}
+        # bulk_create sends no signals, so refresh the monthly bitmaps and
+        # push live events here
+        refresh_bitmaps(keys)
+        rows = DailyAvailability.objects.filter(
+            staff_member_id__in={staff_id for staff_id, _ in keys},
+            date__gte=min(day for _, day in keys),
+            date__lte=max(day for _, day in keys),
+        ).select_related('staff_member__user')
+        rows = [row for row in rows if (row.staff_member_id, row.date) in keys]
+        publish([availability_event(row) for row in rows])
+        return rows
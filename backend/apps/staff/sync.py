@@ -0,0 +1,157 @@
+"""
+Delta sync: "what changed since T" for Shift and DailyAvailability.
+
+``GET <list url>/changes/?updated_since=<ISO datetime>`` returns the rows
+whose ``updated_at`` is at or after T plus the ids of rows deleted since
+then, taken from Tombstone. The list's usual filters split the changed
+rows: those still matching come back in full, the ids of the others under
+``removed`` so a filtered client drops a row edited out of its view (ids
+it never held can be ignored).
+Both streams are keyset-paged on (updated_at, id) and (deleted_at, id),
+served by their indexes, and the response carries an opaque ``cursor``
+holding both positions. Clients store it and poll with ``?cursor=`` to
+get only what happened after their last sync; ``has_more`` means another
+page is ready immediately.
+
+Tombstones are written by post_delete signals, so queryset and cascade
+deletes are covered; raw SQL deletes (seed commands) are not. They are
+kept for TOMBSTONE_RETENTION_DAYS; asking for deletions from before that
+horizon answers 410 and the client must refetch the full range.
+"""
+import base64
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import Tombstone
+from .pagination import keyset_after
+from .serializers import ChangesQuerySerializer
+
+
+CHANGE_ORDERING = ('updated_at', 'id')
+TOMBSTONE_ORDERING = ('deleted_at', 'id')
+
+# Once every tombstone has been read, the deletion position moves up to
+# this long ago so idle clients do not age past the retention horizon.
+# Deletions committed later than this after they were stamped are missed.
+SYNC_SETTLE = timedelta(minutes=5)
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Changes this old are no longer tracked; fetch the full range again.'
+    default_code = 'sync_expired'
+
+
+def encode_sync_cursor(changed, deleted):
+    values = [[moment.isoformat(), pk] for moment, pk in (changed, deleted)]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_sync_cursor(encoded):
+    """(changed, deleted) positions; raises ValueError when malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        positions = tuple((parse_datetime(moment), int(pk)) for moment, pk in values)
+    except (TypeError, ValueError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if len(positions) != 2 or any(moment is None for moment, _ in positions):
+        raise ValueError('Invalid cursor')
+    return positions
+
+
+def retention_horizon():
+    return timezone.now() - timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+
+
+def changes_since(queryset, changed, deleted, page_size):
+    """
+    One page of the change feed of ``queryset`` after the given positions.
+    Returns (rows, deleted_ids, changed, deleted, has_more) with the
+    positions advanced past what was returned.
+    """
+    rows = list(
+        queryset.filter(keyset_after(CHANGE_ORDERING, changed)).order_by(*CHANGE_ORDERING)[:page_size + 1]
+    )
+    tombstones = list(
+        Tombstone.objects.filter(model=queryset.model._meta.label_lower)
+        .filter(keyset_after(TOMBSTONE_ORDERING, deleted))
+        .order_by(*TOMBSTONE_ORDERING)
+        .values_list('deleted_at', 'id', 'object_id')[:page_size + 1]
+    )
+    has_more = len(rows) > page_size or len(tombstones) > page_size
+    rows = rows[:page_size]
+    if rows:
+        changed = (rows[-1].updated_at, rows[-1].id)
+    if len(tombstones) > page_size:
+        tombstones = tombstones[:page_size]
+        deleted = tombstones[-1][:2]
+    else:
+        if tombstones:
+            deleted = tombstones[-1][:2]
+        settled = timezone.now() - SYNC_SETTLE
+        if deleted[0] < settled:
+            deleted = (settled, 0)
+    return rows, [object_id for _, _, object_id in tombstones], changed, deleted, has_more
+
+
+class ChangeFeedMixin:
+    """Adds the ``changes`` list action to a ModelViewSet over a model with updated_at"""
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Rows changed and ids deleted since ``updated_since`` or ``cursor``.
+
+        Accepts the list filters; changed rows that do not match them are
+        listed by id under ``removed``. page_size caps the changed rows
+        (results plus removed) and deleted.
+        """
+        params = ChangesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+
+        if 'cursor' in query:
+            changed, deleted = query['cursor']
+        else:
+            changed = deleted = (query['updated_since'], 0)
+        if deleted[0] < retention_horizon():
+            raise SyncExpired()
+
+        # Walk every changed row, then sort them by the filters
+        rows, deleted_ids, changed, deleted, has_more = changes_since(
+            self.get_queryset(), changed, deleted, query['page_size']
+        )
+        matching = set()
+        if rows:
+            matching = set(
+                self.filter_queryset(self.get_queryset())
+                .filter(pk__in=[row.pk for row in rows])
+                .values_list('pk', flat=True)
+            )
+        return Response({
+            'results': self.get_serializer([row for row in rows if row.pk in matching], many=True).data,
+            'removed': [row.pk for row in rows if row.pk not in matching],
+            'deleted': deleted_ids,
+            'cursor': encode_sync_cursor(changed, deleted),
+            'has_more': has_more,
+        })
+
+
+def _record_deletion(sender, instance, **kwargs):
+    Tombstone.objects.create(model=sender._meta.label_lower, object_id=instance.pk)
+
+
+def register_tombstone_signals(*models):
+    for model in models:
+        post_delete.connect(
+            _record_deletion, sender=model, dispatch_uid=f'tombstone-{model._meta.label_lower}'
+        )
@@ -1,3 +1,811 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from config import compression
+
+from .bitmap import availability_bits
+from .events import get_broker, availability_event
+from .filters import DailyAvailabilityFilter
+from .serializers import DailyAvailabilitySerializer
+from .models import Team, ShiftType, StaffMember, StaffAvailability, DailyAvailability, AvailabilityBitmap, Tombstone
+
+
+def make_staff(team, index):
+    user = User.objects.create(
+        username=f'{team.code.lower()}{index}',
+        first_name=f'First{index}',
+        last_name=f'Last{index:03d}',
+    )
+    return StaffMember.objects.create(
+        user=user,
+        team=team,
+        employee_id=f'{team.code}{index:03d}',
+        role='telescope_operator',
+        hire_date=date(2024, 1, 1),
+    )
+
+
+class DailyAvailabilityRangeFilterTests(APITestCase):
+    url = '/api/staff/daily-availability/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = make_staff(self.team, 1)
+
+    def add_days(self, first_day, days, staff=None):
+        DailyAvailability.objects.bulk_create([
+            DailyAvailability(
+                staff_member=staff or self.staff,
+                date=first_day + timedelta(days=i),
+                availability_code='A',
+            )
+            for i in range(days)
+        ])
+
+    def test_date_range(self):
+        self.add_days(date(2025, 2, 25), 10)
+
+        response = self.client.get(self.url, {'date__gte': '2025-03-01', 'date__lte': '2025-03-03'})
+
+        self.assertEqual(
+            [row['date'] for row in response.data['results']],
+            ['2025-03-01', '2025-03-02', '2025-03-03']
+        )
+
+    def test_team_filter(self):
+        other = make_staff(Team.objects.create(code='SCI', name='Support Scientists'), 2)
+        self.add_days(date(2025, 3, 1), 1)
+        self.add_days(date(2025, 3, 1), 1, staff=other)
+
+        response = self.client.get(self.url, {'team': self.team.id})
+
+        self.assertEqual([row['staff_member'] for row in response.data['results']], [self.staff.id])
+
+    def test_range_query_count_stays_flat_with_history(self):
+        params = {'date__gte': '2025-03-01', 'date__lte': '2025-03-31', 'page_size': 1000}
+        self.add_days(date(2025, 3, 1), 31)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(self.url, params)
+
+        # Three more years of history outside the window
+        self.add_days(date(2022, 1, 1), 3 * 365)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.data['count'], 31)
+        self.assertEqual(len(large), len(small))
+
+    def test_range_queries_use_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+        self.add_days(date(2024, 1, 1), 365)
+        queryset = DailyAvailability.objects.all()
+
+        plan = DailyAvailabilityFilter({'date__gte': '2024-03-01', 'date__lte': '2024-03-31'}, queryset=queryset).qs.explain()
+        self.assertIn('USING INDEX', plan)
+
+        plan = DailyAvailabilityFilter(
+            {'staff_member': self.staff.id, 'date__gte': '2024-03-01', 'date__lte': '2024-03-31'},
+            queryset=queryset
+        ).qs.explain()
+        self.assertIn('USING INDEX', plan)
+
+    def test_keyset_pagination(self):
+        other = make_staff(self.team, 2)
+        self.add_days(date(2025, 3, 1), 3)
+        self.add_days(date(2025, 3, 1), 3, staff=other)
+
+        seen = []
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 4})
+        while True:
+            self.assertNotIn('count', response.data)
+            seen += [(row['date'], row['staff_member']) for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, [
+            (day, staff.id)
+            for day in ['2025-03-01', '2025-03-02', '2025-03-03']
+            for staff in sorted([self.staff, other], key=lambda s: s.id)
+        ])
+
+
+@override_settings(REFERENCE_CACHE_TIMEOUT=0)
+class QueryCountTests(APITestCase):
+    """List and retrieve must cost the same number of queries at any size"""
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+
+    def add_rows(self, count):
+        existing = StaffMember.objects.count()
+        for i in range(existing, existing + count):
+            team = Team.objects.create(code=f'T{i}', name=f'Team {i}')
+            ShiftType.objects.create(team=team, code='1', name='Day Shift')
+            staff = make_staff(team, i)
+            StaffAvailability.objects.create(
+                staff_member=staff, start_date=date(2025, 3, 1), end_date=date(2025, 3, 5),
+                availability_type='unavailable'
+            )
+            DailyAvailability.objects.create(staff_member=staff, date=date(2025, 3, 1), availability_code='X')
+
+    def assertConstantQueries(self, url, expected):
+        self.add_rows(1)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_rows(5)
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def assertRetrieveQueries(self, url_prefix, model, expected):
+        self.add_rows(1)
+        url = f'{url_prefix}{model.objects.first().pk}/'
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_team(self):
+        self.assertConstantQueries('/api/staff/teams/', 2)
+        self.assertRetrieveQueries('/api/staff/teams/', Team, 1)
+
+    def test_shift_type(self):
+        self.assertConstantQueries('/api/staff/shift-types/', 2)
+        self.assertRetrieveQueries('/api/staff/shift-types/', ShiftType, 1)
+
+    def test_staff_member(self):
+        self.assertConstantQueries('/api/staff/members/', 3)
+        self.assertRetrieveQueries('/api/staff/members/', StaffMember, 2)
+
+    def test_staff_availability(self):
+        self.assertConstantQueries('/api/staff/availability/', 3)
+        self.assertRetrieveQueries('/api/staff/availability/', StaffAvailability, 2)
+
+    def test_daily_availability(self):
+        self.assertConstantQueries('/api/staff/daily-availability/', 3)
+        self.assertRetrieveQueries('/api/staff/daily-availability/', DailyAvailability, 2)
+
+
+class ReferenceCacheTests(APITestCase):
+    url = '/api/staff/teams/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+
+    def test_second_request_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get(self.url)
+        self.team.name = 'Night Crew'
+        self.team.save()
+        names = {row['code']: row['name'] for row in self.client.get(self.url).data['results']}
+        self.assertEqual(names['OBS'], 'Night Crew')
+
+        self.team.delete()
+        codes = [row['code'] for row in self.client.get(self.url).data['results']]
+        self.assertNotIn('OBS', codes)
+
+    def test_query_params_are_part_of_key(self):
+        team = Team.objects.create(code='SCI', name='Support Scientists')
+        ShiftType.objects.create(team=self.team, code='1', name='Day Shift')
+        ShiftType.objects.create(team=team, code='D', name='Day')
+
+        response = self.client.get('/api/staff/shift-types/', {'team': team.id})
+        self.assertEqual([row['code'] for row in response.data['results']], ['D'])
+        response = self.client.get('/api/staff/shift-types/', {'team': self.team.id})
+        self.assertEqual([row['code'] for row in response.data['results']], ['1'])
+
+    def test_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Team.objects.create(code='SCI', name='Support Scientists')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(REFERENCE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class DailyAvailabilityBulkTests(APITestCase):
+    url = '/api/staff/daily-availability/bulk/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = make_staff(self.team, 1)
+
+    def test_range_creates_and_updates_in_one_request(self):
+        existing = DailyAvailability.objects.create(
+            staff_member=self.staff, date=date(2025, 3, 3), availability_code='A'
+        )
+
+        # Includes two reads and one upsert to refresh the monthly bitmap
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, {
+                'staff_member': self.staff.id, 'start_date': '2025-03-01', 'end_date': '2025-03-14',
+                'availability_code': 'X', 'notes': 'Vacation',
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 14)
+        self.assertEqual(DailyAvailability.objects.filter(availability_code='X', notes='Vacation').count(), 14)
+        existing.refresh_from_db()
+        self.assertEqual(existing.availability_code, 'X')
+        self.assertEqual(
+            [row['id'] for row in response.data['results'] if row['date'] == '2025-03-03'], [existing.id]
+        )
+
+    def test_returns_only_changed_rows(self):
+        DailyAvailability.objects.create(staff_member=self.staff, date=date(2025, 3, 1), availability_code='A')
+
+        response = self.client.post(self.url, {'items': [
+            {'staff_member': self.staff.id, 'date': '2025-03-01', 'availability_code': 'A'},
+            {'staff_member': self.staff.id, 'date': '2025-03-02', 'availability_code': '?', 'notes': 'Maybe'},
+        ]}, format='json')
+
+        self.assertEqual([row['date'] for row in response.data['results']], ['2025-03-02'])
+
+    def test_rejects_unknown_staff_and_mixed_payloads(self):
+        response = self.client.post(self.url, {'items': [
+            {'staff_member': 999, 'date': '2025-03-01', 'availability_code': 'A'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(self.url, {
+            'items': [], 'staff_member': self.staff.id, 'start_date': '2025-03-01',
+            'end_date': '2025-03-02', 'availability_code': 'X',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(DailyAvailability.objects.exists())
+
+
+class AvailabilityBitmapTests(APITestCase):
+    url = '/api/staff/members/available/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.away = make_staff(self.team, 1)
+        self.unsure = make_staff(self.team, 2)
+        self.free = make_staff(self.team, 3)
+        DailyAvailability.objects.create(staff_member=self.away, date=date(2025, 3, 15), availability_code='X')
+        DailyAvailability.objects.create(staff_member=self.unsure, date=date(2025, 4, 2), availability_code='?')
+        DailyAvailability.objects.create(staff_member=self.free, date=date(2025, 3, 15), availability_code='A')
+
+    def available(self, start, end, **params):
+        response = self.client.get(self.url, {'start_date': start, 'end_date': end, 'team': self.team.id, **params})
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.data['results']}
+
+    def test_bitmaps_follow_saves_and_deletes(self):
+        bitmap = AvailabilityBitmap.objects.get(staff_member=self.away, month=date(2025, 3, 1))
+        self.assertEqual(bitmap.unavailable, 1 << 14)
+
+        row = DailyAvailability.objects.get(staff_member=self.away)
+        row.availability_code = '?'
+        row.save()
+        bitmap.refresh_from_db()
+        self.assertEqual((bitmap.unavailable, bitmap.maybe), (0, 1 << 14))
+
+        row.delete()
+        bitmap.refresh_from_db()
+        self.assertEqual(bitmap.maybe, 0)
+
+    def test_moving_a_row_clears_its_old_month(self):
+        row = DailyAvailability.objects.get(staff_member=self.away)
+        response = self.client.patch(
+            f'/api/staff/daily-availability/{row.id}/', {'date': '2025-04-15'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        bitmaps = AvailabilityBitmap.objects.filter(staff_member=self.away).order_by('month')
+        self.assertEqual([b.unavailable for b in bitmaps], [0, 1 << 14])
+        self.assertIn(self.away.id, self.available('2025-03-15', '2025-03-15'))
+
+    def test_bulk_endpoint_refreshes_bitmaps(self):
+        self.client.post('/api/staff/daily-availability/bulk/', {
+            'staff_member': self.free.id, 'start_date': '2025-03-30', 'end_date': '2025-04-02',
+            'availability_code': 'X',
+        }, format='json')
+
+        bitmaps = AvailabilityBitmap.objects.filter(staff_member=self.free).order_by('month')
+        self.assertEqual([b.unavailable for b in bitmaps], [(1 << 29) | (1 << 30), 0b11])
+
+    def test_available_staff(self):
+        everyone = {self.away.id, self.unsure.id, self.free.id}
+        self.assertEqual(self.available('2025-03-10', '2025-04-05'), everyone - {self.away.id})
+        self.assertEqual(
+            self.available('2025-03-10', '2025-04-05', include_maybe='false'), {self.free.id}
+        )
+        self.assertEqual(self.available('2025-03-16', '2025-04-01'), everyone)
+        # Whole months in the middle of a long range
+        self.assertEqual(self.available('2025-01-20', '2025-06-10'), everyone - {self.away.id})
+
+    def test_available_query_count_stays_flat(self):
+        with CaptureQueriesContext(connection) as small:
+            self.available('2025-01-01', '2025-12-31')
+        for i in range(4, 18):
+            staff = make_staff(self.team, i)
+            self.client.post('/api/staff/daily-availability/bulk/', {
+                'staff_member': staff.id, 'start_date': '2025-01-01', 'end_date': '2025-12-31',
+                'availability_code': 'A',
+            }, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(len(self.available('2025-01-01', '2025-12-31')), 16)
+        self.assertEqual(len(large), len(small))
+
+    def test_availability_bits_are_relative_to_start(self):
+        bits = availability_bits([self.away.id, self.unsure.id], date(2025, 3, 14), date(2025, 4, 30))
+        self.assertEqual(bits[self.away.id]['unavailable'], 1 << 1)
+        self.assertEqual(bits[self.unsure.id]['maybe'], 1 << 19)
+
+    def test_deleting_staff_member_cascades(self):
+        self.away.delete()
+        self.assertFalse(AvailabilityBitmap.objects.filter(staff_member_id=self.away.id).exists())
+
+
+class ResolvedAvailabilityTests(APITestCase):
+    url = '/api/staff/daily-availability/resolved/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = make_staff(self.team, 1)
+        for day, code in [(1, 'A'), (2, '?'), (3, 'X'), (4, 'A')]:
+            DailyAvailability.objects.create(staff_member=self.staff, date=date(2025, 3, day), availability_code=code)
+
+    def resolve(self, start='2025-03-01', end='2025-03-07'):
+        response = self.client.get(self.url, {'start_date': start, 'end_date': end, 'staff_member': self.staff.id})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'][0]
+
+    def test_windows_override_daily_codes(self):
+        StaffAvailability.objects.create(
+            staff_member=self.staff, start_date=date(2025, 3, 4), end_date=date(2025, 3, 5),
+            availability_type='unavailable', reason='Conference',
+        )
+        StaffAvailability.objects.create(
+            staff_member=self.staff, start_date=date(2025, 2, 20), end_date=date(2025, 3, 6),
+            availability_type='available',
+        )
+
+        row = self.resolve()
+        # Available windows fill unset days but never hide an explicit X or ?
+        self.assertEqual(row['availability'], 'A?XXXA-')
+        self.assertEqual([w['reason'] for w in row['windows']], ['', 'Conference'])
+
+    def test_window_changes_refresh_bitmaps(self):
+        window = StaffAvailability.objects.create(
+            staff_member=self.staff, start_date=date(2025, 3, 30), end_date=date(2025, 4, 1),
+            availability_type='unavailable',
+        )
+        bitmaps = {b.month: b.unavailable for b in AvailabilityBitmap.objects.filter(staff_member=self.staff)}
+        self.assertEqual(bitmaps[date(2025, 4, 1)], 1)
+
+        window.start_date = date(2025, 4, 10)
+        window.end_date = date(2025, 4, 10)
+        window.save()
+        bitmaps = {b.month: b.unavailable for b in AvailabilityBitmap.objects.filter(staff_member=self.staff)}
+        self.assertEqual(bitmaps[date(2025, 3, 1)], 1 << 2)
+        self.assertEqual(bitmaps[date(2025, 4, 1)], 1 << 9)
+
+        window.delete()
+        self.assertEqual(AvailabilityBitmap.objects.get(staff_member=self.staff, month=date(2025, 4, 1)).unavailable, 0)
+
+    def test_year_for_hundred_staff_resolves_in_two_queries(self):
+        windows = []
+        for i in range(2, 101):
+            staff = make_staff(self.team, i)
+            windows.append(StaffAvailability(
+                staff_member=staff, start_date=date(2025, 1, 1) + timedelta(days=i),
+                end_date=date(2025, 1, 15) + timedelta(days=i), availability_type='unavailable',
+            ))
+        StaffAvailability.objects.bulk_create(windows)
+
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {
+                'start_date': '2025-01-01', 'end_date': '2025-12-31', 'team': self.team.id
+            })
+        self.assertEqual(len(response.data['results']), 100)
+        self.assertTrue(all(len(row['availability']) == 365 for row in response.data['results']))
+
+    def test_rejects_reversed_window(self):
+        response = self.client.post('/api/staff/availability/', {
+            'staff_member': self.staff.id, 'start_date': '2025-03-05', 'end_date': '2025-03-01',
+            'availability_type': 'unavailable',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class SeedCommandTests(TestCase):
+    def seed(self, *args):
+        call_command(*args, '--seed', '1', '--start', '2025-01-01', stdout=StringIO())
+
+    def test_synthetic_staff_and_reproducible_availability(self):
+        from apps.shifts.models import Shift
+
+        call_command('setup_teams', stdout=StringIO())
+        self.seed('seed_rubin_data', '--staff', '20', '--days', '28')
+        self.assertEqual(StaffMember.objects.filter(employee_id__contains='-S').count(), 20)
+        # Every synthetic staff member works 4 days of each 7
+        self.assertEqual(Shift.objects.count(), 20 * 16)
+        shift = Shift.objects.first()
+        self.assertEqual(shift.status, 'scheduled')
+        self.assertIsNotNone(shift.created_at)
+
+        # Rerunning reuses the generated staff
+        self.seed('seed_rubin_data', '--staff', '20', '--days', '28')
+        self.assertEqual(StaffMember.objects.count(), 20)
+
+        self.seed('seed_daily_availability', '--days', '45')
+        first = list(DailyAvailability.objects.order_by('staff_member_id', 'date').values_list('availability_code', 'notes'))
+        self.assertEqual(len(first), 20 * 45)
+        self.seed('seed_daily_availability', '--days', '45')
+        second = list(DailyAvailability.objects.order_by('staff_member_id', 'date').values_list('availability_code', 'notes'))
+        self.assertEqual(first, second)
+        self.assertEqual(AvailabilityBitmap.objects.count(), 20 * 2)
+        bits = availability_bits([StaffMember.objects.first().id], date(2025, 1, 1), date(2025, 2, 14))
+        self.assertTrue(any(bits.values()))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite backend settings')
+class SQLiteBackendTests(SimpleTestCase):
+    alias = 'concurrent_writes'
+    engine = 'config.sqlite3'
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        connections.settings[self.alias] = connections.configure_settings({
+            'default': connections.settings['default'],
+            self.alias: {
+                'ENGINE': self.engine,
+                'NAME': str(Path(directory.name) / 'concurrent.sqlite3'),
+                'OPTIONS': {'timeout': 10},
+            },
+        })[self.alias]
+        self.addCleanup(connections.settings.pop, self.alias)
+        self.addCleanup(self.close)
+
+    def close(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+
+    def test_wal_mode(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+    def test_concurrent_read_then_write_transactions(self):
+        # Each transaction reads before it writes, like the bulk availability
+        # upsert; with a deferred BEGIN the second writer fails immediately
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)')
+        errors = []
+
+        def write():
+            try:
+                for _ in range(25):
+                    with transaction.atomic(using=self.alias):
+                        with connections[self.alias].cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*) FROM counter')
+                            count = cursor.fetchone()[0]
+                            # Let the other writers start their transactions
+                            time.sleep(0.002)
+                            cursor.execute('INSERT INTO counter (value) VALUES (%s)', [count])
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections[self.alias].close()
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), COUNT(DISTINCT value) FROM counter')
+            self.assertEqual(cursor.fetchone(), (100, 100))
+
+
+class ChangeFeedTests(APITestCase):
+    url = '/api/staff/daily-availability/changes/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = make_staff(self.team, 1)
+        self.rows = [
+            DailyAvailability.objects.create(staff_member=self.staff, date=date(2025, 3, day), availability_code='A')
+            for day in range(1, 6)
+        ]
+
+    def test_updated_since_then_cursor_polling(self):
+        since = timezone.now()
+        self.rows[1].availability_code = 'X'
+        self.rows[1].save()
+        self.client.post('/api/staff/daily-availability/bulk/', {
+            'staff_member': self.staff.id, 'start_date': '2025-03-04', 'end_date': '2025-03-04',
+            'availability_code': '?',
+        }, format='json')
+        deleted_id = self.rows[0].id
+        self.rows[0].delete()
+
+        response = self.client.get(self.url, {'updated_since': since.isoformat()})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.rows[1].id, self.rows[3].id])
+        self.assertEqual(response.data['deleted'], [deleted_id])
+        self.assertFalse(response.data['has_more'])
+
+        # Nothing new since the returned cursor
+        cursor = response.data['cursor']
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual((response.data['results'], response.data['deleted']), ([], []))
+
+        self.rows[4].notes = 'Late'
+        self.rows[4].save()
+        response = self.client.get(self.url, {'cursor': cursor})
+        self.assertEqual([row['notes'] for row in response.data['results']], ['Late'])
+
+    def test_pages_and_filters(self):
+        since = timezone.now()
+        for row in self.rows:
+            row.save()
+        response = self.client.get(self.url, {'updated_since': since.isoformat(), 'page_size': 3})
+        self.assertTrue(response.data['has_more'])
+        first = [row['id'] for row in response.data['results']]
+        response = self.client.get(self.url, {'cursor': response.data['cursor'], 'page_size': 3})
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(first + [row['id'] for row in response.data['results']], [row.id for row in self.rows])
+
+        response = self.client.get(self.url, {'updated_since': since.isoformat(), 'date__gte': '2025-03-05'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.rows[4].id])
+
+    def test_expired_and_invalid_requests(self):
+        old = timezone.now() - timedelta(days=31)
+        self.assertEqual(self.client.get(self.url, {'updated_since': old.isoformat()}).status_code, 410)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'nonsense'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 400)
+
+    def test_prune_tombstones(self):
+        deleted_id = self.rows[0].id
+        self.rows[0].delete()
+        Tombstone.objects.create(model='staff.dailyavailability', object_id=999, deleted_at=timezone.now() - timedelta(days=40))
+        out = StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Deleted 1 tombstones', out.getvalue())
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [deleted_id])
+
+
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = [make_staff(self.team, i) for i in range(3)]
+        for member in self.staff:
+            DailyAvailability.objects.create(staff_member=member, date=date(2025, 3, 1), availability_code='A')
+
+    def test_staff_list_for_calendar(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/staff/members/', {'fields': 'id,full_name,team'})
+        self.assertEqual(response.data['results'][0], {'id': self.staff[0].id, 'team': self.team.id, 'full_name': 'First0 Last000'})
+        self.assertNotIn('"auth_user"."password"', queries[-1]['sql'])
+        self.assertNotIn('staff_team', queries[-1]['sql'])
+
+    def test_keyset_pages_with_narrow_rows(self):
+        url = '/api/staff/daily-availability/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'date,availability_code', 'pagination': 'cursor', 'page_size': 2})
+        self.assertEqual(response.data['results'], [{'date': '2025-03-01', 'availability_code': 'A'}] * 2)
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_reference_data(self):
+        response = self.client.get('/api/staff/teams/', {'omit': 'description,is_active'})
+        self.assertIn({'id': self.team.id, 'name': 'Observing Specialists', 'code': 'OBS'}, response.data['results'])
+
+
+class DailyAvailabilityValuesTests(APITestCase):
+    def test_list_matches_serializer(self):
+        team = Team.objects.create(code='OBS', name='Observing Specialists')
+        for i, code in enumerate('AX?-'):
+            DailyAvailability.objects.create(
+                staff_member=make_staff(team, i), date=date(2025, 3, 1), availability_code=code, notes=f'n{i}'
+            )
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/staff/daily-availability/')
+        expected = DailyAvailabilitySerializer(
+            DailyAvailability.objects.select_related('staff_member__user').order_by('date', 'staff_member'),
+            many=True,
+        ).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+
+
+@override_settings(EVENTS_BROKER='apps.staff.events.InProcessBroker')
+class EventStreamTests(APITestCase):
+    url = '/api/events/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        other = Team.objects.create(code='ENG', name='Engineering')
+        self.staff = make_staff(self.team, 1)
+        self.outsider = make_staff(other, 2)
+
+    def test_writes_publish_after_commit(self):
+        broker = mock.Mock()
+        with mock.patch('apps.staff.events.get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(execute=True):
+                row = DailyAvailability.objects.create(
+                    staff_member=self.staff, date=date(2025, 3, 1), availability_code='A'
+                )
+                self.assertFalse(broker.publish.called)
+            row_id = row.id
+            with self.captureOnCommitCallbacks(execute=True):
+                row.delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/staff/daily-availability/bulk/', {
+                    'staff_member': self.staff.id, 'start_date': '2025-03-02', 'end_date': '2025-03-03',
+                    'availability_code': 'X',
+                }, format='json')
+
+        batches = [call.args[0] for call in broker.publish.call_args_list]
+        self.assertEqual(
+            [[(event['action'], event['start']) for event in batch] for batch in batches],
+            [[('saved', '2025-03-01')], [('deleted', '2025-03-01')], [('saved', '2025-03-02'), ('saved', '2025-03-03')]],
+        )
+        self.assertEqual(batches[1][0]['id'], row_id)
+
+    async def test_stream_filters_by_team_dates_and_type(self):
+        response = await self.async_client.get(self.url, {
+            'team': self.team.id, 'start_date': '2025-03-01', 'end_date': '2025-03-31',
+        })
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+
+        def event(staff, day, code='A'):
+            return availability_event(
+                DailyAvailability(id=1, staff_member=staff, date=day, availability_code=code)
+            )
+
+        get_broker().publish([
+            event(self.staff, date(2025, 3, 5)),
+            event(self.outsider, date(2025, 3, 5)),
+            event(self.staff, date(2025, 4, 1)),
+            event(self.staff, date(2025, 3, 31), 'X'),
+        ])
+        chunk = (await asyncio.wait_for(anext(stream), 1)).decode()
+        messages = [message for message in chunk.split('\n\n') if message]
+        self.assertEqual(len(messages), 2)
+        self.assertTrue(all(message.startswith('event: daily_availability\n') for message in messages))
+        self.assertIn('"start": "2025-03-31"', messages[1])
+        await stream.aclose()
+
+    @override_settings(EVENTS_HEARTBEAT_SECONDS=0.05)
+    async def test_stream_sends_keepalives(self):
+        response = await self.async_client.get(self.url)
+        stream = response.streaming_content
+        await anext(stream)
+        self.assertEqual(await asyncio.wait_for(anext(stream), 1), b': keepalive\n\n')
+        await stream.aclose()
+
+    def test_requires_asgi(self):
+        self.assertEqual(self.client.get(self.url).status_code, 501)
+
+    async def test_rejects_bad_params(self):
+        response = await self.async_client.get(self.url, {'types': 'roster'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('types', response.json())
+
+
+
+class AvailabilityGridTests(APITestCase):
+    url = '/api/staff/daily-availability/'
+
+    def setUp(self):
+        self.team = Team.objects.create(code='OBS', name='Observing Specialists')
+        self.staff = [make_staff(self.team, i) for i in range(2)]
+        DailyAvailability.objects.bulk_create([
+            DailyAvailability(staff_member=self.staff[1], date=date(2025, 3, 1), availability_code='A'),
+            DailyAvailability(staff_member=self.staff[1], date=date(2025, 3, 3), availability_code='X', notes='Conference'),
+            DailyAvailability(staff_member=self.staff[0], date=date(2025, 3, 2), availability_code='?'),
+            DailyAvailability(staff_member=self.staff[0], date=date(2025, 3, 9), availability_code='X'),
+        ])
+
+    def test_grid(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, {'format': 'grid', 'date__gte': '2025-03-01', 'date__lte': '2025-03-03'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.availability-grid+json')
+        grid = json.loads(response.content)
+        self.assertEqual(grid['dates'], ['2025-03-01', '2025-03-02', '2025-03-03'])
+        self.assertEqual([member['id'] for member in grid['staff']], [self.staff[0].id, self.staff[1].id])
+        self.assertEqual(grid['staff'][0], {'id': self.staff[0].id, 'name': 'First0 Last000', 'team': self.team.id})
+        self.assertEqual(grid['codes'], ['-?-', 'A-X'])
+        self.assertEqual(grid['notes'], [[1, 2, 'Conference']])
+        self.assertEqual(grid['legend']['X'], 'Unavailable')
+
+    def test_accept_header_and_filters(self):
+        response = self.client.get(
+            self.url,
+            {'date__gte': '2025-03-01', 'date__lte': '2025-03-31', 'staff_member': self.staff[0].id},
+            HTTP_ACCEPT='application/vnd.availability-grid+json',
+        )
+        grid = json.loads(response.content)
+        self.assertEqual(len(grid['dates']), 31)
+        self.assertEqual(grid['codes'], ['-?' + '-' * 6 + 'X' + '-' * 22])
+
+    def test_requires_range(self):
+        response = self.client.get(self.url, {'format': 'grid', 'date__gte': '2025-03-01'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'format': 'grid', 'date__gte': '2025-01-01', 'date__lte': '2026-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_revalidate(self):
+        params = {'format': 'grid', 'date__gte': '2025-03-01', 'date__lte': '2025-03-03'}
+        etag = self.client.get(self.url, params)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        DailyAvailability.objects.filter(date=date(2025, 3, 2)).delete()
+        self.assertEqual(self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_only(self):
+        row = DailyAvailability.objects.first()
+        response = self.client.get(f'{self.url}{row.id}/', {'format': 'grid'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CompressionTests(APITestCase):
+    def setUp(self):
+        team = Team.objects.create(code='OBS', name='Observing Specialists')
+        staff = make_staff(team, 1)
+        DailyAvailability.objects.bulk_create([
+            DailyAvailability(staff_member=staff, date=date(2025, 3, 1) + timedelta(days=i), availability_code='A')
+            for i in range(30)
+        ])
+
+    def test_gzip(self):
+        response = self.client.get('/api/staff/daily-availability/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), 20)
+
+    def test_identity(self):
+        response = self.client.get('/api/staff/daily-availability/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @skipUnless(compression.brotli, 'brotli is not installed')
+    def test_brotli(self):
+        response = self.client.get('/api/staff/daily-availability/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(compression.brotli.decompress(response.content))['results']), 20)
+
+    @override_settings(EVENTS_BROKER='apps.staff.events.InProcessBroker')
+    async def test_event_stream_not_compressed(self):
+        response = await self.async_client.get('/api/events/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        await response.streaming_content.aclose()
@@ -0,0 +1,91 @@
+"""
+Values-based serialization for hot list endpoints.
+
+A ModelSerializer builds a model instance per row and walks every field
+(get_attribute, to_representation, SkipField handling) for each of them,
+which dominates the cost of lists with thousands of shifts or
+availability cells. A ValuesSerializer instead reads ``queryset.values()``
+and builds each item with one dict literal, then the ORJSONRenderer
+(config.renderers) encodes it.
+
+Each ValuesSerializer mirrors one ModelSerializer and must produce exactly
+its output: same keys in the same order, keys the serializer would skip
+for a null relation left out, datetimes formatted like DRF. The tests
+compare both on the same rows.
+
+``ValuesListMixin`` serves a viewset's plain list action this way; with
+sparse fieldsets (``?fields=``/``?omit=``) or a non-JSON renderer it falls
+back to the regular serializer.
+"""
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+def format_datetime(value, tz):
+    """DRF DateTimeField output for an aware datetime (or None) in the current timezone ``tz``"""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def full_name(first_name, last_name):
+    """User.get_full_name() from its two columns"""
+    return f'{first_name} {last_name}'.strip()
+
+
+class ValuesSerializer:
+    """
+    Read-only stand-in for a list serializer over ``queryset.values()``.
+    Subclasses name the ORM ``columns`` they read and build each item in
+    ``to_representation(row)``; ``self.tz`` is the current timezone,
+    looked up once per list rather than per value.
+    """
+    columns = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def values(cls, queryset, extra=()):
+        """``queryset`` as dicts of ``columns`` plus ``extra`` (e.g. pagination keys)"""
+        return queryset.values(*dict.fromkeys((*cls.columns, *extra)))
+
+    def to_representation(self, row):
+        raise NotImplementedError
+
+    @property
+    def data(self):
+        self.tz = timezone.get_current_timezone()
+        represent = self.to_representation
+        return [represent(row) for row in self.rows]
+
+
+class ValuesListMixin:
+    """List action served through ``values_serializer_class`` (see module docstring)"""
+    values_serializer_class = None
+    values_serializer_used = None
+
+    def use_values_serializer(self):
+        if self.values_serializer_class is None:
+            return False
+        if getattr(self, 'get_fieldset', lambda: None)() is not None:
+            return False
+        return self.request.accepted_renderer.format == 'json'
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().list(request, *args, **kwargs)
+
+        serializer_class = self.values_serializer_used = self.values_serializer_class
+        # Keyset pagination reads its ordering columns from the rows
+        keyset = getattr(getattr(self, 'paginator', None), 'keyset_class', None)
+        queryset = serializer_class.values(
+            self.filter_queryset(self.get_queryset()), getattr(keyset, 'ordering', ())
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer_class(page).data)
+        return Response(serializer_class(queryset).data)
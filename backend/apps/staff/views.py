@@ -1,5 +1,11 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Team, ShiftType, StaffMember, StaffAvailability, DailyAvailability
 from .serializers import (
@@ -7,13 +13,28 @@ from .serializers import (
     ShiftTypeSerializer,
     StaffMemberSerializer,
     StaffMemberCreateSerializer,
+    AvailableStaffQuerySerializer,
+    EventStreamQuerySerializer,
+    ResolvedAvailabilityQuerySerializer,
     StaffAvailabilitySerializer,
-    DailyAvailabilitySerializer
+    DailyAvailabilitySerializer,
+    DailyAvailabilityValuesSerializer,
+    DailyAvailabilityBulkSerializer
 )
-from .pagination import LargeResultsSetPagination
+from .pagination import DailyAvailabilityPagination
+from .filters import DailyAvailabilityFilter
+from .caching import CachedReferenceMixin
+from .conditional import ConditionalGetMixin
+from .sync import ChangeFeedMixin
+from .fieldsets import SparseFieldsetMixin
+from .values import ValuesListMixin
+from .bitmap import available_staff
+from .availability import resolve_availability
+from .events import EventFilter, stream_events
+from .grid import AvailabilityGridRenderer, AvailabilityGridQuerySerializer, availability_grid
 
 
-class TeamViewSet(viewsets.ReadOnlyModelViewSet):
+class TeamViewSet(SparseFieldsetMixin, CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for Team read-only operations
     """
@@ -22,7 +43,7 @@ class TeamViewSet(viewsets.ReadOnlyModelViewSet):
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
 
 
-class ShiftTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class ShiftTypeViewSet(SparseFieldsetMixin, CachedReferenceMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for ShiftType read-only operations
     """
@@ -33,12 +54,13 @@ class ShiftTypeViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ['team']
 
 
-class StaffMemberViewSet(viewsets.ModelViewSet):
+class StaffMemberViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for StaffMember CRUD operations
     """
     queryset = StaffMember.objects.select_related('user', 'team').all()
     serializer_class = StaffMemberSerializer
+    etag_dependencies = (User, Team)
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['role', 'status', 'prefers_night_shifts', 'team', 'team__name']
@@ -50,14 +72,36 @@ class StaffMemberViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return StaffMemberCreateSerializer
         return StaffMemberSerializer
+    
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        """
+        Staff members with no 'X' day between start_date and end_date
+        (inclusive). Pass include_maybe=false to also drop anyone with a
+        '?' day. Accepts the list filters, e.g. team.
+        """
+        params = AvailableStaffQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        queryset = available_staff(
+            query['start_date'], query['end_date'],
+            self.filter_queryset(self.get_queryset()),
+            include_maybe=query['include_maybe'],
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
 
 
-class StaffAvailabilityViewSet(viewsets.ModelViewSet):
+class StaffAvailabilityViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for StaffAvailability CRUD operations
     """
     queryset = StaffAvailability.objects.select_related('staff_member__user').all()
     serializer_class = StaffAvailabilitySerializer
+    etag_dependencies = (User,)
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['staff_member', 'availability_type', 'start_date']
@@ -65,15 +109,103 @@ class StaffAvailabilityViewSet(viewsets.ModelViewSet):
     ordering = ['start_date']
 
 
-class DailyAvailabilityViewSet(viewsets.ModelViewSet):
+class DailyAvailabilityViewSet(ConditionalGetMixin, ChangeFeedMixin, SparseFieldsetMixin, ValuesListMixin, viewsets.ModelViewSet):
     """
     ViewSet for DailyAvailability CRUD operations
     """
     queryset = DailyAvailability.objects.select_related('staff_member__user').all()
     serializer_class = DailyAvailabilitySerializer
-    pagination_class = LargeResultsSetPagination  # Allow large page sizes for calendar view
+    values_serializer_class = DailyAvailabilityValuesSerializer
+    etag_dependencies = (User, StaffMember)
+    pagination_class = DailyAvailabilityPagination  # Large pages for the calendar, keyset on request
     # permission_classes = [IsAuthenticated]  # Temporarily disabled for testing
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['staff_member', 'date', 'availability_code']
+    filterset_class = DailyAvailabilityFilter
     ordering_fields = ['date', 'staff_member']
     ordering = ['date', 'staff_member']
+    
+    def get_renderers(self):
+        # The list can also be packed as a columnar grid (?format=grid)
+        renderers = super().get_renderers()
+        if self.action == 'list':
+            renderers.append(AvailabilityGridRenderer())
+        return renderers
+    
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != AvailabilityGridRenderer.format:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(self.grid, request)
+    
+    def grid(self, request):
+        params = AvailabilityGridQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(availability_grid(
+            self.filter_queryset(self.get_queryset()),
+            params.validated_data['date__gte'],
+            params.validated_data['date__lte'],
+        ))
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create or update many daily availability cells in one request.
+        
+        Only rows whose code or notes actually changed are written and
+        returned.
+        """
+        serializer = DailyAvailabilityBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = serializer.save()
+        return Response({
+            'count': len(rows),
+            'results': DailyAvailabilitySerializer(rows, many=True).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def resolved(self, request):
+        """
+        Effective availability per staff member: daily codes with
+        availability windows applied, one code character per day.
+        
+        Query params: start_date, end_date (inclusive, YYYY-MM-DD) and
+        optionally team or staff_member (ids).
+        """
+        params = ResolvedAvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        query = params.validated_data
+        
+        staff = StaffMember.objects.order_by('id')
+        if 'team' in query:
+            staff = staff.filter(team_id=query['team'])
+        if 'staff_member' in query:
+            staff = staff.filter(pk=query['staff_member'])
+        staff_ids = list(staff.values_list('id', flat=True))
+        
+        resolved = resolve_availability(staff_ids, query['start_date'], query['end_date'])
+        return Response({
+            'start_date': query['start_date'],
+            'end_date': query['end_date'],
+            'results': [{'staff_member': staff_id, **resolved[staff_id]} for staff_id in staff_ids],
+        })
+
+
+async def event_stream(request):
+    """
+    Server-sent events for Shift and DailyAvailability changes (see
+    apps.staff.events).
+    
+    Query params: team (id), start_date and end_date (YYYY-MM-DD) and
+    types (shift, daily_availability; repeatable), all optional.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Event streams are only served over ASGI.'}, status=501)
+    params = EventStreamQuerySerializer(data=request.GET)
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=400)
+    event_filter = await sync_to_async(EventFilter.from_query)(params.validated_data)
+    
+    response = StreamingHttpResponse(stream_events(event_filter), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,59 @@
+"""
+Response compression.
+
+CompressionMiddleware is Django's GZipMiddleware plus Brotli: clients
+sending ``Accept-Encoding: br`` get Brotli (noticeably smaller than gzip
+on the repetitive JSON of shift and availability lists), others gzip, as
+long as the body is at least MIN_LENGTH bytes and compressing it actually
+shrinks it. Brotli needs the optional ``brotli`` package; without it
+everything is gzip.
+
+Server-sent event streams (``text/event-stream``) are never compressed:
+a compressor buffers its output, which would hold events back. Responses
+that already carry a Content-Encoding (e.g. schedule snapshots) are left
+as they are.
+"""
+import re
+
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+ACCEPTS_BROTLI = re.compile(r'\bbr\b')
+
+# Quality 5 compresses about as fast as gzip -6 and still well below it
+BROTLI_QUALITY = 5
+
+MIN_LENGTH = 200
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        if (
+            brotli is None
+            or response.streaming
+            or response.has_header('Content-Encoding')
+            or len(response.content) < MIN_LENGTH
+            or not ACCEPTS_BROTLI.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # A strong ETag would claim byte equality with the identity encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
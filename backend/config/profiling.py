@@ -0,0 +1,197 @@
+"""
+Per-request timing and query instrumentation.
+
+ProfilingMiddleware records for every request:
+
+- total: wall time from this middleware to the response, i.e. URL
+  resolution, the view and rendering
+- view: time inside the view, which for DRF viewsets includes filtering,
+  pagination and serializer.data
+- db: time spent executing SQL, with the query count
+- app: view time not spent in SQL, i.e. mostly serializer to_representation
+- render: renderer time (JSON encoding) for DRF responses
+
+and returns them in a ``Server-Timing`` header, which browser dev tools show
+in the network panel. The viewset, action and serializer class are named in
+the ``view`` entry so the slow part of e.g. the calendar can be attributed.
+
+Requests slower than SLOW_REQUEST_MS are logged with their most repeated
+SQL statements, fingerprinted so queries that only differ in parameters
+group together (an N+1 shows up as one fingerprint with a large count).
+
+With PROFILE_SAMPLE_RATE > 0 that fraction of requests runs under cProfile
+and the stats are dumped to PROFILE_DIR (open with snakeviz or pstats).
+
+Queries are counted with ``connection.execute_wrapper``, so nothing here
+depends on DEBUG. The middleware calls the view itself from process_view,
+so it must be the last entry in MIDDLEWARE; async views are not timed.
+"""
+import cProfile
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Number of repeated statements included in a slow request log line
+SLOW_QUERY_FINGERPRINTS = 5
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals and IN lists collapsed, so repeated statements group together"""
+    sql = IN_LIST.sub('(...)', sql)
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times queries per fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self.fingerprint_time = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - begin
+            key = fingerprint(sql)
+            self.count += 1
+            self.duration += elapsed
+            self.fingerprints[key] += 1
+            self.fingerprint_time[key] += elapsed
+
+    def repeated(self, limit=SLOW_QUERY_FINGERPRINTS):
+        """[(count, ms, fingerprint)] of statements run more than once, most frequent first"""
+        return [
+            (count, round(self.fingerprint_time[key] * 1000, 1), key)
+            for key, count in self.fingerprints.most_common(limit)
+            if count > 1
+        ]
+
+
+def view_name(response):
+    """'ViewSet.action (Serializer)' for DRF responses, else None"""
+    view = getattr(response, 'renderer_context', {}).get('view')
+    if view is None:
+        return None
+    name = type(view).__name__
+    if getattr(view, 'action', None):
+        name = f'{name}.{view.action}'
+    # ValuesListMixin records the values serializer it answered with
+    serializer_class = getattr(view, 'values_serializer_used', None)
+    if serializer_class is None:
+        try:
+            serializer_class = view.get_serializer_class()
+        except (AssertionError, AttributeError):
+            serializer_class = None
+    if serializer_class is not None:
+        name = f'{name} ({serializer_class.__name__})'
+    return name
+
+
+class ProfilingMiddleware:
+    """See the module docstring; enabled with REQUEST_PROFILING"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_PROFILING:
+            return self.get_response(request)
+
+        request._profiling = {'view': 0.0, 'render': 0.0}
+        recorder = QueryRecorder()
+        profiler = None
+        if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+
+        begin = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        total = time.perf_counter() - begin
+
+        timings = request._profiling
+        name = view_name(response)
+        entries = [
+            ('total', total, None),
+            ('view', timings['view'], name),
+            ('db', recorder.duration, f'{recorder.count} queries'),
+            ('app', max(0.0, timings['view'] - recorder.duration), None),
+            ('render', timings['render'], None),
+        ]
+        response['Server-Timing'] = ', '.join(
+            f'{metric};dur={seconds * 1000:.1f}' + (f';desc="{desc}"' if desc else '')
+            for metric, seconds, desc in entries
+        )
+
+        if total * 1000 >= settings.SLOW_REQUEST_MS:
+            self.log_slow(request, response, total, recorder, name)
+        if profiler is not None:
+            self.dump_profile(profiler, request, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Call the view here so it can be timed; returning its response
+        # stops the handler from calling it again
+        # Async views (the event stream) are left to the handler
+        if not hasattr(request, '_profiling') or iscoroutinefunction(view_func):
+            return None
+        begin = time.perf_counter()
+        try:
+            return view_func(request, *view_args, **view_kwargs)
+        finally:
+            request._profiling['view'] = time.perf_counter() - begin
+
+    def process_template_response(self, request, response):
+        # Render DRF responses here to time the renderer; the handler skips
+        # responses that are already rendered
+        if hasattr(request, '_profiling') and not response.is_rendered:
+            begin = time.perf_counter()
+            response.render()
+            request._profiling['render'] = time.perf_counter() - begin
+        return response
+
+    def log_slow(self, request, response, total, recorder, name):
+        lines = [
+            f'Slow request {request.method} {request.get_full_path()} -> {response.status_code} '
+            f'in {total * 1000:.0f}ms: {recorder.count} queries, {recorder.duration * 1000:.0f}ms db'
+            + (f', {name}' if name else '')
+        ]
+        for count, ms, sql in recorder.repeated():
+            lines.append(f'  {count}x {ms}ms {sql}')
+        logger.warning('\n'.join(lines))
+
+    def dump_profile(self, profiler, request, total):
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        path = directory / f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{slug}-{total * 1000:.0f}ms.prof'
+        profiler.dump_stats(path)
@@ -0,0 +1,33 @@
+"""
+JSON rendering with orjson.
+
+ORJSONRenderer produces the same bytes as DRF's JSONRenderer (compact,
+UTF-8, U+2028/U+2029 escaped, dates and Decimals through DRF's encoder)
+several times faster. Requests for indented output (``Accept:
+application/json; indent=4``) and installs without the orjson package use
+DRF's renderer.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ORJSONRenderer(JSONRenderer):
+    # Leave dates, datetimes and times to DRF's encoder so they are
+    # formatted exactly as before ('Z' suffix, millisecond precision)
+    options = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+    default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        ret = orjson.dumps(data, default=self.default, option=self.options)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -54,6 +54,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    # gzip/Brotli; before anything that may read or set response bodies
+    "config.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -62,6 +64,8 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
+    # Must stay last: it calls the view itself to time it
+    "config.profiling.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -88,12 +92,42 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# SQLite by default. Set DB_ENGINE=django.db.backends.postgresql and the other
+# DB_* variables for PostgreSQL, which several workers can write to at once.
+DB_ENGINE = config('DB_ENGINE', default='django.db.backends.sqlite3')
+
+# Seconds to keep a connection open between requests (0 closes it after each
+# request). With PostgreSQL keep this below the server's idle timeout, or put
+# pgbouncer in front when workers x threads exceeds max_connections.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+
+if DB_ENGINE.endswith('sqlite3'):
+    DATABASES = {
+        "default": {
+            # WAL journal and BEGIN IMMEDIATE transactions, see config/sqlite3
+            "ENGINE": "config.sqlite3",
+            "NAME": BASE_DIR / config('DB_NAME', default='db.sqlite3'),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "OPTIONS": {
+                # busy_timeout: seconds a writer waits for the lock before
+                # raising "database is locked"
+                "timeout": config('DB_BUSY_TIMEOUT', default=20, cast=int),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": DB_ENGINE,
+            "NAME": config('DB_NAME', default='shift_scheduler'),
+            "USER": config('DB_USER', default=''),
+            "PASSWORD": config('DB_PASSWORD', default=''),
+            "HOST": config('DB_HOST', default='localhost'),
+            "PORT": config('DB_PORT', default='5432'),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+        }
     }
-}
 
 
 # Password validation
@@ -137,6 +171,51 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Cache
+# Local memory by default; set REDIS_URL (e.g. redis://localhost:6379/0) to
+# share the cache between worker processes. Requires the redis package.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "shift-scheduler",
+        }
+    }
+
+# Seconds to cache team, shift type, telescope and instrument responses (0 disables)
+REFERENCE_CACHE_ALIAS = 'default'
+REFERENCE_CACHE_TIMEOUT = config('REFERENCE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Keep per-staff monthly WorkloadRollup rows current on every Shift change
+WORKLOAD_ROLLUPS = config('WORKLOAD_ROLLUPS', default=False, cast=bool)
+
+# Request profiling (config.profiling): Server-Timing headers on every
+# response, a warning log for requests slower than SLOW_REQUEST_MS, and
+# cProfile dumps for a PROFILE_SAMPLE_RATE fraction (0-1) of requests
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=True, cast=bool)
+SLOW_REQUEST_MS = config('SLOW_REQUEST_MS', default=500, cast=int)
+PROFILE_SAMPLE_RATE = config('PROFILE_SAMPLE_RATE', default=0.0, cast=float)
+PROFILE_DIR = config('PROFILE_DIR', default=str(BASE_DIR / 'profiles'))
+
+# Days to keep deletion tombstones for the shift/availability change feeds;
+# clients that last synced before that must refetch
+TOMBSTONE_RETENTION_DAYS = config('TOMBSTONE_RETENTION_DAYS', default=30, cast=int)
+
+# Live event stream (apps.staff.events): the broker that fans changes out
+# to open streams (apps.staff.events.RedisBroker to share them between
+# worker processes via REDIS_URL) and the keepalive interval in seconds
+EVENTS_BROKER = config('EVENTS_BROKER', default='apps.staff.events.InProcessBroker')
+EVENTS_HEARTBEAT_SECONDS = config('EVENTS_HEARTBEAT_SECONDS', default=15, cast=int)
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -155,6 +234,11 @@ REST_FRAMEWORK = {
         # TODO: Change back to IsAuthenticated in production
         # 'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        # Same output as DRF's JSONRenderer, encoded with orjson when installed
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'MAX_PAGE_SIZE': 10000,  # Allow large page sizes for availability data
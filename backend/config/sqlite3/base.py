@@ -0,0 +1,28 @@
+"""
+SQLite backend tuned for several concurrent writers.
+
+- journal_mode=WAL lets readers run while one connection writes, instead
+  of every read waiting for the write lock
+- synchronous=NORMAL is safe with WAL and avoids an fsync per commit
+- atomic blocks start with BEGIN IMMEDIATE. A plain BEGIN takes the write
+  lock only at the first write, and if another connection got it first
+  SQLite fails at once with "database is locked" without honouring the busy
+  timeout. Taking the lock up front makes writers queue for up to
+  OPTIONS['timeout'] seconds instead.
+
+Use with ENGINE 'config.sqlite3'; settings.py does so when DB_ENGINE is
+SQLite.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if not self.is_in_memory_db():
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
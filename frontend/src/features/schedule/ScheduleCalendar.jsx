@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { createPortal } from 'react-dom';
 import api from '../../services/api';
-import { staffService, shiftService } from '../../services';
+import { staffService, shiftService, recurringShiftService } from '../../services';
 import './ScheduleCalendar.css';
 
 const ScheduleCalendar = () => {
@@ -325,6 +325,18 @@ const ScheduleCalendar = () => {
     setEditingShiftCellData({ staffId, date });
   };
 
+  // Remove a shift; occurrences of a recurring shift (id null) are skipped on their rule instead
+  const removeShift = async (shift) => {
+    if (shift.id) {
+      await shiftService.delete(shift.id);
+      return;
+    }
+    const rule = (await recurringShiftService.getById(shift.recurrence)).data;
+    await recurringShiftService.update(shift.recurrence, {
+      exdates: [...rule.exdates, shift.recurrence_date]
+    });
+  };
+
   // Handle shift selection from dropdown
   const handleShiftChange = async (staffId, date, shiftTypeId) => {
     const dateStr = date.toISOString().split('T')[0];
@@ -340,12 +352,12 @@ const ScheduleCalendar = () => {
       if (shiftTypeId === 'none') {
         // Delete all shifts for this staff on this date
         for (const shift of currentShifts) {
-          await shiftService.delete(shift.id);
+          await removeShift(shift);
         }
       } else {
         // Delete existing shifts first
         for (const shift of currentShifts) {
-          await shiftService.delete(shift.id);
+          await removeShift(shift);
         }
         
         // Create new shift
@@ -672,7 +684,7 @@ const ScheduleCalendar = () => {
                               const shiftColor = shift.shift_color || '#6b7280';
                               return (
                                 <span 
-                                  key={shift.id} 
+                                  key={shift.id ?? `${shift.recurrence}-${shift.recurrence_date}`} 
                                   className="shift-code"
                                   style={{ backgroundColor: shiftColor, color: 'white' }}
                                 >
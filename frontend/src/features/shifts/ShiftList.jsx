@@ -102,7 +102,7 @@ function ShiftList() {
           </thead>
           <tbody>
             {shifts.map((shift) => (
-              <tr key={shift.id}>
+              <tr key={shift.id ?? `${shift.recurrence}-${shift.recurrence_date}`}>
                 <td>
                   <div className="date-cell">
                     <div>{formatDate(shift.start_time)}</div>
@@ -37,6 +37,20 @@ export const shiftService = {
   create: (data) => api.post('/shifts/', data),
   update: (id, data) => api.put(`/shifts/${id}/`, data),
   delete: (id) => api.delete(`/shifts/${id}/`),
+  // Staff x date grid with shifts and availability pre-joined
+  getCalendar: (params = {}) => api.get('/shifts/calendar/', { params }),
+}
+
+// Recurring shifts (their occurrences come back from shift lists with id null)
+export const recurringShiftService = {
+  getAll: (params = {}) => api.get('/recurring-shifts/', { params }),
+  getById: (id) => api.get(`/recurring-shifts/${id}/`),
+  create: (data) => api.post('/recurring-shifts/', data),
+  update: (id, data) => api.patch(`/recurring-shifts/${id}/`, data),
+  delete: (id) => api.delete(`/recurring-shifts/${id}/`),
+  getOccurrences: (id, params = {}) => api.get(`/recurring-shifts/${id}/occurrences/`, { params }),
+  // Store one occurrence as a regular shift, with any fields to change
+  materialise: (id, data) => api.post(`/recurring-shifts/${id}/materialise/`, data),
 }
 
 // Schedules